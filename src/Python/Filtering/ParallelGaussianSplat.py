@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkImageData,
+    vtkPolyData
+)
+from vtkmodules.vtkFiltersCore import vtkFlyingEdges3D
+from vtkmodules.vtkIOPLY import vtkPLYReader
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader
+from vtkmodules.vtkImagingHybrid import vtkGaussianSplatter
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Splat a large point cloud into a density volume, in slabs on several threads.'
+    epilogue = '''
+The volume of GaussianSplat is split into slabs along z. Each slab is splatted by its
+ own vtkGaussianSplatter, from only the points within the splat radius of it, on a
+ thread pool. The slabs do not overlap so they are written straight into one
+ NumPy volume, no per-thread volumes need to be added up.
+
+The sample dimensions are chosen so that the volume and the slabs being splatted
+ fit in the memory budget given with -m, the input points are not counted.
+
+If no file is given a noisy torus of -n points is splatted.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_name', nargs='?', default=None, help='An optional point cloud, a .ply or .vtp file.')
+    parser.add_argument('-n', '--number_of_points', type=int, default=1_000_000,
+                        help='The number of points of the torus.')
+    parser.add_argument('-m', '--memory', type=float, default=128.0, help='The memory budget in MB.')
+    parser.add_argument('-r', '--radius', type=float, default=0.01,
+                        help='The splat radius, a fraction of the longest side of the bounds.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of slabs splatted at once.')
+    parser.add_argument('-s', '--sum', action='store_true', help='Sum the splats, a density, rather than the maximum.')
+    parser.add_argument('-v', '--value', type=float, default=None,
+                        help='The iso value of the surface, the default is a tenth of the largest value.')
+    args = parser.parse_args()
+    return (args.file_name, args.number_of_points, args.memory, args.radius, args.jobs, args.sum,
+            args.value)
+
+
+def read_points(file_name):
+    """
+    The points of a .ply or .vtp file as an (n, 3) array.
+    """
+    readers = {'.ply': vtkPLYReader, '.vtp': vtkXMLPolyDataReader}
+    extension = Path(file_name).suffix.lower()
+    if extension not in readers:
+        raise ValueError(f'Expected a .ply or .vtp file, got {file_name}.')
+    reader = readers[extension]()
+    reader.SetFileName(str(file_name))
+    reader.Update()
+    return vtk_to_numpy(reader.GetOutput().GetPoints().GetData()).astype(float)
+
+
+def noisy_torus(n, seed=0):
+    """
+    n points scattered about a torus, a stand in for a scan.
+    """
+    rng = np.random.default_rng(seed)
+    u, v = rng.uniform(0.0, 2.0 * np.pi, (2, n))
+    r = 0.3 + rng.normal(0.0, 0.01, n)
+    points = np.empty((n, 3))
+    points[:, 0] = (1.0 + r * np.cos(v)) * np.cos(u)
+    points[:, 1] = (1.0 + r * np.cos(v)) * np.sin(u)
+    points[:, 2] = r * np.sin(v)
+    return points
+
+
+def sample_dimensions(bounds, budget, jobs):
+    """
+    The sample dimensions of a volume with cubic voxels over the bounds, fitting a memory budget.
+
+    The budget holds the float32 volume and, at most, jobs slabs of doubles being
+     splatted, each slab a quarter of the volume divided among the jobs.
+
+    :param bounds: The (3, 2) bounds.
+    :param budget: The memory budget in bytes.
+    :param jobs: The number of slabs splatted at once.
+    :return: The (nx, ny, nz) dimensions and the number of z samples in a slab.
+    """
+    sides = bounds[:, 1] - bounds[:, 0]
+    # Volume: 4 bytes a sample, slabs: at most a quarter as many samples of 8 bytes.
+    samples = budget / (4.0 + 2.0)
+    side = (np.prod(sides) / samples) ** (1.0 / 3.0)
+    dims = np.maximum(np.floor(sides / side).astype(int) + 1, 2)
+    while 6 * np.prod(dims) > budget and dims.max() > 2:
+        dims = np.maximum(dims - 1, 2)
+    depth = max(1, int(dims[2] / (4 * max(1, jobs))))
+    return dims, depth
+
+
+def points_poly_data(points):
+    """
+    A polydata of the points, sharing their memory.
+    """
+    vtk_points = vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(points, deep=False))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(vtk_points)
+    return poly_data
+
+
+class SlabSplatter:
+    """
+    Gaussian splatting of points into a volume, by slabs along z on a thread pool.
+
+    The points are sorted along z once, so the points within the radius of a slab
+     are a contiguous slice found by a binary search. Each slab is splatted by its
+     own vtkGaussianSplatter over the bounds of the slab, with the radius scaled to
+     the size of the slab, so it gives the samples the whole splat would.
+    """
+
+    def __init__(self, points, radius=0.01, accumulate_sum=False, exponent_factor=-5.0):
+        """
+        :param points: The (n, 3) points.
+        :param radius: The radius of a splat as a fraction of the longest side of the bounds.
+        :param accumulate_sum: Sum the splats instead of taking the maximum.
+        :param exponent_factor: The sharpness of the Gaussian, as in vtkGaussianSplatter.
+        """
+        order = np.argsort(points[:, 2], kind='stable')
+        self.points = np.ascontiguousarray(points[order])
+        self.z = self.points[:, 2].copy()
+        bounds = np.stack([self.points.min(axis=0), self.points.max(axis=0)], axis=1)
+        self.radius = radius * (bounds[:, 1] - bounds[:, 0]).max()
+        # Pad the bounds by the radius, as vtkGaussianSplatter does.
+        self.bounds = bounds + [-self.radius, self.radius]
+        self.accumulate_sum = accumulate_sum
+        self.exponent_factor = exponent_factor
+        # The number of points splatted by the last splat(), those near two slabs count twice.
+        self.splatted = 0
+
+    def splat_slab(self, volume, spacing, k0, k1):
+        """
+        Splat the z samples k0 to k1 inclusive into volume[k0:k1 + 1].
+        """
+        nz, ny, nx = volume.shape
+        # vtkGaussianSplatter needs two samples along z, splat a neighbour too for a single one.
+        j0, j1 = k0, k1
+        if j1 == j0:
+            j0, j1 = (j0, j0 + 1) if j0 + 1 < nz else (j0 - 1, j0)
+        bounds = self.bounds.copy()
+        bounds[2] = [self.bounds[2, 0] + j0 * spacing[2], self.bounds[2, 0] + j1 * spacing[2]]
+        lo, hi = np.searchsorted(self.z, [bounds[2, 0] - self.radius, bounds[2, 1] + self.radius], side='left')
+        if lo == hi:
+            volume[k0:k1 + 1] = 0.0
+            return 0
+        splatter = vtkGaussianSplatter()
+        splatter.SetInputData(points_poly_data(self.points[lo:hi]))
+        splatter.SetModelBounds(bounds.ravel())
+        splatter.SetSampleDimensions(nx, ny, j1 - j0 + 1)
+        # The radius is a fraction of the longest side of the slab.
+        splatter.SetRadius(self.radius / (bounds[:, 1] - bounds[:, 0]).max())
+        splatter.SetExponentFactor(self.exponent_factor)
+        splatter.ScalarWarpingOff()
+        splatter.NormalWarpingOff()
+        # Slab faces inside the volume must not be capped.
+        splatter.CappingOff()
+        if self.accumulate_sum:
+            splatter.SetAccumulationModeToSum()
+        else:
+            splatter.SetAccumulationModeToMax()
+        splatter.Update()
+        scalars = vtk_to_numpy(splatter.GetOutput().GetPointData().GetScalars())
+        volume[k0:k1 + 1] = scalars.reshape(j1 - j0 + 1, ny, nx)[k0 - j0:k1 - j0 + 1]
+        return hi - lo
+
+    def splat(self, dims, depth, jobs=4, capping=True):
+        """
+        Splat all the points.
+
+        :param dims: The (nx, ny, nz) sample dimensions.
+        :param depth: The number of z samples in a slab.
+        :param jobs: The number of slabs splatted at once.
+        :param capping: Set the faces of the volume to zero, as vtkGaussianSplatter does, so surfaces close.
+        :return: The vtkImageData, its float32 scalars are a view of a NumPy volume indexed [z, y, x].
+        """
+        nx, ny, nz = (int(d) for d in dims)
+        spacing = (self.bounds[:, 1] - self.bounds[:, 0]) / (np.array([nx, ny, nz]) - 1)
+        volume = np.empty((nz, ny, nx), dtype=np.float32)
+        slabs = [(k0, min(k0 + depth, nz) - 1) for k0 in range(0, nz, depth)]
+        with ThreadPoolExecutor(max(1, jobs)) as executor:
+            splatted = sum(executor.map(lambda slab: self.splat_slab(volume, spacing, *slab), slabs))
+        if capping:
+            volume[[0, -1], :, :] = 0.0
+            volume[:, [0, -1], :] = 0.0
+            volume[:, :, [0, -1]] = 0.0
+        self.splatted = splatted
+
+        image = vtkImageData()
+        image.SetDimensions(nx, ny, nz)
+        image.SetOrigin(self.bounds[:, 0])
+        image.SetSpacing(spacing)
+        scalars = numpy_to_vtk(volume.ravel(), deep=False)
+        scalars.SetName('SplatterValues')
+        image.GetPointData().SetScalars(scalars)
+        return image
+
+
+def main():
+    file_name, number_of_points, memory, radius, jobs, accumulate_sum, value = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    start = time.perf_counter()
+    points = noisy_torus(number_of_points) if file_name is None else read_points(file_name)
+    splatter = SlabSplatter(points, radius, accumulate_sum)
+    print(f'{len(points)} points sorted in {time.perf_counter() - start:0.3f}s')
+
+    dims, depth = sample_dimensions(splatter.bounds, memory * 1024 * 1024, jobs)
+    start = time.perf_counter()
+    image = splatter.splat(dims, depth, jobs)
+    print(f'Splatted into {tuple(int(d) for d in dims)} samples, slabs of {depth},'
+          f' {splatter.splatted / len(points):0.2f} splats a point, in {time.perf_counter() - start:0.3f}s')
+
+    scalar_range = image.GetPointData().GetScalars().GetRange()
+    if value is None:
+        value = 0.1 * scalar_range[1]
+
+    surface = vtkFlyingEdges3D()
+    surface.SetInputData(image)
+    surface.SetValue(0, value)
+    surface.ComputeNormalsOn()
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputConnection(surface.GetOutputPort())
+    mapper.ScalarVisibilityOff()
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.GetProperty().SetColor(colors.GetColor3d('Wheat'))
+
+    renderer = vtkRenderer()
+    render_window = vtkRenderWindow()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(640, 480)
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    renderer.AddActor(actor)
+    renderer.SetBackground(colors.GetColor3d('SteelBlue'))
+    renderer.GetActiveCamera().Elevation(-45)
+    renderer.ResetCamera()
+
+    render_window.SetWindowName('ParallelGaussianSplat')
+    render_window.Render()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkPolyData
+)
+from vtkmodules.vtkFiltersCore import vtkDelaunay2D
+from vtkmodules.vtkIOImage import vtkImageReader2Factory
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Triangulate terrain: height fields directly as a grid, scattered points in tiles.'
+    epilogue = '''
+A height field, random as in TriangulateTerrainMap or read from an image (a DEM), is held
+ in a NumPy array and its triangles are made directly from the grid, no vtkDelaunay2D is needed.
+
+With -s the same number of scattered points are triangulated instead, with vtkDelaunay2D
+ run on overlapping tiles on several threads. Only the triangles that are certainly those
+ of the whole triangulation are kept from each tile, so the tiles join without seams.
+A frame of ghost points around the data keeps the overlaps small; the long thin triangles
+ vtkDelaunay2D would make along the convex hull are not made.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', nargs='?', default=None, help='An optional height image e.g. a DEM as a .png.')
+    parser.add_argument('-n', '--size', type=int, default=256, help='The number of samples along each side.')
+    parser.add_argument('-z', '--scale', type=float, default=3.0, help='The height of the terrain.')
+    parser.add_argument('-s', '--scattered', action='store_true', help='Triangulate scattered points.')
+    parser.add_argument('-t', '--tiles', type=int, default=4, help='The number of tiles along each side.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of tiles triangulated at once.')
+    args = parser.parse_args()
+    return args.filename, args.size, args.scale, args.scattered, args.tiles, args.jobs
+
+
+def random_heights(nx, ny, scale=3.0, seed=0):
+    """
+    Random heights in [0, scale) on an ny by nx grid, as TriangulateTerrainMap makes them.
+    """
+    return np.random.default_rng(seed).random((ny, nx)) * scale
+
+
+def image_heights(file_name, scale=1.0):
+    """
+    The heights in an image, e.g. a DEM, as an array indexed [y, x].
+
+    :param file_name: The image, the first component is used.
+    :param scale: The height of the largest value.
+    :return: The heights.
+    """
+    reader = vtkImageReader2Factory().CreateImageReader2(file_name)
+    if reader is None:
+        raise ValueError(f'No reader for {file_name}.')
+    reader.SetFileName(file_name)
+    reader.Update()
+    image = reader.GetOutput()
+    nx, ny, _ = image.GetDimensions()
+    scalars = vtk_to_numpy(image.GetPointData().GetScalars())
+    heights = scalars.reshape(ny, nx, -1)[..., 0].astype(np.float32)
+    top = heights.max()
+    return heights * (scale / top) if top > 0 else heights
+
+
+def cell_array(triangles):
+    """
+    A vtkCellArray of an (n, 3) array of point ids, without a loop over the cells.
+    """
+    cells = vtkCellArray()
+    offsets = np.arange(0, 3 * len(triangles) + 1, 3, dtype=np.int64)
+    cells.SetData(numpy_to_vtkIdTypeArray(offsets, deep=True),
+                  numpy_to_vtkIdTypeArray(np.ascontiguousarray(triangles, dtype=np.int64).ravel(), deep=True))
+    return cells
+
+
+def grid_triangles(nx, ny):
+    """
+    The triangles of a grid of nx by ny points, numbered along x first, two for each square.
+
+    :return: An ((nx - 1) * (ny - 1) * 2, 3) array of point ids.
+    """
+    i = np.arange(nx - 1)
+    j = np.arange(ny - 1)
+    # The lower left corner of each square.
+    p = (j[:, np.newaxis] * nx + i[np.newaxis, :]).ravel()
+    triangles = np.empty((2 * len(p), 3), dtype=np.int64)
+    triangles[0::2] = np.stack([p, p + 1, p + nx + 1], axis=1)
+    triangles[1::2] = np.stack([p, p + nx + 1, p + nx], axis=1)
+    return triangles
+
+
+def grid_terrain(heights, spacing=(1.0, 1.0), origin=(0.0, 0.0)):
+    """
+    The triangulated surface of a height field.
+
+    :param heights: The heights indexed [y, x].
+    :param spacing: The spacing of the samples along x and y.
+    :param origin: The position of heights[0, 0].
+    :return: The polydata, with the heights as point scalars.
+    """
+    ny, nx = heights.shape
+    xyz = np.empty((ny, nx, 3))
+    xyz[..., 0] = origin[0] + np.arange(nx) * spacing[0]
+    xyz[..., 1] = (origin[1] + np.arange(ny) * spacing[1])[:, np.newaxis]
+    xyz[..., 2] = heights
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(xyz.reshape(-1, 3), deep=True))
+
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetPolys(cell_array(grid_triangles(nx, ny)))
+    elevation = numpy_to_vtk(np.ascontiguousarray(heights, dtype=np.float32).ravel(), deep=True)
+    elevation.SetName('Elevation')
+    poly_data.GetPointData().SetScalars(elevation)
+    return poly_data
+
+
+def delaunay_triangles(xy):
+    """
+    The vtkDelaunay2D triangles of points.
+
+    :param xy: An (n, 2) array.
+    :return: An (m, 3) array of indices into xy.
+    """
+    xyz = np.zeros((len(xy), 3))
+    xyz[:, :2] = xy
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(xyz, deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    delaunay = vtkDelaunay2D()
+    delaunay.SetInputData(poly_data)
+    delaunay.Update()
+    polys = delaunay.GetOutput().GetPolys()
+    return vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3).astype(np.int64)
+
+
+def circumcircles(a, b, c):
+    """
+    The centres and radii of the circumcircles of triangles with corners a, b and c, (n, 2) arrays.
+    """
+    b = b - a
+    c = c - a
+    d = 2.0 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    d = np.where(d == 0.0, np.finfo(float).tiny, d)
+    bb = (b ** 2).sum(axis=1)
+    cc = (c ** 2).sum(axis=1)
+    ux = (c[:, 1] * bb - b[:, 1] * cc) / d
+    uy = (b[:, 0] * cc - c[:, 0] * bb) / d
+    return a + np.stack([ux, uy], axis=1), np.hypot(ux, uy)
+
+
+def tile_triangles(xy, core, bounds, margin):
+    """
+    The triangles of the whole Delaunay triangulation with their centroid in a tile.
+
+    The points within margin of the tile are triangulated. A triangle depends only
+     on the points in its circumcircle, so a triangle whose circumcircle lies within
+     the region triangulated is one of the whole triangulation. If any triangle of
+     the tile is not certain the margin is doubled and the tile triangulated again.
+
+    :param xy: All the points, an (n, 2) array.
+    :param core: The (x0, x1, y0, y1) tile, a triangle belongs to it if its centroid is in [x0, x1) x [y0, y1),
+                 or [x0, x1] at the edge of the bounds.
+    :param bounds: The bounds of all the points.
+    :param margin: The initial margin.
+    :return: An (m, 3) array of indices into xy.
+    """
+    x0, x1, y0, y1 = core
+    while True:
+        lo = np.array([x0 - margin, y0 - margin])
+        hi = np.array([x1 + margin, y1 + margin])
+        index = np.flatnonzero(np.all((xy >= lo) & (xy <= hi), axis=1))
+        if len(index) < 3:
+            return np.empty((0, 3), dtype=np.int64)
+        triangles = index[delaunay_triangles(xy[index])]
+        a, b, c = xy[triangles[:, 0]], xy[triangles[:, 1]], xy[triangles[:, 2]]
+        centroid = (a + b + c) / 3.0
+        owned = ((centroid[:, 0] >= x0) & ((centroid[:, 0] < x1) | (x1 >= bounds[1])) &
+                 (centroid[:, 1] >= y0) & ((centroid[:, 1] < y1) | (y1 >= bounds[3])))
+        triangles = triangles[owned]
+        centre, radius = circumcircles(a[owned], b[owned], c[owned])
+        # There are no points beyond the bounds, so a region reaching them is unbounded there.
+        lo = np.where(lo <= [bounds[0], bounds[2]], -np.inf, lo)
+        hi = np.where(hi >= [bounds[1], bounds[3]], np.inf, hi)
+        certain = np.all((centre - radius[:, np.newaxis] >= lo) & (centre + radius[:, np.newaxis] <= hi), axis=1)
+        if certain.all() or np.isinf(lo).all() and np.isinf(hi).all():
+            return triangles
+        margin *= 2.0
+
+
+def ghost_frame(bounds, spacing):
+    """
+    Points on a rectangle a spacing outside the bounds, a spacing apart.
+    """
+    x0, x1, y0, y1 = bounds[0] - spacing, bounds[1] + spacing, bounds[2] - spacing, bounds[3] + spacing
+    nx = int(np.ceil((x1 - x0) / spacing))
+    ny = int(np.ceil((y1 - y0) / spacing))
+    x = np.linspace(x0, x1, nx + 1)
+    y = np.linspace(y0, y1, ny + 1)[1:-1]
+    return np.concatenate([np.column_stack([x, np.full_like(x, y0)]), np.column_stack([x, np.full_like(x, y1)]),
+                           np.column_stack([np.full_like(y, x0), y]), np.column_stack([np.full_like(y, x1), y])])
+
+
+def scattered_terrain(xyz, tiles=4, jobs=4):
+    """
+    The Delaunay triangulation of scattered points, in tiles on several threads.
+
+    The points are surrounded by a frame of ghost points, which bounds the size
+     of every empty circle so a small margin around each tile is enough. The
+     triangles using a ghost point, where the long thin triangles along the convex
+     hull would be, are dropped. Every tile then agrees with the triangulation of
+     all the points and the frame, so the tiles join without gaps or overlaps.
+
+    :param xyz: The (n, 3) points, they are triangulated in x and y.
+    :param tiles: The number of tiles along x and y.
+    :param jobs: The number of tiles triangulated at once.
+    :return: The polydata, with the heights as point scalars.
+    """
+    n = len(xyz)
+    bounds = (xyz[:, 0].min(), xyz[:, 0].max(), xyz[:, 1].min(), xyz[:, 1].max())
+    # The mean spacing of the points.
+    spacing = np.sqrt((bounds[1] - bounds[0]) * (bounds[3] - bounds[2]) / n)
+    xy = np.concatenate([xyz[:, :2], ghost_frame(bounds, spacing)])
+    frame_bounds = (xy[:, 0].min(), xy[:, 0].max(), xy[:, 1].min(), xy[:, 1].max())
+    xs = np.linspace(bounds[0], bounds[1], tiles + 1)
+    ys = np.linspace(bounds[2], bounds[3], tiles + 1)
+    cores = [(xs[i], xs[i + 1], ys[j], ys[j + 1]) for j in range(tiles) for i in range(tiles)]
+    # Let the edge tiles own everything up to the frame.
+    cores = [(x0 if x0 > bounds[0] else frame_bounds[0], x1 if x1 < bounds[1] else frame_bounds[1],
+              y0 if y0 > bounds[2] else frame_bounds[2], y1 if y1 < bounds[3] else frame_bounds[3])
+             for x0, x1, y0, y1 in cores]
+    with ThreadPoolExecutor(max(1, jobs)) as executor:
+        parts = list(executor.map(lambda core: tile_triangles(xy, core, frame_bounds, 4.0 * spacing), cores))
+    triangles = np.concatenate(parts)
+    triangles = triangles[(triangles < n).all(axis=1)]
+
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(np.ascontiguousarray(xyz, dtype=float), deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetPolys(cell_array(triangles))
+    elevation = numpy_to_vtk(np.ascontiguousarray(xyz[:, 2], dtype=np.float32), deep=True)
+    elevation.SetName('Elevation')
+    poly_data.GetPointData().SetScalars(elevation)
+    return poly_data
+
+
+def main():
+    file_name, size, scale, scattered, tiles, jobs = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    start = time.perf_counter()
+    if file_name is None:
+        heights = random_heights(size, size, scale)
+    else:
+        heights = image_heights(file_name, scale)
+    ny, nx = heights.shape
+
+    if scattered:
+        rng = np.random.default_rng(1)
+        xy = rng.random((nx * ny, 2)) * [nx - 1, ny - 1]
+        # The heights at the nearest samples.
+        z = heights[np.rint(xy[:, 1]).astype(int), np.rint(xy[:, 0]).astype(int)]
+        terrain = scattered_terrain(np.column_stack([xy, z]), tiles, jobs)
+        how = f'{tiles}x{tiles} tiles of vtkDelaunay2D'
+    else:
+        terrain = grid_terrain(heights)
+        how = 'the grid'
+    print(f'{terrain.GetNumberOfPoints()} points, {terrain.GetNumberOfPolys()} triangles from {how}'
+          f' in {time.perf_counter() - start:0.3f}s')
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputData(terrain)
+    mapper.SetScalarRange(terrain.GetPointData().GetScalars().GetRange())
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+
+    renderer = vtkRenderer()
+    renderer.AddActor(actor)
+    renderer.SetBackground(colors.GetColor3d('Green'))
+    renderer.GetActiveCamera().Elevation(-50)
+    renderer.ResetCamera()
+
+    render_window = vtkRenderWindow()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(640, 480)
+    render_window.SetWindowName('TerrainTriangulation')
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    render_window.Render()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
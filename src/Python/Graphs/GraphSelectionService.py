@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import (
+    vtkSelection,
+    vtkSelectionNode
+)
+from vtkmodules.vtkFiltersSources import vtkGraphToPolyData
+from vtkmodules.vtkInfovisCore import vtkRandomGraphSource
+from vtkmodules.vtkInfovisLayout import (
+    vtkGraphLayout,
+    vtkSimple2DLayoutStrategy
+)
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Graph selections as NumPy arrays, with neighbourhood expansion.'
+    epilogue = '''
+Select vertices and edges with the mouse, the selection is reported as arrays.
+Press 'x' to expand the selection to the neighbouring vertices and their edges.
+
+The layout is computed once, the view only displays it.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-v', '--vertices', type=int, default=2000, help='The number of vertices.')
+    parser.add_argument('-e', '--edges', type=int, default=4000, help='The number of edges.')
+    args = parser.parse_args()
+    return args.vertices, args.edges
+
+
+def edge_array(graph):
+    """
+    The source and target vertices of every edge.
+
+    vtkGraphToPolyData makes a line for each edge, an array of the edge ids is
+     added to a shallow copy of the graph so the lines can be put in edge order.
+
+    :param graph: The graph.
+    :return: An (edges, 2) array.
+    """
+    copy = graph.NewInstance()
+    copy.ShallowCopy(graph)
+    edge_ids = numpy_to_vtkIdTypeArray(np.arange(graph.GetNumberOfEdges()), deep=True)
+    edge_ids.SetName('EdgeIndex')
+    copy.GetEdgeData().AddArray(edge_ids)
+
+    to_poly_data = vtkGraphToPolyData()
+    to_poly_data.SetInputData(copy)
+    to_poly_data.Update()
+    lines = to_poly_data.GetOutput()
+    connectivity = vtk_to_numpy(lines.GetLines().GetConnectivityArray()).reshape(-1, 2)
+    order = vtk_to_numpy(lines.GetCellData().GetArray('EdgeIndex'))
+    edges = np.empty_like(connectivity)
+    edges[order] = connectivity
+    return edges
+
+
+class GraphSelectionService:
+    """
+    Selections of a graph as NumPy arrays.
+
+    The vertex to edge adjacency is kept in compressed sparse row (CSR) form:
+     the neighbours of vertex v are neighbours[offsets[v]:offsets[v + 1]],
+     joined by the edges incident_edges[offsets[v]:offsets[v + 1]].
+     Edges are followed in both directions.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.number_of_vertices = graph.GetNumberOfVertices()
+        self.edges = edge_array(graph)
+
+        sources, targets = self.edges[:, 0], self.edges[:, 1]
+        edge_ids = np.arange(len(self.edges))
+        rows = np.concatenate([sources, targets])
+        order = np.argsort(rows, kind='stable')
+        self.neighbours = np.concatenate([targets, sources])[order]
+        self.incident_edges = np.concatenate([edge_ids, edge_ids])[order]
+        self.offsets = np.zeros(self.number_of_vertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.number_of_vertices), out=self.offsets[1:])
+
+        self.vertex_pedigree = self.pedigree_ids(graph.GetVertexData())
+        self.edge_pedigree = self.pedigree_ids(graph.GetEdgeData())
+
+    @staticmethod
+    def pedigree_ids(data):
+        """
+        The numeric pedigree ids and the order that sorts them, None if they are the indices.
+        """
+        ids = data.GetPedigreeIds()
+        if ids is None or not ids.IsNumeric():
+            return None
+        ids = vtk_to_numpy(ids)
+        if np.array_equal(ids, np.arange(len(ids))):
+            return None
+        order = np.argsort(ids)
+        return ids[order], order
+
+    @staticmethod
+    def to_indices(ids, pedigree):
+        if pedigree is None:
+            return ids
+        sorted_ids, order = pedigree
+        return order[np.searchsorted(sorted_ids, ids)]
+
+    def degree(self, vertices=None):
+        degrees = np.diff(self.offsets)
+        return degrees if vertices is None else degrees[vertices]
+
+    def selected(self, selection):
+        """
+        The ids in a selection, from a vtkGraphLayoutView.
+
+        :param selection: The vtkSelection.
+        :return: The vertex and edge indices as arrays.
+        """
+        vertices = [np.empty(0, dtype=np.int64)]
+        edges = [np.empty(0, dtype=np.int64)]
+        for i in range(selection.GetNumberOfNodes()):
+            node = selection.GetNode(i)
+            selection_list = node.GetSelectionList()
+            if selection_list is None or selection_list.GetNumberOfTuples() == 0:
+                continue
+            ids = vtk_to_numpy(selection_list).astype(np.int64)
+            pedigree = node.GetContentType() == vtkSelectionNode.PEDIGREEIDS
+            if node.GetFieldType() == vtkSelectionNode.VERTEX:
+                vertices.append(self.to_indices(ids, self.vertex_pedigree if pedigree else None))
+            elif node.GetFieldType() == vtkSelectionNode.EDGE:
+                edges.append(self.to_indices(ids, self.edge_pedigree if pedigree else None))
+        return np.unique(np.concatenate(vertices)), np.unique(np.concatenate(edges))
+
+    def expand(self, vertices, hops=1):
+        """
+        The vertices within hops edges of the vertices, and the edges reached.
+
+        :param vertices: The vertex indices.
+        :param hops: The number of edges to follow.
+        :return: The vertex and edge indices as arrays.
+        """
+        reached = np.zeros(self.number_of_vertices, dtype=bool)
+        reached[vertices] = True
+        edges = np.zeros(len(self.edges), dtype=bool)
+        frontier = np.flatnonzero(reached)
+        for _ in range(hops):
+            starts = self.offsets[frontier]
+            counts = self.offsets[frontier + 1] - starts
+            # The positions in the CSR arrays of all the entries of the frontier.
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            edges[self.incident_edges[positions]] = True
+            neighbours = self.neighbours[positions]
+            frontier = np.unique(neighbours[~reached[neighbours]])
+            reached[frontier] = True
+        return np.flatnonzero(reached), np.flatnonzero(edges)
+
+    @staticmethod
+    def as_selection(vertices, edges):
+        """
+        A selection of the vertex and edge indices.
+        """
+        selection = vtkSelection()
+        for field_type, ids in ((vtkSelectionNode.VERTEX, vertices), (vtkSelectionNode.EDGE, edges)):
+            node = vtkSelectionNode()
+            node.SetFieldType(field_type)
+            node.SetContentType(vtkSelectionNode.INDICES)
+            node.SetSelectionList(numpy_to_vtkIdTypeArray(np.asarray(ids, dtype=np.int64), deep=True))
+            selection.AddNode(node)
+        return selection
+
+
+def cached_layout(graph, strategy):
+    """
+    Lay out the graph once. The output carries the vertex positions as its points,
+     so a view using the pass through strategy never lays it out again.
+    """
+    layout = vtkGraphLayout()
+    layout.SetInputData(graph)
+    layout.SetLayoutStrategy(strategy)
+    layout.Update()
+    laid_out = layout.GetOutput().NewInstance()
+    laid_out.ShallowCopy(layout.GetOutput())
+    return laid_out
+
+
+class SelectionReporter:
+    """
+    Report the selection, and expand it when 'x' is pressed.
+    """
+
+    def __init__(self, service, link, view):
+        self.service = service
+        self.link = link
+        self.view = view
+        self.vertices = np.empty(0, dtype=np.int64)
+        self.edges = np.empty(0, dtype=np.int64)
+
+    def selection_changed(self, caller, event):
+        start = time.perf_counter()
+        self.vertices, self.edges = self.service.selected(caller.GetCurrentSelection())
+        elapsed = time.perf_counter() - start
+        degrees = self.service.degree(self.vertices)
+        print(f'{len(self.vertices)} vertices and {len(self.edges)} edges selected ({elapsed * 1000:0.2f}ms)')
+        if len(self.vertices):
+            print(f'  vertices: {self.vertices[:10]}{" ..." if len(self.vertices) > 10 else ""}')
+            print(f'  degree: min {degrees.min()}, mean {degrees.mean():0.2f}, max {degrees.max()}')
+        if len(self.edges):
+            print(f'  edges: {self.edges[:10]}{" ..." if len(self.edges) > 10 else ""}')
+
+    def key_press(self, caller, event):
+        if caller.GetKeySym() != 'x' or len(self.vertices) == 0:
+            return
+        start = time.perf_counter()
+        vertices, edges = self.service.expand(self.vertices)
+        print(f'Expanded to {len(vertices)} vertices in {(time.perf_counter() - start) * 1000:0.2f}ms')
+        # Setting the selection fires AnnotationChangedEvent, so the report is updated.
+        self.link.SetCurrentSelection(self.service.as_selection(vertices, np.union1d(edges, self.edges)))
+        self.view.Render()
+
+
+def main():
+    number_of_vertices, number_of_edges = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    source = vtkRandomGraphSource()
+    source.SetNumberOfVertices(number_of_vertices)
+    source.SetNumberOfEdges(number_of_edges)
+    source.SetSeed(123)
+    source.Update()
+
+    start = time.perf_counter()
+    service = GraphSelectionService(source.GetOutput())
+    print(f'Built the adjacency of {len(service.edges)} edges in {time.perf_counter() - start:0.3f}s')
+
+    start = time.perf_counter()
+    strategy = vtkSimple2DLayoutStrategy()
+    strategy.SetRandomSeed(0)
+    graph = cached_layout(source.GetOutput(), strategy)
+    print(f'Laid out {graph.GetNumberOfVertices()} vertices in {time.perf_counter() - start:0.3f}s')
+
+    view = vtkGraphLayoutView()
+    view.AddRepresentationFromInput(graph)
+    view.SetLayoutStrategyToPassThrough()
+    view.SetEdgeLayoutStrategyToPassThrough()
+    # Select by index, the ids are then the same as those of the service.
+    view.GetRepresentation(0).SetSelectionType(vtkSelectionNode.INDICES)
+    view.GetRenderer().SetBackground(colors.GetColor3d('Navy'))
+    view.GetRenderer().SetBackground2(colors.GetColor3d('MidnightBlue'))
+    view.GetRenderWindow().SetSize(600, 600)
+    view.GetRenderWindow().SetWindowName('GraphSelectionService')
+
+    link = view.GetRepresentation(0).GetAnnotationLink()
+    reporter = SelectionReporter(service, link, view)
+    link.AddObserver('AnnotationChangedEvent', reporter.selection_changed)
+    view.GetInteractor().AddObserver('KeyPressEvent', reporter.key_press)
+
+    view.ResetCamera()
+    view.Render()
+    view.GetInteractor().Start()
+
+
+if __name__ == '__main__':
+    main()
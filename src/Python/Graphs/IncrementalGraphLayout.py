@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkMutableUndirectedGraph
+from vtkmodules.vtkInfovisCore import vtkRandomGraphSource
+from vtkmodules.vtkViewsInfovis import vtkGraphLayoutView
+
+# The edges are read as NumPy arrays as in the GraphSelectionService example.
+from GraphSelectionService import edge_array
+
+LAYOUT_VERSION = 1
+
+
+def get_program_parameters():
+    import argparse
+    description = 'A force directed graph layout computed in a worker thread.'
+    epilogue = '''
+The repulsion between vertices uses a Barnes-Hut style approximation on NumPy arrays.
+The positions are shown as the layout progresses and the finished layout is saved,
+ keyed by a hash of the graph, so the next run with the same graph starts from it.
+
+Press 'a' to add vertices and edges, the layout continues from the current positions.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-v', '--vertices', type=int, default=5000, help='The number of vertices.')
+    parser.add_argument('-e', '--edges', type=int, default=6000, help='The number of edges.')
+    parser.add_argument('-i', '--iterations', type=int, default=300, help='The number of iterations.')
+    parser.add_argument('-c', '--cache_dir', default=None,
+                        help='The cache directory, the default is $VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.')
+    args = parser.parse_args()
+    return args.vertices, args.edges, args.iterations, args.cache_dir
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the layouts, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'graph-layouts'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def graph_hash(number_of_vertices, edges):
+    """
+    A hash of the number of vertices and the edges.
+
+    The edges are undirected, so the vertices of each edge are sorted first.
+    """
+    h = hashlib.sha256(f'layout-v{LAYOUT_VERSION}-{number_of_vertices}'.encode())
+    h.update(np.ascontiguousarray(np.sort(edges, axis=1), dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def load_layout(cache_dir, key):
+    path = cache_dir / f'{key}.npy'
+    return np.load(path) if path.is_file() else None
+
+
+def save_layout(cache_dir, key, positions):
+    path = cache_dir / f'{key}.npy'
+    tmp = path.with_suffix('.tmp.npy')
+    np.save(tmp, positions)
+    os.replace(tmp, path)
+
+
+def cell_forces(positions, cx, cy, valid, g, mass, centroids):
+    """
+    The forces on each vertex from the centres of mass of its candidate cells.
+
+    :param positions: The (N, 2) positions.
+    :param cx: The (N, K) x indices of the candidate cells.
+    :param cy: The (N, K) y indices of the candidate cells.
+    :param valid: The (N, K) mask of the candidates to use.
+    :param g: The number of cells along a side.
+    :param mass: The number of vertices in each cell.
+    :param centroids: The (g * g, 2) centres of mass.
+    :return: The (N, 2) forces.
+    """
+    keys = np.where(valid, cx * g + cy, 0)
+    m = np.where(valid, mass[keys], 0.0)
+    dx = positions[:, 0:1] - centroids[keys, 0]
+    dy = positions[:, 1:2] - centroids[keys, 1]
+    w = m / np.maximum(dx * dx + dy * dy, 1.0e-9)
+    return np.stack([(dx * w).sum(axis=1), (dy * w).sum(axis=1)], axis=1)
+
+
+def repulsion(positions, levels):
+    """
+    The repulsive forces 1 / d between all pairs of vertices, approximated on a quadtree.
+
+    At each level of the tree, a vertex interacts with the centres of mass of the
+     cells that are children of the neighbours of its parent cell but are not its
+     own neighbours. At the finest level it also interacts with the neighbouring
+     cells and with the rest of its own cell. Every level is a few gathers over
+     dense grids, so all the vertices are handled together.
+
+    :param positions: The (N, 2) positions.
+    :param levels: The depth of the quadtree.
+    :return: The (N, 2) forces.
+    """
+    lo = positions.min(axis=0)
+    size = max((positions.max(axis=0) - lo).max(), 1.0e-9) * 1.0001
+    unit = (positions - lo) / size
+    forces = np.zeros_like(positions)
+    # The children of the 3 x 3 neighbours of the parent, relative to the parent's first child.
+    children = np.array([(i, j) for i in range(-2, 4) for j in range(-2, 4)]).T
+    near = np.array([(i, j) for i in range(-1, 2) for j in range(-1, 2) if i or j]).T
+
+    for level in range(2, levels + 1):
+        g = 2 ** level
+        cells = np.minimum((unit * g).astype(np.int64), g - 1)
+        keys = cells[:, 0] * g + cells[:, 1]
+        mass = np.bincount(keys, minlength=g * g).astype(float)
+        centroids = np.stack([np.bincount(keys, weights=positions[:, i], minlength=g * g) for i in range(2)], axis=1)
+        centroids /= np.maximum(mass, 1.0)[:, np.newaxis]
+
+        first = cells // 2 * 2
+        cx = first[:, 0:1] + children[0]
+        cy = first[:, 1:2] + children[1]
+        valid = ((cx >= 0) & (cx < g) & (cy >= 0) & (cy < g)
+                 & ((np.abs(cx - cells[:, 0:1]) > 1) | (np.abs(cy - cells[:, 1:2]) > 1)))
+        forces += cell_forces(positions, cx, cy, valid, g, mass, centroids)
+
+        if level == levels:
+            cx = cells[:, 0:1] + near[0]
+            cy = cells[:, 1:2] + near[1]
+            valid = (cx >= 0) & (cx < g) & (cy >= 0) & (cy < g)
+            forces += cell_forces(positions, cx, cy, valid, g, mass, centroids)
+            # The rest of the vertex's own cell.
+            others = mass[keys] - 1.0
+            centre = (centroids[keys] * mass[keys, np.newaxis] - positions) / np.maximum(others, 1.0)[:, np.newaxis]
+            d = positions - centre
+            d2 = np.maximum((d * d).sum(axis=1), 1.0e-9)
+            forces += d * (others / d2)[:, np.newaxis]
+    return forces
+
+
+class ForceDirectedLayout:
+    """
+    Fruchterman-Reingold iterations on NumPy arrays, with the repulsion approximated by repulsion().
+    """
+
+    def __init__(self, number_of_vertices, edges, positions=None, temperature=None, levels=None, seed=0):
+        """
+        :param number_of_vertices: The number of vertices.
+        :param edges: An (E, 2) array of vertex indices.
+        :param positions: The starting (N, 2) positions, random if None.
+        :param temperature: The largest move of a vertex in the first iteration.
+        :param levels: The depth of the quadtree, by default about one vertex per cell.
+        :param seed: The seed for the random start.
+        """
+        self.edges = np.asarray(edges)
+        # The ideal edge length is one, the vertices fill a square of side about sqrt(N).
+        side = np.sqrt(number_of_vertices)
+        if positions is None:
+            positions = np.random.default_rng(seed).uniform(0.0, side, (number_of_vertices, 2))
+        self.positions = np.array(positions, dtype=float)
+        self.temperature = side / 10.0 if temperature is None else temperature
+        self.levels = levels or max(2, int(round(np.log2(max(number_of_vertices, 4)) / 2)))
+
+    def step(self, cooling=0.98):
+        forces = repulsion(self.positions, self.levels)
+        source, target = self.edges[:, 0], self.edges[:, 1]
+        d = self.positions[source] - self.positions[target]
+        length = np.linalg.norm(d, axis=1)
+        # The attraction d ** 2 along each edge.
+        pull = d * length[:, np.newaxis]
+        for i in range(2):
+            forces[:, i] -= np.bincount(source, weights=pull[:, i], minlength=len(self.positions))
+            forces[:, i] += np.bincount(target, weights=pull[:, i], minlength=len(self.positions))
+        magnitude = np.maximum(np.linalg.norm(forces, axis=1), 1.0e-9)
+        self.positions += forces * (np.minimum(magnitude, self.temperature) / magnitude)[:, np.newaxis]
+        self.temperature *= cooling
+
+
+class LayoutWorker(threading.Thread):
+    """
+    Run the layout in a thread, publishing the positions every few iterations.
+    """
+
+    def __init__(self, layout, iterations, publish_every=5, on_finish=None):
+        super().__init__(daemon=True)
+        self.layout = layout
+        self.iterations = iterations
+        self.publish_every = publish_every
+        self.on_finish = on_finish
+        self.lock = threading.Lock()
+        self.latest = None
+        self.iteration = 0
+        self.stopped = False
+        self.finished = False
+
+    def run(self):
+        for self.iteration in range(1, self.iterations + 1):
+            if self.stopped:
+                return
+            self.layout.step()
+            if self.iteration % self.publish_every == 0 or self.iteration == self.iterations:
+                with self.lock:
+                    self.latest = self.layout.positions.copy()
+        self.finished = True
+        if self.on_finish is not None:
+            self.on_finish(self.layout.positions)
+
+    def take(self):
+        """
+        The positions published since the last call, or None.
+        """
+        with self.lock:
+            latest, self.latest = self.latest, None
+        return latest
+
+    def stop(self):
+        self.stopped = True
+        self.join()
+
+
+class IncrementalLayoutView:
+    """
+    Show a graph in a vtkGraphLayoutView while it is laid out in a LayoutWorker.
+
+    The view uses the pass through layout strategy, the graph's points are a
+     NumPy array updated on a timer from the worker.
+    """
+
+    def __init__(self, view, graph, iterations, cache_dir):
+        self.view = view
+        self.graph = graph
+        self.iterations = iterations
+        self.cache_dir = cache_dir
+        self.edges = edge_array(graph)
+        self.xyz = np.zeros((graph.GetNumberOfVertices(), 3))
+        self.worker = None
+        self.rng = np.random.default_rng(1)
+
+    def key(self):
+        return graph_hash(self.graph.GetNumberOfVertices(), self.edges)
+
+    def set_positions(self, positions):
+        if len(positions) != len(self.xyz):
+            self.xyz = np.zeros((len(positions), 3))
+        self.xyz[:, :2] = positions
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(self.xyz))
+        self.graph.SetPoints(points)
+        self.graph.Modified()
+
+    def start(self, positions=None, temperature=None):
+        """
+        Use the cached layout of the graph, or lay it out starting from the positions.
+        """
+        key = self.key()
+        cached = load_layout(self.cache_dir, key)
+        if cached is not None and len(cached) == self.graph.GetNumberOfVertices():
+            print(f'Using the cached layout {key[:12]}')
+            self.set_positions(cached)
+            return
+        layout = ForceDirectedLayout(self.graph.GetNumberOfVertices(), self.edges, positions, temperature)
+        self.set_positions(layout.positions)
+        start = time.perf_counter()
+
+        def finished(final_positions):
+            save_layout(self.cache_dir, key, final_positions)
+            print(f'Laid out {len(final_positions)} vertices in {time.perf_counter() - start:0.2f}s,'
+                  f' saved as {key[:12]}')
+
+        self.worker = LayoutWorker(layout, self.iterations, on_finish=finished)
+        self.worker.start()
+
+    def add_vertices(self, number):
+        """
+        Add vertices, each joined to one or two existing vertices, and continue the layout.
+
+        The new vertices start at the mean position of their neighbours, the others
+         where they are, so only a short, cooler layout is needed.
+        """
+        positions = self.xyz[:, :2].copy()
+        if self.worker is not None:
+            self.worker.stop()
+            positions = self.worker.layout.positions.copy()
+        n = self.graph.GetNumberOfVertices()
+        new_edges = list()
+        for v in range(n, n + number):
+            self.graph.AddVertex()
+            for u in self.rng.choice(n, self.rng.integers(1, 3), replace=False):
+                self.graph.AddEdge(v, int(u))
+                new_edges.append((v, int(u)))
+        new_edges = np.array(new_edges)
+        self.edges = np.concatenate([self.edges, new_edges])
+
+        sums = np.zeros((number, 2))
+        counts = np.zeros(number)
+        np.add.at(sums, new_edges[:, 0] - n, positions[new_edges[:, 1]])
+        np.add.at(counts, new_edges[:, 0] - n, 1)
+        new_positions = sums / counts[:, np.newaxis] + self.rng.normal(0.0, 0.5, (number, 2))
+        self.start(np.concatenate([positions, new_positions]), temperature=1.0)
+
+    def __call__(self, caller, ev):
+        if ev == 'KeyPressEvent':
+            if caller.GetKeySym() == 'a':
+                self.add_vertices(max(1, self.graph.GetNumberOfVertices() // 20))
+                self.view.Render()
+            return
+        if self.worker is None:
+            return
+        positions = self.worker.take()
+        if positions is not None:
+            self.set_positions(positions)
+            self.view.GetRenderWindow().SetWindowName(f'IncrementalGraphLayout {self.worker.iteration}')
+            self.view.ResetCamera()
+            self.view.Render()
+
+
+def main():
+    number_of_vertices, number_of_edges, iterations, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    source = vtkRandomGraphSource()
+    source.SetNumberOfVertices(number_of_vertices)
+    source.SetNumberOfEdges(number_of_edges)
+    source.SetStartWithTree(True)
+    source.SetSeed(123)
+    # Without pedigree ids, vertices and edges can be added without adding their data.
+    source.GeneratePedigreeIdsOff()
+    source.Update()
+    graph = vtkMutableUndirectedGraph()
+    graph.DeepCopy(source.GetOutput())
+
+    view = vtkGraphLayoutView()
+    view.AddRepresentationFromInput(graph)
+    view.SetLayoutStrategyToPassThrough()
+    view.SetEdgeLayoutStrategyToPassThrough()
+    view.GetRenderer().SetBackground(colors.GetColor3d('Navy'))
+    view.GetRenderer().SetBackground2(colors.GetColor3d('MidnightBlue'))
+    view.GetRenderWindow().SetSize(800, 800)
+    view.GetRenderWindow().SetWindowName('IncrementalGraphLayout')
+
+    incremental = IncrementalLayoutView(view, graph, iterations, get_cache_dir(cache_dir))
+    incremental.start()
+
+    view.ResetCamera()
+    view.Render()
+    view.GetInteractor().AddObserver('TimerEvent', incremental)
+    view.GetInteractor().AddObserver('KeyPressEvent', incremental)
+    view.GetInteractor().CreateRepeatingTimer(100)
+    view.GetInteractor().Start()
+    if incremental.worker is not None:
+        incremental.worker.stop()
+
+
+if __name__ == '__main__':
+    main()
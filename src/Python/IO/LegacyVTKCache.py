@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from vtkmodules.vtkIOLegacy import vtkDataSetReader
+from vtkmodules.vtkIOXML import (
+    vtkXMLDataSetWriter,
+    vtkXMLGenericDataObjectReader
+)
+
+# Bump this if the conversion settings change so that old cache entries are ignored.
+CACHE_VERSION = 1
+
+# The XML file extension for each dataset type.
+XML_EXTENSIONS = {
+    'vtkImageData': '.vti',
+    'vtkPolyData': '.vtp',
+    'vtkRectilinearGrid': '.vtr',
+    'vtkStructuredGrid': '.vts',
+    'vtkStructuredPoints': '.vti',
+    'vtkUnstructuredGrid': '.vtu',
+}
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Convert legacy VTK files into a cache of compressed, appended binary XML files.'
+    epilogue = '''
+Legacy ASCII files are slow to parse. This script converts each legacy file once,
+ storing the XML equivalent in a cache directory keyed by a hash of the file contents.
+Later reads are served from the cached XML file.
+
+Pre-warm the cache for all the data used by the examples:
+   LegacyVTKCache.py src/Testing/Data
+
+The cache directory is, in order of precedence, the -c option,
+ the environment variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('paths', nargs='+',
+                        help='Legacy .vtk files or directories to search recursively for them.')
+    parser.add_argument('-c', '--cache_dir', default=None, help='The cache directory.')
+    parser.add_argument('-o', '--overwrite', action='store_true',
+                        help='Regenerate the cache entries even if they exist.')
+    parser.add_argument('-t', '--timing', action='store_true',
+                        help='Compare the legacy and cached read times.')
+
+    args = parser.parse_args()
+    return args.paths, args.cache_dir, args.overwrite, args.timing
+
+
+def main():
+    paths, cache_dir, overwrite, timing = get_program_parameters()
+
+    cache_dir = get_cache_dir(cache_dir)
+    file_names = list()
+    for p in map(Path, paths):
+        if p.is_dir():
+            file_names += sorted(p.rglob('*.vtk'))
+        elif p.is_file():
+            file_names.append(p)
+        else:
+            print(f'Ignoring {p}, it is not a file or directory.')
+    if not file_names:
+        print('No legacy files found.')
+        return
+
+    print(f'Cache directory: {cache_dir}')
+    for fn in file_names:
+        cached = warm_cache(fn, cache_dir, overwrite)
+        if cached is None:
+            print(f'{fn.name:>24s}: skipped, not a vtkDataSet.')
+            continue
+        if timing:
+            legacy_time = time_read(read_legacy, fn)
+            cached_time = time_read(read_xml, cached)
+            print(f'{fn.name:>24s}: legacy {legacy_time:8.4f}s, cached {cached_time:8.4f}s -> {cached.name}')
+        else:
+            print(f'{fn.name:>24s} -> {cached.name}')
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the cache directory, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The cache directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def file_hash(file_name, block_size=1 << 20):
+    """
+    Hash the contents of a file.
+
+    :param file_name: The file.
+    :param block_size: The number of bytes read at a time.
+    :return: The hexadecimal digest.
+    """
+    h = hashlib.sha256(f'legacy-v{CACHE_VERSION}'.encode())
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_legacy(file_name):
+    """
+    Read a legacy file keeping all the attribute arrays.
+
+    :param file_name: The legacy file.
+    :return: The dataset or None if the file does not contain a vtkDataSet.
+    """
+    reader = vtkDataSetReader()
+    reader.SetFileName(str(file_name))
+    # The cached file should have every array, not just the first of each type.
+    reader.ReadAllScalarsOn()
+    reader.ReadAllVectorsOn()
+    reader.ReadAllNormalsOn()
+    reader.ReadAllTensorsOn()
+    reader.ReadAllColorScalarsOn()
+    reader.ReadAllTCoordsOn()
+    reader.ReadAllFieldsOn()
+    reader.Update()
+    return reader.GetOutput()
+
+
+def read_xml(file_name):
+    reader = vtkXMLGenericDataObjectReader()
+    reader.SetFileName(str(file_name))
+    reader.Update()
+    return reader.GetOutput()
+
+
+def write_xml(data_set, file_name):
+    """
+    Write the dataset as appended, raw binary, zlib compressed XML.
+
+    The file is written to a temporary name and then renamed so that
+     a partially written file is never picked up as a cache entry.
+
+    :param data_set: The dataset.
+    :param file_name: The XML file.
+    :return:
+    """
+    tmp = file_name.with_name(f'{file_name.stem}.{os.getpid()}.tmp{file_name.suffix}')
+    writer = vtkXMLDataSetWriter()
+    writer.SetFileName(str(tmp))
+    writer.SetInputData(data_set)
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    writer.SetCompressorTypeToZLib()
+    if not writer.Write():
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f'Failed to write {file_name}')
+    os.replace(tmp, file_name)
+
+
+def find_cached(key, cache_dir):
+    """
+    Find the cache entry for a legacy file.
+
+    :param key: The hash of the legacy file.
+    :param cache_dir: The cache directory.
+    :return: The path to the cached XML file or None if it is not cached.
+    """
+    for ext in sorted(set(XML_EXTENSIONS.values())):
+        path = Path(cache_dir, f'{key}{ext}')
+        if path.is_file():
+            return path
+    return None
+
+
+def warm_cache(file_name, cache_dir, overwrite=False):
+    """
+    Ensure that a legacy file has a cache entry.
+
+    :param file_name: The legacy file.
+    :param cache_dir: The cache directory.
+    :param overwrite: If True, regenerate the cache entry.
+    :return: The path to the cached XML file or None if the file could not be cached.
+    """
+    key = file_hash(file_name)
+    if not overwrite:
+        path = find_cached(key, cache_dir)
+        if path is not None:
+            return path
+    data_set = read_legacy(file_name)
+    if data_set is None or data_set.GetClassName() not in XML_EXTENSIONS:
+        return None
+    path = Path(cache_dir, f'{key}{XML_EXTENSIONS[data_set.GetClassName()]}')
+    write_xml(data_set, path)
+    return path
+
+
+def read_cached(file_name, cache_dir=None):
+    """
+    Read a legacy file, converting it to XML the first time it is seen.
+
+    This can be used as a drop-in replacement for reading the legacy file directly, e.g.:
+       data_set = read_cached('src/Testing/Data/office.binary.vtk')
+
+    :param file_name: The legacy file.
+    :param cache_dir: The cache directory, see get_cache_dir().
+    :return: The dataset.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    key = file_hash(file_name)
+    path = find_cached(key, cache_dir)
+    if path is not None:
+        return read_xml(path)
+    data_set = read_legacy(file_name)
+    if data_set is not None and data_set.GetClassName() in XML_EXTENSIONS:
+        write_xml(data_set, Path(cache_dir, f'{key}{XML_EXTENSIONS[data_set.GetClassName()]}'))
+    return data_set
+
+
+def time_read(read_function, file_name):
+    start = time.perf_counter()
+    read_function(file_name)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
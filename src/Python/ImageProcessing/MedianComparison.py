@@ -47,7 +47,7 @@ def main():
     cast.Update()
 
     originalData = vtkImageData()
-    originalData.DeepCopy(cast.GetOutput())
+    originalData.ShallowCopy(cast.GetOutput())
 
     noisyData = vtkImageData()
 
@@ -181,7 +181,8 @@ def AddShotNoise(inputImage, outputImage, noiseAmplitude, noiseFraction, extent)
     add.SetInputConnection(1, shotNoise.GetOutputPort())
     add.SetOperationToAdd()
     add.Update()
-    outputImage.DeepCopy(add.GetOutput())
+    # The filters are not reused, so the output can share their data.
+    outputImage.ShallowCopy(add.GetOutput())
 
 
 if __name__ == '__main__':
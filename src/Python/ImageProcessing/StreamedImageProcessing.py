@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+from vtkmodules.vtkIOImage import vtkImageReader2Factory
+from vtkmodules.vtkImagingCore import vtkImageShrink3D
+from vtkmodules.vtkImagingGeneral import (
+    vtkImageGaussianSmooth,
+    vtkImageHybridMedian2D,
+    vtkImageMedian3D
+)
+from vtkmodules.vtkImagingMorphological import vtkImageDilateErode3D
+from vtkmodules.vtkInteractionStyle import vtkInteractorStyleImage
+from vtkmodules.vtkRenderingCore import (
+    vtkImageActor,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Run image filter chains out of core, in overlapping slabs sized from a memory budget.'
+    epilogue = '''
+Shot noise is added to an image, then it is smoothed by median, hybrid median and Gaussian filters
+ as in HybridMedianComparison and MedianComparison.
+Each chain is run slab by slab across threads into a preallocated output,
+ the slabs overlap by the radius of the kernels so the result is the same as for the whole image.
+
+Without a file a synthetic volume is used, its size is set with -s.
+Use -v to compare the streamed results with those of the whole image.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', nargs='?', default=None, help='An image e.g. TestPattern.png or FullHead.mhd.')
+    parser.add_argument('-s', '--size', type=int, default=256, help='The size of the synthetic volume.')
+    parser.add_argument('-m', '--memory', type=float, default=64.0, help='The memory budget for the slabs in MB.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of slabs processed at once.')
+    parser.add_argument('-v', '--verify', action='store_true', help='Compare with processing the whole image.')
+    args = parser.parse_args()
+    return args.filename, args.size, args.memory, args.jobs, args.verify
+
+
+# image_from_numpy and numpy_from_image are the helpers of the NumPyImageData example,
+#  keep the copies identical.
+def image_from_numpy(array, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0), name='Scalars', offset=(0, 0, 0)):
+    """
+    Wrap a NumPy array as the scalars of a vtkImageData without copying it.
+
+    The array is indexed [z, y, x] or [z, y, x, component], so x varies fastest as VTK expects.
+     It can be a np.memmap, the pages are then read as VTK touches them.
+
+    The VTK array keeps a reference to the NumPy array, so the array lives at least
+     as long as the image. The array must not be resized while the image is in use.
+
+    :param array: A C contiguous array with 3 or 4 dimensions.
+    :param spacing: The spacing of the image.
+    :param origin: The origin of the image.
+    :param name: The name of the scalars.
+    :param offset: The (x, y, z) index of the first voxel, so a slab keeps its place in a larger volume.
+    :return: The image.
+    """
+    if array.ndim == 3:
+        array = array[..., np.newaxis]
+    if array.ndim != 4:
+        raise ValueError(f'Expected an array indexed [z, y, x] or [z, y, x, component], got {array.ndim} dimensions.')
+    if not array.flags.c_contiguous:
+        raise ValueError('The array must be C contiguous to be wrapped without a copy.')
+    nz, ny, nx, nc = array.shape
+    scalars = numpy_to_vtk(array.reshape(-1, nc), deep=False)
+    scalars.SetName(name)
+    image = vtkImageData()
+    image.SetExtent(offset[0], offset[0] + nx - 1, offset[1], offset[1] + ny - 1, offset[2], offset[2] + nz - 1)
+    image.SetSpacing(spacing)
+    image.SetOrigin(origin)
+    image.GetPointData().SetScalars(scalars)
+    return image
+
+
+def numpy_from_image(image, name=None):
+    """
+    A NumPy view of the point data of an image, indexed [z, y, x] or [z, y, x, component].
+
+    The view keeps a reference to the VTK array.
+
+    :param image: The image.
+    :param name: The array name, the scalars if None.
+    :return: The view.
+    """
+    data = image.GetPointData()
+    vtk_array = data.GetScalars() if name is None else data.GetArray(name)
+    nx, ny, nz = image.GetDimensions()
+    array = vtk_to_numpy(vtk_array)
+    nc = vtk_array.GetNumberOfComponents()
+    return array.reshape((nz, ny, nx) if nc == 1 else (nz, ny, nx, nc))
+
+
+def kernel_radius(image_filter):
+    """
+    The number of voxels, along (x, y, z), an output voxel of the filter depends on either side.
+
+    :param image_filter: A configured filter.
+    :return: The radius along each axis.
+    """
+    if isinstance(image_filter, (vtkImageMedian3D, vtkImageDilateErode3D)):
+        return tuple(k // 2 for k in image_filter.GetKernelSize())
+    if isinstance(image_filter, vtkImageHybridMedian2D):
+        # A 5x5 neighbourhood in each slice.
+        return 2, 2, 0
+    if isinstance(image_filter, vtkImageGaussianSmooth):
+        radius = [math.ceil(s * f) for s, f in
+                  zip(image_filter.GetStandardDeviations(), image_filter.GetRadiusFactors())]
+        if image_filter.GetDimensionality() == 2:
+            radius[2] = 0
+        return tuple(radius)
+    if isinstance(image_filter, vtkImageShrink3D):
+        return tuple(s - 1 if image_filter.GetAveraging() or image_filter.GetMedian() else 0
+                     for s in image_filter.GetShrinkFactors())
+    raise ValueError(f'The kernel radius of {image_filter.GetClassName()} is not known.')
+
+
+def make_chain(factories, image):
+    """
+    Connect the filters made by the factories to the image.
+
+    :return: The filters, the first is connected to the image.
+    """
+    filters = [factory() for factory in factories]
+    filters[0].SetInputData(image)
+    for upstream, downstream in zip(filters, filters[1:]):
+        downstream.SetInputConnection(upstream.GetOutputPort())
+    return filters
+
+
+def chain_radius(factories):
+    """
+    The radius of the chain, the sum of the radii of its filters.
+    """
+    return tuple(int(sum(r)) for r in zip(*(kernel_radius(factory()) for factory in factories)))
+
+
+def output_shape(factories, shape):
+    """
+    The shape of the output of the chain for an input of shape [z, y, x], found without any data.
+    """
+    image = vtkImageData()
+    image.SetExtent(0, shape[2] - 1, 0, shape[1] - 1, 0, shape[0] - 1)
+    filters = make_chain(factories, image)
+    filters[-1].UpdateInformation()
+    extent = filters[-1].GetOutputInformation(0).Get(vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT())
+    return extent[5] - extent[4] + 1, extent[3] - extent[2] + 1, extent[1] - extent[0] + 1
+
+
+class SlabStreamer:
+    """
+    Run a chain of image filters over a large array in slabs.
+
+    The array is split along its slowest varying axis, z, or y for a single slice.
+     Each slab is extended by the radius of the chain on both sides, wrapped as a
+     vtkImageData without copying and run through its own instance of the chain
+     so slabs can be processed on several threads. Only the interior of the
+     result is copied into the preallocated output.
+
+    The depth of the slabs is chosen so that the slabs being processed at once,
+     with the outputs of every filter in the chain, fit in the memory budget.
+    """
+
+    def __init__(self, factories, memory_budget=256 * 2 ** 20, jobs=4):
+        """
+        :param factories: Functions returning the configured filters of the chain, in order.
+        :param memory_budget: The bytes for the slabs being processed.
+        :param jobs: The number of slabs processed at once.
+        """
+        self.factories = factories
+        self.memory_budget = memory_budget
+        self.jobs = max(1, jobs)
+        self.radius = chain_radius(factories)
+        self.lock = threading.Lock()
+        self.memory_in_use = 0
+        self.peak_memory = 0
+
+    def slab_depth(self, array, axis, output_itemsize):
+        """
+        The depth of a slab, without the overlap.
+        """
+        layer_voxels = array.size // array.shape[axis]
+        # The input slab, the output of each filter, at most double precision, and the output.
+        voxel_bytes = array.itemsize + 8 * len(self.factories) + output_itemsize
+        halo = self.radius[2 - axis]
+        depth = self.memory_budget // (self.jobs * layer_voxels * voxel_bytes) - 2 * halo
+        return int(max(1, min(array.shape[axis], depth)))
+
+    def process(self, array, output, axis, start, stop, spacing, origin):
+        halo = self.radius[2 - axis]
+        lo, hi = max(0, start - halo), min(array.shape[axis], stop + halo)
+        index = [slice(None)] * 3
+        index[axis] = slice(lo, hi)
+        # Only a copy if the slab is not contiguous, e.g. rows of a volume.
+        slab = np.ascontiguousarray(array[tuple(index)])
+        offset = [0, 0, 0]
+        offset[2 - axis] = lo
+        filters = make_chain(self.factories, image_from_numpy(slab, spacing, origin, offset=offset))
+        filters[-1].Update()
+
+        # The working set of this slab: the input and every intermediate result.
+        used = slab.nbytes + sum(f.GetOutput().GetActualMemorySize() * 1024 for f in filters)
+        with self.lock:
+            self.memory_in_use += used
+            self.peak_memory = max(self.peak_memory, self.memory_in_use)
+
+        result = filters[-1].GetOutput()
+        first = result.GetExtent()[2 * (2 - axis)]
+        index[axis] = slice(start - first, stop - first)
+        out_index = [slice(None)] * 3
+        out_index[axis] = slice(start, stop)
+        output[tuple(out_index)] = numpy_from_image(result)[tuple(index)]
+
+        with self.lock:
+            self.memory_in_use -= used
+
+    def run(self, array, output, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0)):
+        """
+        Filter the array into the output.
+
+        :param array: The input array indexed [z, y, x], e.g. a np.memmap.
+        :param output: The preallocated output, see output_shape().
+        :param spacing: The spacing of the image.
+        :param origin: The origin of the image.
+        :return: The number of slabs.
+        """
+        axis = 0 if array.shape[0] > 1 else 1
+        if output.shape[axis] != array.shape[axis]:
+            raise ValueError('The chain must not resample the axis the slabs are taken along.')
+        depth = self.slab_depth(array, axis, output.itemsize)
+        ranges = [(start, min(start + depth, array.shape[axis])) for start in range(0, array.shape[axis], depth)]
+        with ThreadPoolExecutor(self.jobs) as executor:
+            # Consume the results so exceptions in the workers are raised here.
+            list(executor.map(lambda r: self.process(array, output, axis, *r, spacing, origin), ranges))
+        return len(ranges)
+
+
+def add_shot_noise(array, output, amplitude, fraction, memory_budget=64 * 2 ** 20, seed=0):
+    """
+    Add shot noise, as AddShotNoise in MedianComparison, slab by slab and without a copy of the image.
+
+    A fraction of the voxels is increased by the amplitude, another fraction is
+     decreased by (amplitude - 1). The output can be the array.
+    """
+    layer_bytes = array[0].nbytes + output[0].nbytes
+    depth = int(max(1, memory_budget // max(layer_bytes, 1)))
+    for start in range(0, len(array), depth):
+        stop = min(start + depth, len(array))
+        noise = np.random.default_rng([seed, start]).random(array[start:stop].shape)
+        shot = np.where(noise > 1.0 - fraction, amplitude, 0.0)
+        shot[noise <= fraction] += 1.0 - amplitude
+        output[start:stop] = array[start:stop] + shot
+
+
+def read_image(file_name, size):
+    """
+    The image as an array indexed [z, y, x], a synthetic volume if there is no file.
+
+    :return: The array, spacing and origin.
+    """
+    if file_name is None:
+        z, y, x = np.ogrid[-1.0:1.0:size * 1j, -1.0:1.0:size * 1j, -1.0:1.0:size * 1j]
+        array = np.empty((size, size, size), dtype=np.float32)
+        for k in range(size):
+            # Nested shells and bars, thin features for the filters to preserve or remove.
+            r = np.sqrt(x ** 2 + y ** 2 + z[k] ** 2)
+            array[k] = 1000.0 * (np.cos(12.0 * r) > 0.0) + 500.0 * (np.abs(x) < 0.02)
+        return array, (1.0, 1.0, 1.0), (0.0, 0.0, 0.0)
+    reader = vtkImageReader2Factory().CreateImageReader2(file_name)
+    if reader is None:
+        raise ValueError(f'No reader for {file_name}.')
+    reader.SetFileName(file_name)
+    reader.Update()
+    image = reader.GetOutput()
+    if image.GetPointData().GetScalars().GetNumberOfComponents() != 1:
+        raise ValueError('Only single component images are handled.')
+    # A view of the reader's array, it is kept alive by the view.
+    return numpy_from_image(image), image.GetSpacing(), image.GetOrigin()
+
+
+def peak_resident_memory():
+    """
+    The peak resident memory of the process in MB, or None if unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KB elsewhere.
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def main():
+    file_name, size, memory, jobs, verify = get_program_parameters()
+    memory_budget = int(memory * 2 ** 20)
+
+    colors = vtkNamedColors()
+
+    original, spacing, origin = read_image(file_name, size)
+    volume = original.shape[0] > 1
+    lo, hi = float(original.min()), float(original.max())
+    print(f'Image of {original.shape[::-1]} voxels, {original.nbytes / 2 ** 20:0.1f} MB, range [{lo}, {hi}]')
+
+    noisy = np.empty(original.shape, dtype=np.float32)
+    add_shot_noise(original, noisy, 2000.0, 0.1, memory_budget)
+
+    def median():
+        f = vtkImageMedian3D()
+        f.SetKernelSize(5, 5, 3 if volume else 1)
+        return f
+
+    def hybrid_median():
+        return vtkImageHybridMedian2D()
+
+    def gaussian():
+        f = vtkImageGaussianSmooth()
+        f.SetDimensionality(3 if volume else 2)
+        f.SetStandardDeviations(2.0, 2.0, 2.0 if volume else 0.0)
+        f.SetRadiusFactors(2.0, 2.0, 2.0)
+        return f
+
+    chains = {
+        'Median': [median],
+        'Hybrid Median': [hybrid_median, hybrid_median],
+        'Gaussian': [gaussian],
+    }
+    results = dict()
+    for name, factories in chains.items():
+        output = np.empty(output_shape(factories, noisy.shape), dtype=noisy.dtype)
+        streamer = SlabStreamer(factories, memory_budget, jobs)
+        start = time.perf_counter()
+        count = streamer.run(noisy, output, spacing, origin)
+        print(f'{name}: {count} slabs, overlap {streamer.radius}, in {time.perf_counter() - start:0.3f}s,'
+              f' peak slab memory {streamer.peak_memory / 2 ** 20:0.1f} MB')
+        if verify:
+            filters = make_chain(factories, image_from_numpy(noisy, spacing=spacing, origin=origin))
+            filters[-1].Update()
+            difference = np.abs(numpy_from_image(filters[-1].GetOutput()) - output).max()
+            print(f'  maximum difference from the whole image: {difference}')
+        results[name] = output
+    peak = peak_resident_memory()
+    if peak is not None:
+        print(f'Peak resident memory of the process: {peak:0.1f} MB')
+
+    # Show the middle slice of the noisy image and the results.
+    middle = noisy.shape[0] // 2
+    color_window = (hi - lo) * 0.8
+    color_level = color_window / 2 + lo
+    renderers = list()
+    for name, array in [('Noisy', noisy)] + list(results.items()):
+        actor = vtkImageActor()
+        actor.GetMapper().SetInputData(image_from_numpy(array, spacing=spacing, origin=origin))
+        actor.GetProperty().SetColorWindow(color_window)
+        actor.GetProperty().SetColorLevel(color_level)
+        actor.GetProperty().SetInterpolationTypeToNearest()
+        nz, ny, nx = array.shape
+        actor.SetDisplayExtent(0, nx - 1, 0, ny - 1, middle, middle)
+        renderer = vtkRenderer()
+        renderer.AddActor(actor)
+        renderer.SetBackground(colors.GetColor3d('SlateGray'))
+        renderers.append(renderer)
+
+    renderer_size = 400
+    grid_dimensions = 2
+    render_window = vtkRenderWindow()
+    render_window.SetSize(renderer_size * grid_dimensions, renderer_size * grid_dimensions)
+    for index, renderer in enumerate(renderers):
+        row, col = divmod(index, grid_dimensions)
+        # (xmin, ymin, xmax, ymax)
+        renderer.SetViewport(col / grid_dimensions, (grid_dimensions - row - 1) / grid_dimensions,
+                             (col + 1) / grid_dimensions, (grid_dimensions - row) / grid_dimensions)
+        render_window.AddRenderer(renderer)
+    render_window.SetWindowName('StreamedImageProcessing')
+
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetInteractorStyle(vtkInteractorStyleImage())
+    interactor.SetRenderWindow(render_window)
+
+    # The renderers share one camera.
+    renderers[0].ResetCamera()
+    for renderer in renderers[1:]:
+        renderer.SetActiveCamera(renderers[0].GetActiveCamera())
+    render_window.Render()
+    interactor.Initialize()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
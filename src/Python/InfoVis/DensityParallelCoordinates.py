@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+# Parallel coordinates for large tables.
+# The lines between each pair of adjacent axes are binned and drawn as a
+# density image on a textured quad, only the lines of the current selection
+# are drawn individually.
+# Drag with the left mouse button along an axis to brush a range on it,
+# brushes on several axes are intersected.
+# Press 'c' to clear the brushes.
+
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingFreeType
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkImageData,
+    vtkPolyData
+)
+from vtkmodules.vtkFiltersCore import vtkElevationFilter
+from vtkmodules.vtkFiltersGeneral import vtkBrownianPoints
+from vtkmodules.vtkFiltersSources import vtkPlaneSource
+from vtkmodules.vtkImagingCore import vtkRTAnalyticSource
+from vtkmodules.vtkImagingGeneral import vtkImageGradient
+from vtkmodules.vtkInteractionStyle import vtkInteractorStyleImage
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer,
+    vtkTextActor,
+    vtkTexture
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Density parallel coordinates with brushing, for large tables.'
+    epilogue = '''
+The data are those of ParallelCoordinatesView, on a larger grid.
+With the default extent of 50 there are just over a million rows.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-e', '--extent', type=int, default=50, help='The half size of the grid.')
+    parser.add_argument('-b', '--bins', type=int, default=64, help='The number of bins on each axis.')
+    parser.add_argument('-m', '--max_lines', type=int, default=5000,
+                        help='The maximum number of selected lines drawn.')
+    args = parser.parse_args()
+    return args.extent, args.bins, args.max_lines
+
+
+def columns_from_point_data(data_set, names):
+    """
+    The arrays of the point data as columns, the magnitude is used for vectors.
+
+    :return: An (N, len(names)) array.
+    """
+    columns = list()
+    for name in names:
+        values = vtk_to_numpy(data_set.GetPointData().GetArray(name))
+        if values.ndim == 2:
+            values = np.linalg.norm(values, axis=1)
+        columns.append(values)
+    return np.stack(columns, axis=1)
+
+
+class ParallelCoordinatesDensity:
+    """
+    The binned representation of a table and the sorted indices used for brushing.
+    """
+
+    def __init__(self, table, bins=64, width=128, oversample=4):
+        """
+        :param table: An (N, axes) array.
+        :param bins: The number of bins on each axis.
+        :param width: The width in pixels of the image between two axes.
+        :param oversample: The height of a bin in pixels.
+        """
+        self.rows, self.axes = table.shape
+        lo = table.min(axis=0)
+        span = table.max(axis=0) - lo
+        span[span == 0] = 1.0
+        # The values normalised to [0, 1] on each axis.
+        self.values = (table - lo) / span
+        self.ranges = np.stack([lo, lo + span], axis=1)
+        self.bins = bins
+        self.width = width
+        self.oversample = oversample
+
+        # Per axis sorted indices, a brush is answered by two binary searches.
+        self.order = np.argsort(self.values, axis=0, kind='stable')
+        self.sorted_values = np.take_along_axis(self.values, self.order, axis=0)
+
+        b = np.minimum((self.values * bins).astype(np.intp), bins - 1)
+        self.histograms = [np.bincount(b[:, i] * bins + b[:, i + 1], minlength=bins * bins).reshape(bins, bins)
+                           for i in range(self.axes - 1)]
+
+    def band_image(self, histogram):
+        """
+        Rasterise the bands between two axes.
+
+        The band from bin a on the left axis to bin b on the right axis has
+         the height of a bin everywhere, so it covers oversample rows in each
+         column of the image.
+
+        :param histogram: The (bins, bins) counts.
+        :return: The (bins * oversample, width) accumulated counts.
+        """
+        height = self.bins * self.oversample
+        a, b = np.nonzero(histogram)
+        counts = histogram[a, b]
+        t = (np.arange(self.width) + 0.5) / self.width
+        bottom = np.outer(a, 1.0 - t) + np.outer(b, t)
+        first_row = np.rint(bottom * self.oversample).astype(np.intp)
+        rows = first_row[:, :, np.newaxis] + np.arange(self.oversample)
+        rows = np.minimum(rows, height - 1)
+        columns = np.broadcast_to(np.arange(self.width)[:, np.newaxis], rows.shape)
+        weights = np.broadcast_to(counts[:, np.newaxis, np.newaxis], rows.shape)
+        image = np.bincount((rows * self.width + columns).ravel(), weights=weights.ravel(),
+                            minlength=height * self.width)
+        return image.reshape(height, self.width)
+
+    def band_images(self, color):
+        """
+        The RGBA images, one between each pair of adjacent axes.
+
+        The opacity is the log of the density, scaled by its maximum over all the images.
+        """
+        images = [np.log1p(self.band_image(h)) for h in self.histograms]
+        scale = max(image.max() for image in images) or 1.0
+        rgba = list()
+        for image in images:
+            pixels = np.empty(image.shape + (4,), dtype=np.uint8)
+            pixels[..., :3] = np.asarray(color) * 255
+            pixels[..., 3] = np.sqrt(image / scale) * 255
+            rgba.append(pixels)
+        return rgba
+
+    def brush(self, brushes):
+        """
+        The rows selected by all the brushes.
+
+        :param brushes: A dictionary of axis: (low, high), in normalised values.
+        :return: The sorted row indices.
+        """
+        if not brushes:
+            return np.empty(0, dtype=np.intp)
+        candidates = dict()
+        for axis, (low, high) in brushes.items():
+            start = np.searchsorted(self.sorted_values[:, axis], low, side='left')
+            stop = np.searchsorted(self.sorted_values[:, axis], high, side='right')
+            candidates[axis] = self.order[start:stop, axis]
+        # Start from the smallest set and only test those rows against the other brushes.
+        axis = min(candidates, key=lambda k: len(candidates[k]))
+        selected = candidates[axis]
+        for other, (low, high) in brushes.items():
+            if other != axis:
+                v = self.values[selected, other]
+                selected = selected[(v >= low) & (v <= high)]
+        return np.sort(selected)
+
+
+def textured_quad(image, x):
+    """
+    A unit square from axis x to axis x + 1 with the image as its texture.
+    """
+    height, width = image.shape[:2]
+    texture_image = vtkImageData()
+    texture_image.SetDimensions(width, height, 1)
+    pixels = numpy_to_vtk(image.reshape(-1, 4), deep=True)
+    texture_image.GetPointData().SetScalars(pixels)
+    texture = vtkTexture()
+    texture.SetInputData(texture_image)
+    texture.InterpolateOn()
+    texture.SetColorModeToDirectScalars()
+
+    plane = vtkPlaneSource()
+    plane.SetOrigin(x, 0.0, 0.0)
+    plane.SetPoint1(x + 1.0, 0.0, 0.0)
+    plane.SetPoint2(x, 1.0, 0.0)
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputConnection(plane.GetOutputPort())
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.SetTexture(texture)
+    actor.GetProperty().LightingOff()
+    return actor
+
+
+def polylines(values, z=0.0):
+    """
+    One polyline per row, the axes are at x = 0, 1, 2 ...
+
+    :param values: An (N, axes) array of normalised values.
+    :return: The polydata.
+    """
+    n, axes = values.shape
+    xyz = np.empty((n, axes, 3))
+    xyz[..., 0] = np.arange(axes)
+    xyz[..., 1] = values
+    xyz[..., 2] = z
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(xyz.reshape(-1, 3), deep=True))
+    lines = vtkCellArray()
+    lines.SetData(numpy_to_vtkIdTypeArray(np.arange(0, n * axes + 1, axes), deep=True),
+                  numpy_to_vtkIdTypeArray(np.arange(n * axes), deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetLines(lines)
+    return poly_data
+
+
+def axis_lines(axes):
+    """
+    A vertical line for each axis.
+    """
+    xyz = np.zeros((axes, 2, 3))
+    xyz[..., 0] = np.arange(axes)[:, np.newaxis]
+    xyz[:, 1, 1] = 1.0
+    xyz[..., 2] = 0.005
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(xyz.reshape(-1, 3), deep=True))
+    lines = vtkCellArray()
+    lines.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 2 * axes + 1, 2), deep=True),
+                  numpy_to_vtkIdTypeArray(np.arange(2 * axes), deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetLines(lines)
+    return poly_data
+
+
+def brush_rectangles(brushes, z=0.02, half_width=0.04):
+    """
+    An outline for each brush.
+    """
+    xyz = list()
+    for axis, (low, high) in brushes.items():
+        xyz += [(axis - half_width, low, z), (axis + half_width, low, z),
+                (axis + half_width, high, z), (axis - half_width, high, z)]
+    n = len(brushes)
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(np.array(xyz, dtype=float).reshape(-1, 3), deep=True))
+    connectivity = np.arange(4 * n).reshape(n, 4)
+    connectivity = np.concatenate([connectivity, connectivity[:, :1]], axis=1).ravel()
+    lines = vtkCellArray()
+    lines.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 5 * n + 1, 5), deep=True),
+                  numpy_to_vtkIdTypeArray(connectivity, deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points)
+    poly_data.SetLines(lines)
+    return poly_data
+
+
+class BrushCallback:
+    """
+    Brush a range along an axis with the left mouse button.
+    """
+
+    def __init__(self, renderer, density, selection_mapper, brush_mapper, text, max_lines):
+        self.renderer = renderer
+        self.density = density
+        self.selection_mapper = selection_mapper
+        self.brush_mapper = brush_mapper
+        self.text = text
+        self.max_lines = max_lines
+        self.brushes = dict()
+        self.axis = None
+        self.start = None
+        self.rng = np.random.default_rng(42)
+        self.update_selection()
+
+    def world_point(self, interactor):
+        x, y = interactor.GetEventPosition()
+        self.renderer.SetDisplayPoint(x, y, 0)
+        self.renderer.DisplayToWorld()
+        wx, wy, wz, w = self.renderer.GetWorldPoint()
+        return wx / w, wy / w
+
+    def press(self, caller, ev):
+        x, y = self.world_point(caller.GetInteractor())
+        axis = int(round(x))
+        if 0 <= axis < self.density.axes and abs(x - axis) < 0.25:
+            self.axis = axis
+            self.start = min(max(y, 0.0), 1.0)
+
+    def move(self, caller, ev):
+        if self.axis is None:
+            caller.OnMouseMove()
+            return
+        x, y = self.world_point(caller.GetInteractor())
+        y = min(max(y, 0.0), 1.0)
+        self.brushes[self.axis] = (min(self.start, y), max(self.start, y))
+        self.update_selection()
+        caller.GetInteractor().Render()
+
+    def release(self, caller, ev):
+        self.axis = None
+
+    def key(self, caller, ev):
+        if caller.GetKeySym() == 'c':
+            self.brushes.clear()
+            self.update_selection()
+            caller.Render()
+
+    def update_selection(self):
+        start = time.perf_counter()
+        selected = self.density.brush(self.brushes)
+        elapsed = time.perf_counter() - start
+        shown = selected
+        if len(shown) > self.max_lines:
+            shown = np.sort(self.rng.choice(shown, self.max_lines, replace=False))
+        self.selection_mapper.SetInputData(polylines(self.density.values[shown], z=0.01))
+        self.brush_mapper.SetInputData(brush_rectangles(self.brushes))
+        self.text.SetInput(f'{len(selected)} of {self.density.rows} rows selected in {elapsed * 1000:0.1f}ms,'
+                           f' {len(shown)} drawn')
+
+
+def main():
+    extent, bins, max_lines = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    # The pipeline of ParallelCoordinatesView on a larger grid.
+    rt = vtkRTAnalyticSource()
+    rt.SetWholeExtent(-extent, extent, -extent, extent, -extent, extent)
+    grad = vtkImageGradient()
+    grad.SetDimensionality(3)
+    grad.SetInputConnection(rt.GetOutputPort())
+    brown = vtkBrownianPoints()
+    brown.SetMinimumSpeed(0.5)
+    brown.SetMaximumSpeed(1.0)
+    brown.SetInputConnection(grad.GetOutputPort())
+    elev = vtkElevationFilter()
+    elev.SetLowPoint(-extent, -extent, -extent)
+    elev.SetHighPoint(extent, extent, extent)
+    elev.SetInputConnection(brown.GetOutputPort())
+    elev.Update()
+
+    names = ['RTDataGradient', 'RTData', 'Elevation', 'BrownianVectors']
+    table = columns_from_point_data(elev.GetOutput(), names)
+
+    start = time.perf_counter()
+    density = ParallelCoordinatesDensity(table, bins)
+    images = density.band_images(colors.GetColor3d('MistyRose'))
+    print(f'Binned {density.rows} rows in {time.perf_counter() - start:0.3f}s')
+
+    renderer = vtkRenderer()
+    renderer.GradientBackgroundOn()
+    renderer.SetBackground2(colors.GetColor3d('DarkBlue'))
+    renderer.SetBackground(colors.GetColor3d('MidnightBlue'))
+
+    for i, image in enumerate(images):
+        renderer.AddActor(textured_quad(image, i))
+
+    axes_mapper = vtkPolyDataMapper()
+    axes_mapper.SetInputData(axis_lines(density.axes))
+    axes_actor = vtkActor()
+    axes_actor.SetMapper(axes_mapper)
+    axes_actor.GetProperty().SetColor(colors.GetColor3d('Gold'))
+    axes_actor.GetProperty().SetLineWidth(2)
+    renderer.AddActor(axes_actor)
+
+    for i, name in enumerate(names):
+        label = vtkTextActor()
+        label.SetInput(f'{name}\n[{density.ranges[i, 0]:0.3g}, {density.ranges[i, 1]:0.3g}]')
+        label.GetTextProperty().SetJustificationToCentered()
+        label.GetTextProperty().SetColor(colors.GetColor3d('Gold'))
+        label.GetPositionCoordinate().SetCoordinateSystemToWorld()
+        label.GetPositionCoordinate().SetValue(i, -0.12, 0.0)
+        renderer.AddActor(label)
+
+    selection_mapper = vtkPolyDataMapper()
+    selection_actor = vtkActor()
+    selection_actor.SetMapper(selection_mapper)
+    selection_actor.GetProperty().SetColor(colors.GetColor3d('Gold'))
+    selection_actor.GetProperty().SetOpacity(0.5)
+    renderer.AddActor(selection_actor)
+
+    brush_mapper = vtkPolyDataMapper()
+    brush_actor = vtkActor()
+    brush_actor.SetMapper(brush_mapper)
+    brush_actor.GetProperty().SetColor(colors.GetColor3d('Tomato'))
+    brush_actor.GetProperty().SetLineWidth(2)
+    renderer.AddActor(brush_actor)
+
+    text = vtkTextActor()
+    text.SetDisplayPosition(10, 10)
+    text.GetTextProperty().SetFontSize(14)
+    renderer.AddActor(text)
+
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    ren_win.SetSize(900, 450)
+    ren_win.SetWindowName('DensityParallelCoordinates')
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    # Pan with the middle button and zoom with the right button, the left button is for brushing.
+    style = vtkInteractorStyleImage()
+    iren.SetInteractorStyle(style)
+    callback = BrushCallback(renderer, density, selection_mapper, brush_mapper, text, max_lines)
+    style.AddObserver('LeftButtonPressEvent', callback.press)
+    style.AddObserver('MouseMoveEvent', callback.move)
+    style.AddObserver('LeftButtonReleaseEvent', callback.release)
+    iren.AddObserver('KeyPressEvent', callback.key)
+
+    renderer.GetActiveCamera().ParallelProjectionOn()
+    renderer.ResetCamera(-0.3, density.axes - 0.7, -0.2, 1.05, 0.0, 0.0)
+    ren_win.Render()
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
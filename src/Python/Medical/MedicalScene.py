@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkCommonDataModel import (
+    vtkImageData,
+    vtkPolyData
+)
+from vtkmodules.vtkFiltersCore import (
+    vtkAppendPolyData,
+    vtkFlyingEdges3D
+)
+from vtkmodules.vtkFiltersModeling import vtkOutlineFilter
+from vtkmodules.vtkIOImage import vtkMetaImageReader
+from vtkmodules.vtkIOXML import (
+    vtkXMLPolyDataReader,
+    vtkXMLPolyDataWriter
+)
+from vtkmodules.vtkInteractionWidgets import (
+    vtkSliderRepresentation2D,
+    vtkSliderWidget
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkCamera,
+    vtkPolyDataMapper,
+    vtkProperty,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# Bump this if the way the surfaces are extracted changes so that old cache entries are ignored.
+CACHE_VERSION = 1
+
+
+def get_program_parameters():
+    import argparse
+    description = 'The skin and bone of MedicalDemo2, from a volume read once, with cached surfaces and a fast iso scrub.'
+    epilogue = '''
+The volume is read once and all the iso-surfaces are extracted concurrently with
+ vtkFlyingEdges3D. Each surface is cached on disk, keyed by a hash of the volume
+ and the iso value, so the next run with the same volume only reads them.
+
+The slider scrubs the iso value of the first surface. A scrub uses an index of the
+ minimum and maximum value in each brick of the volume, and only extracts the
+ bricks that the iso value passes through.
+
+The cache directory is, in order of precedence, the -c option,
+ the environment variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', help='FullHead.mhd.')
+    parser.add_argument('-i', '--iso_values', type=float, nargs='+', default=[500.0, 1150.0],
+                        help='The iso values, the skin and bone of MedicalDemo2 by default.')
+    parser.add_argument('-b', '--brick', type=int, default=32, help='The size of a brick of the scrub index.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of extractions run at once.')
+    parser.add_argument('-c', '--cache_dir', default=None, help='The cache directory.')
+    args = parser.parse_args()
+    return args.filename, args.iso_values, args.brick, args.jobs, args.cache_dir
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the surfaces, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'iso-surfaces'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def volume_key(image):
+    """
+    Hash the geometry and the scalars of an image.
+    """
+    h = hashlib.sha256(f'iso-v{CACHE_VERSION}:{image.GetExtent()}:{image.GetSpacing()}:{image.GetOrigin()}'.encode())
+    h.update(vtk_to_numpy(image.GetPointData().GetScalars()).tobytes())
+    return h.hexdigest()
+
+
+def extract(image, iso_value):
+    """
+    The iso-surface of an image, with its own vtkFlyingEdges3D so that it may run on any thread.
+    """
+    extractor = vtkFlyingEdges3D()
+    extractor.SetInputData(image)
+    extractor.SetValue(0, iso_value)
+    extractor.ComputeNormalsOn()
+    extractor.ComputeScalarsOff()
+    extractor.Update()
+    return extractor.GetOutput()
+
+
+class BrickIndex:
+    """
+    The range of the values of the cells in each brick of a volume, for extracting an iso-surface from fewer bricks.
+
+    A brick holds brick x brick x brick cells, neighbouring bricks share a layer of
+     samples so every cell is in exactly one brick. A brick whose range does not
+     hold the iso value has no part of the surface and is skipped.
+    """
+
+    def __init__(self, image, brick=32):
+        """
+        :param image: The volume.
+        :param brick: The number of cells along each side of a brick.
+        """
+        self.image = image
+        self.brick = brick
+        nx, ny, nz = image.GetDimensions()
+        self.volume = vtk_to_numpy(image.GetPointData().GetScalars()).reshape(nz, ny, nx)
+        # The range of the eight samples of each cell.
+        v = self.volume
+        corners = [v[k:k + nz - 1, j:j + ny - 1, i:i + nx - 1] for k in (0, 1) for j in (0, 1) for i in (0, 1)]
+        cell_min = np.minimum.reduce(corners)
+        cell_max = np.maximum.reduce(corners)
+        # Reduce the cells over the bricks, along each axis in turn.
+        self.starts = [np.arange(0, n - 1, brick) for n in (nz, ny, nx)]
+        for axis, starts in enumerate(self.starts):
+            cell_min = np.minimum.reduceat(cell_min, starts, axis=axis)
+            cell_max = np.maximum.reduceat(cell_max, starts, axis=axis)
+        self.brick_min = cell_min
+        self.brick_max = cell_max
+
+    def active_runs(self, iso_value):
+        """
+        The runs of neighbouring bricks along x that the iso value passes through.
+
+        A run is extracted as one block, so there are fewer, larger, extractions.
+
+        :return: A list of (k, j, i0, i1), the bricks i0 to i1 inclusive of row (k, j).
+        """
+        active = (self.brick_min <= iso_value) & (self.brick_max >= iso_value)
+        runs = list()
+        for k, j in zip(*np.nonzero(active.any(axis=2))):
+            # The starts and ends of the runs of True in the row.
+            edges = np.diff(np.concatenate([[0], active[k, j].astype(np.int8), [0]]))
+            for i0, i1 in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1):
+                runs.append((k, j, i0, i1))
+        return runs
+
+    def block_image(self, k, j, i0, i1):
+        """
+        The samples of bricks i0 to i1 of row (k, j), a copy with the extent they have in the volume.
+        """
+        nx, ny, nz = self.image.GetDimensions()
+        z0, y0, x0 = self.starts[0][k], self.starts[1][j], self.starts[2][i0]
+        z1 = min(z0 + self.brick, nz - 1)
+        y1 = min(y0 + self.brick, ny - 1)
+        x1 = min(self.starts[2][i1] + self.brick, nx - 1)
+        x_min, _, y_min, _, z_min, _ = self.image.GetExtent()
+        image = vtkImageData()
+        image.SetExtent(x_min + x0, x_min + x1, y_min + y0, y_min + y1, z_min + z0, z_min + z1)
+        image.SetOrigin(self.image.GetOrigin())
+        image.SetSpacing(self.image.GetSpacing())
+        samples = np.ascontiguousarray(self.volume[z0:z1 + 1, y0:y1 + 1, x0:x1 + 1])
+        image.GetPointData().SetScalars(numpy_to_vtk(samples.ravel(), deep=True))
+        return image
+
+
+class MedicalScene:
+    """
+    Iso-surfaces of a volume that is read once.
+
+    The surfaces are cached on disk, keyed by the hash of the volume and the iso value.
+     Surfaces that are not cached are extracted concurrently, each by its own filter.
+    """
+
+    def __init__(self, file_name, cache_dir=None, jobs=4, brick=32):
+        """
+        :param file_name: The volume, e.g. FullHead.mhd.
+        :param cache_dir: The cache directory, see get_cache_dir().
+        :param jobs: The number of extractions run at once.
+        :param brick: The size of a brick of the scrub index.
+        """
+        reader = vtkMetaImageReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        self.image = reader.GetOutput()
+        self.key = volume_key(self.image)
+        self.path = get_cache_dir(cache_dir)
+        self.executor = ThreadPoolExecutor(max(1, jobs))
+        self.brick = brick
+        self.index = None
+
+    def surface_file(self, iso_value):
+        # repr() round trips, distinct iso values never share a file.
+        return self.path / f'{self.key}-{float(iso_value)!r}.vtp'
+
+    def surface(self, iso_value):
+        """
+        The iso-surface read from the cache, or extracted and written to it.
+        """
+        file_name = self.surface_file(iso_value)
+        if file_name.is_file():
+            reader = vtkXMLPolyDataReader()
+            reader.SetFileName(file_name)
+            reader.Update()
+            return reader.GetOutput()
+        surface = extract(self.image, iso_value)
+        # Write under a temporary name so that a partly written file is never read.
+        tmp = file_name.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.vtp')
+        writer = vtkXMLPolyDataWriter()
+        writer.SetFileName(tmp)
+        writer.SetInputData(surface)
+        if not writer.Write():
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(f'Failed to write {file_name}')
+        os.replace(tmp, file_name)
+        return surface
+
+    def surfaces(self, iso_values):
+        """
+        The iso-surfaces for all the iso values, extracted or read concurrently.
+        """
+        return list(self.executor.map(self.surface, iso_values))
+
+    def scrub(self, iso_value):
+        """
+        An iso-surface extracted only from the bricks that hold it, for scrubbing.
+
+        The brick index is built on the first scrub. The surface is not cached and the
+         points on the faces between bricks are not merged.
+
+        :return: The surface and the number of bricks extracted.
+        """
+        if self.index is None:
+            self.index = BrickIndex(self.image, self.brick)
+        runs = self.index.active_runs(iso_value)
+        parts = list(self.executor.map(lambda run: extract(self.index.block_image(*run), iso_value), runs))
+        bricks = sum(i1 - i0 + 1 for _, _, i0, i1 in runs)
+        if not parts:
+            return vtkPolyData(), 0
+        append = vtkAppendPolyData()
+        for part in parts:
+            append.AddInputData(part)
+        append.Update()
+        return append.GetOutput(), bricks
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class ScrubCallback:
+    """
+    Show the surface at the iso value of the slider.
+    """
+
+    def __init__(self, scene, mapper):
+        self.scene = scene
+        self.mapper = mapper
+
+    def __call__(self, caller, ev):
+        iso_value = caller.GetRepresentation().GetValue()
+        start = time.perf_counter()
+        surface, bricks = self.scene.scrub(iso_value)
+        self.mapper.SetInputData(surface)
+        print(f'Iso value {iso_value:0.0f}: {surface.GetNumberOfPolys()} triangles from {bricks} bricks'
+              f' in {time.perf_counter() - start:0.3f}s')
+
+
+def make_slider(interactor, value_min, value_max, value):
+    colors = vtkNamedColors()
+    slider = vtkSliderRepresentation2D()
+    slider.SetMinimumValue(value_min)
+    slider.SetMaximumValue(value_max)
+    slider.SetValue(value)
+    slider.SetTitleText('Iso value')
+    slider.SetLabelFormat('%0.0f')
+    slider.GetPoint1Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint1Coordinate().SetValue(0.1, 0.1)
+    slider.GetPoint2Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint2Coordinate().SetValue(0.9, 0.1)
+    slider.GetTubeProperty().SetColor(colors.GetColor3d('LightSlateGray'))
+    slider.GetSliderProperty().SetColor(colors.GetColor3d('Wheat'))
+    slider.GetTitleProperty().SetColor(colors.GetColor3d('AliceBlue'))
+    slider.GetLabelProperty().SetColor(colors.GetColor3d('AliceBlue'))
+
+    widget = vtkSliderWidget()
+    widget.SetInteractor(interactor)
+    widget.SetRepresentation(slider)
+    widget.SetAnimationModeToJump()
+    widget.EnabledOn()
+    return widget
+
+
+def main():
+    file_name, iso_values, brick, jobs, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+    colors.SetColor('SkinColor', [240, 184, 160, 255])
+    colors.SetColor('BackfaceColor', [255, 229, 200, 255])
+    colors.SetColor('BkgColor', [51, 77, 102, 255])
+
+    start = time.perf_counter()
+    scene = MedicalScene(file_name, cache_dir, jobs, brick)
+    print(f'Volume {scene.image.GetDimensions()} read and hashed in {time.perf_counter() - start:0.3f}s')
+
+    cached = [scene.surface_file(iso_value).is_file() for iso_value in iso_values]
+    start = time.perf_counter()
+    surfaces = scene.surfaces(iso_values)
+    print(f'{len(surfaces)} surfaces, {sum(cached)} from the cache, in {time.perf_counter() - start:0.3f}s')
+
+    renderer = vtkRenderer()
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    # The first surface is the skin of MedicalDemo2, the others are colored as the bone.
+    mappers = list()
+    for i, surface in enumerate(surfaces):
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(surface)
+        mapper.ScalarVisibilityOff()
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        if i == 0:
+            actor.GetProperty().SetDiffuseColor(colors.GetColor3d('SkinColor'))
+            actor.GetProperty().SetSpecular(0.3)
+            actor.GetProperty().SetSpecularPower(20)
+            actor.GetProperty().SetOpacity(0.5)
+            back_prop = vtkProperty()
+            back_prop.SetDiffuseColor(colors.GetColor3d('BackfaceColor'))
+            actor.SetBackfaceProperty(back_prop)
+        else:
+            actor.GetProperty().SetDiffuseColor(colors.GetColor3d('Ivory'))
+        renderer.AddActor(actor)
+        mappers.append(mapper)
+
+    outline_data = vtkOutlineFilter()
+    outline_data.SetInputData(scene.image)
+    map_outline = vtkPolyDataMapper()
+    map_outline.SetInputConnection(outline_data.GetOutputPort())
+    outline = vtkActor()
+    outline.SetMapper(map_outline)
+    outline.GetProperty().SetColor(colors.GetColor3d('Black'))
+    renderer.AddActor(outline)
+
+    a_camera = vtkCamera()
+    a_camera.SetViewUp(0, 0, -1)
+    a_camera.SetPosition(0, -1, 0)
+    a_camera.SetFocalPoint(0, 0, 0)
+    a_camera.ComputeViewPlaneNormal()
+    a_camera.Azimuth(30.0)
+    a_camera.Elevation(30.0)
+    renderer.SetActiveCamera(a_camera)
+    renderer.ResetCamera()
+    a_camera.Dolly(1.5)
+
+    renderer.SetBackground(colors.GetColor3d('BkgColor'))
+    ren_win.SetSize(640, 480)
+    ren_win.SetWindowName('MedicalScene')
+    renderer.ResetCameraClippingRange()
+
+    scalar_range = scene.image.GetScalarRange()
+    slider = make_slider(iren, scalar_range[0], scalar_range[1], iso_values[0])
+    slider.AddObserver(vtkCommand.InteractionEvent, ScrubCallback(scene, mappers[0]))
+
+    iren.Initialize()
+    ren_win.Render()
+    iren.Start()
+    scene.shutdown()
+
+
+if __name__ == '__main__':
+    main()
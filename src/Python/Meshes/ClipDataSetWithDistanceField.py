@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import (
+    vtkCommand,
+    vtkDoubleArray
+)
+from vtkmodules.vtkCommonDataModel import vtkRectilinearGrid
+from vtkmodules.vtkFiltersCore import (
+    vtkImplicitPolyDataDistance,
+    vtkTriangleFilter
+)
+from vtkmodules.vtkFiltersGeneral import vtkClipDataSet
+from vtkmodules.vtkFiltersGeometry import vtkRectilinearGridGeometryFilter
+from vtkmodules.vtkFiltersSources import vtkConeSource
+from vtkmodules.vtkIOGeometry import (
+    vtkOBJReader,
+    vtkSTLReader
+)
+from vtkmodules.vtkIOPLY import vtkPLYReader
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader
+from vtkmodules.vtkInteractionWidgets import (
+    vtkSliderRepresentation2D,
+    vtkSliderWidget
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkDataSetMapper,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# Bump this if the way the distances are computed changes so that old cache entries are ignored.
+CACHE_VERSION = 1
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Clip a vtkRectilinearGrid with polydata, using a cached signed distance field.'
+    epilogue = '''
+As in ClipDataSetWithPolyData the grid is clipped by the signed distance to a surface,
+ but the grid coordinates are made with NumPy and the distances are evaluated in
+ bulk, in chunks on several threads, instead of one point at a time.
+
+The distance field is cached, in memory and on disk, keyed by a hash of the grid
+ coordinates and the surface. Moving the slider clips at a distance from the surface,
+ this only runs vtkClipDataSet again, the distances are not recomputed.
+
+The cache directory is, in order of precedence, the -c option,
+ the environment variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_name', nargs='?', default=None,
+                        help='An optional surface e.g. a .stl file, the cone of ClipDataSetWithPolyData is the default.')
+    parser.add_argument('-d', '--dimension', type=int, default=51, help='The number of grid points along each axis.')
+    parser.add_argument('-o', '--offset', type=float, default=0.0, help='The initial distance to clip at.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of threads evaluating the distances.')
+    parser.add_argument('-c', '--cache_dir', default=None, help='The cache directory.')
+    args = parser.parse_args()
+    return args.file_name, args.dimension, args.offset, args.jobs, args.cache_dir
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the distance fields, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'distance-fields'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def read_surface(file_name):
+    """
+    Read a surface and triangulate it.
+
+    :return: The polydata or None if the extension is unknown.
+    """
+    readers = {'.ply': vtkPLYReader, '.vtp': vtkXMLPolyDataReader, '.obj': vtkOBJReader, '.stl': vtkSTLReader}
+    extension = Path(file_name).suffix.lower()
+    if extension not in readers:
+        return None
+    reader = readers[extension]()
+    reader.SetFileName(str(file_name))
+    triangles = vtkTriangleFilter()
+    triangles.SetInputConnection(reader.GetOutputPort())
+    triangles.Update()
+    return triangles.GetOutput()
+
+
+def make_rectilinear_grid(x, y, z):
+    """
+    A vtkRectilinearGrid with the coordinates in the NumPy arrays x, y and z.
+    """
+    grid = vtkRectilinearGrid()
+    grid.SetDimensions(len(x), len(y), len(z))
+    grid.SetXCoordinates(numpy_to_vtk(np.asarray(x, dtype=np.float32), deep=True))
+    grid.SetYCoordinates(numpy_to_vtk(np.asarray(y, dtype=np.float32), deep=True))
+    grid.SetZCoordinates(numpy_to_vtk(np.asarray(z, dtype=np.float32), deep=True))
+    return grid
+
+
+def grid_points(x, y, z):
+    """
+    The points of a rectilinear grid as an (n, 3) array, in the order of the point ids, x varying fastest.
+    """
+    zz, yy, xx = np.meshgrid(z, y, x, indexing='ij')
+    return np.column_stack([xx.ravel(), yy.ravel(), zz.ravel()]).astype(float)
+
+
+def signed_distances(surface, points, jobs=4):
+    """
+    The signed distances of points from a surface, negative inside.
+
+    The points are split into chunks evaluated on a thread pool. Each chunk has its own
+     vtkImplicitPolyDataDistance, so no locator is shared between threads, and its
+     distances are evaluated in one call of FunctionValue.
+
+    :param surface: The closed polydata.
+    :param points: An (n, 3) array.
+    :param jobs: The number of chunks.
+    :return: The distances as an array of n floats.
+    """
+
+    def evaluate(chunk):
+        distance = vtkImplicitPolyDataDistance()
+        distance.SetInput(surface)
+        values = vtkDoubleArray()
+        distance.FunctionValue(numpy_to_vtk(np.ascontiguousarray(chunk), deep=True), values)
+        return vtk_to_numpy(values).astype(np.float32)
+
+    chunks = np.array_split(points, max(1, jobs))
+    with ThreadPoolExecutor(max(1, jobs)) as executor:
+        return np.concatenate(list(executor.map(evaluate, chunks)))
+
+
+def distance_key(x, y, z, surface):
+    """
+    Hash the grid coordinates with the points and triangles of the surface.
+    """
+    h = hashlib.sha256(f'distance-v{CACHE_VERSION}'.encode())
+    for coordinates in (x, y, z):
+        h.update(np.asarray(coordinates, dtype=np.float32).tobytes())
+        h.update(b'|')
+    h.update(vtk_to_numpy(surface.GetPoints().GetData()).tobytes())
+    polys = surface.GetPolys()
+    h.update(vtk_to_numpy(polys.GetOffsetsArray()).tobytes())
+    h.update(vtk_to_numpy(polys.GetConnectivityArray()).tobytes())
+    return h.hexdigest()
+
+
+class DistanceFieldCache:
+    """
+    Signed distance fields of (grid, surface) pairs, kept in memory and as .npy files.
+    """
+
+    def __init__(self, cache_dir=None, jobs=4):
+        """
+        :param cache_dir: The cache directory, see get_cache_dir(), or False for a cache in memory only.
+        :param jobs: The number of threads evaluating the distances.
+        """
+        self.path = None if cache_dir is False else get_cache_dir(cache_dir)
+        self.jobs = jobs
+        self.fields = dict()
+
+    def get(self, x, y, z, surface):
+        """
+        The signed distances of the points of the grid with coordinates x, y and z from the surface.
+
+        :return: The distances, in the order of the point ids, and where they came from.
+        """
+        key = distance_key(x, y, z, surface)
+        if key in self.fields:
+            return self.fields[key], 'memory'
+        file_name = None if self.path is None else self.path / f'{key}.npy'
+        if file_name is not None and file_name.is_file():
+            field = np.load(file_name)
+            how = 'disk'
+        else:
+            field = signed_distances(surface, grid_points(x, y, z), self.jobs)
+            how = 'computed'
+            if file_name is not None:
+                # Write under a temporary name so that a partly written field is never read.
+                tmp = file_name.with_suffix(f'.{os.getpid()}.tmp')
+                with open(tmp, 'wb') as f:
+                    np.save(f, field)
+                os.replace(tmp, file_name)
+        self.fields[key] = field
+        return field, how
+
+
+def distance_grid(x, y, z, surface, cache):
+    """
+    A rectilinear grid with the signed distances from the surface as its point scalars.
+    """
+    grid = make_rectilinear_grid(x, y, z)
+    field, how = cache.get(x, y, z, surface)
+    distances = numpy_to_vtk(field, deep=True)
+    distances.SetName('SignedDistances')
+    grid.GetPointData().SetScalars(distances)
+    return grid, how
+
+
+class OffsetCallback:
+    """
+    Clip at the distance given by the slider, only vtkClipDataSet runs again.
+    """
+
+    def __init__(self, clipper):
+        self.clipper = clipper
+
+    def __call__(self, caller, ev):
+        offset = caller.GetRepresentation().GetValue()
+        start = time.perf_counter()
+        self.clipper.SetValue(offset)
+        self.clipper.Update()
+        print(f'Clipped at {offset:0.3f} in {time.perf_counter() - start:0.3f}s:'
+              f' {self.clipper.GetOutput().GetNumberOfCells()} cells inside')
+
+
+def make_slider(interactor, value_min, value_max, value):
+    colors = vtkNamedColors()
+    slider = vtkSliderRepresentation2D()
+    slider.SetMinimumValue(value_min)
+    slider.SetMaximumValue(value_max)
+    slider.SetValue(value)
+    slider.SetTitleText('Offset')
+    slider.SetLabelFormat('%0.2f')
+    slider.GetPoint1Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint1Coordinate().SetValue(0.1, 0.1)
+    slider.GetPoint2Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint2Coordinate().SetValue(0.9, 0.1)
+    slider.GetTubeProperty().SetColor(colors.GetColor3d('LightSlateGray'))
+    slider.GetSliderProperty().SetColor(colors.GetColor3d('Wheat'))
+    slider.GetTitleProperty().SetColor(colors.GetColor3d('AliceBlue'))
+    slider.GetLabelProperty().SetColor(colors.GetColor3d('AliceBlue'))
+
+    widget = vtkSliderWidget()
+    widget.SetInteractor(interactor)
+    widget.SetRepresentation(slider)
+    widget.SetAnimationModeToAnimate()
+    widget.EnabledOn()
+    return widget
+
+
+def main():
+    file_name, dimension, offset, jobs, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    if file_name:
+        surface = read_surface(file_name)
+        if surface is None:
+            print('Unknown extension, expected one of .ply, .vtp, .obj or .stl, got:', file_name)
+            return
+    else:
+        # The cone of ClipDataSetWithPolyData.
+        cone = vtkConeSource()
+        cone.SetResolution(50)
+        cone.SetDirection(0, 0, -1)
+        cone.SetHeight(3.0)
+        cone.CappingOn()
+        cone.Update()
+        surface = cone.GetOutput()
+
+    # A grid around the surface, the cone is cut by the grid of the original example.
+    if file_name:
+        bounds = np.array(surface.GetBounds()).reshape(3, 2)
+        pad = 0.1 * (bounds[:, 1] - bounds[:, 0]).max()
+        x, y, z = (np.linspace(lo - pad, hi + pad, dimension) for lo, hi in bounds)
+    else:
+        x = y = z = np.linspace(-1.0, 1.0, dimension)
+
+    cache = DistanceFieldCache(cache_dir, jobs)
+    start = time.perf_counter()
+    rgrid, how = distance_grid(x, y, z, surface, cache)
+    print(f'{rgrid.GetNumberOfPoints()} signed distances {how} in {time.perf_counter() - start:0.3f}s')
+
+    clipper = vtkClipDataSet()
+    clipper.SetInputData(rgrid)
+    clipper.InsideOutOn()
+    clipper.SetValue(offset)
+    clipper.GenerateClippedOutputOn()
+    start = time.perf_counter()
+    clipper.Update()
+    print(f'Clipped at {offset:0.3f} in {time.perf_counter() - start:0.3f}s:'
+          f' {clipper.GetOutput().GetNumberOfCells()} cells inside')
+
+    # The distance field on a center slice.
+    geometry_filter = vtkRectilinearGridGeometryFilter()
+    geometry_filter.SetInputData(rgrid)
+    geometry_filter.SetExtent(0, dimension - 1, 0, dimension - 1, dimension // 2, dimension // 2)
+
+    rgrid_mapper = vtkPolyDataMapper()
+    rgrid_mapper.SetInputConnection(geometry_filter.GetOutputPort())
+    rgrid_mapper.SetScalarRange(rgrid.GetPointData().GetScalars().GetRange())
+
+    wire_actor = vtkActor()
+    wire_actor.SetMapper(rgrid_mapper)
+    wire_actor.GetProperty().SetRepresentationToWireframe()
+
+    clipper_mapper = vtkDataSetMapper()
+    clipper_mapper.SetInputConnection(clipper.GetOutputPort())
+    clipper_mapper.ScalarVisibilityOff()
+
+    clipper_outside_mapper = vtkDataSetMapper()
+    clipper_outside_mapper.SetInputConnection(clipper.GetOutputPort(1))
+    clipper_outside_mapper.ScalarVisibilityOff()
+
+    clipper_actor = vtkActor()
+    clipper_actor.SetMapper(clipper_mapper)
+    clipper_actor.GetProperty().SetColor(colors.GetColor3d('Banana'))
+
+    clipper_outside_actor = vtkActor()
+    clipper_outside_actor.SetMapper(clipper_outside_mapper)
+    clipper_outside_actor.GetProperty().SetColor(colors.GetColor3d('Banana'))
+
+    left_renderer = vtkRenderer()
+    left_renderer.SetViewport(0.0, 0.0, 0.5, 1.0)
+    left_renderer.SetBackground(colors.GetColor3d('SteelBlue'))
+
+    right_renderer = vtkRenderer()
+    right_renderer.SetViewport(0.5, 0.0, 1.0, 1.0)
+    right_renderer.SetBackground(colors.GetColor3d('CadetBlue'))
+
+    left_renderer.AddActor(wire_actor)
+    left_renderer.AddActor(clipper_actor)
+    right_renderer.AddActor(clipper_outside_actor)
+
+    render_window = vtkRenderWindow()
+    render_window.SetSize(640, 480)
+    render_window.AddRenderer(left_renderer)
+    render_window.AddRenderer(right_renderer)
+    render_window.SetWindowName('ClipDataSetWithDistanceField')
+
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    # Share the camera.
+    left_renderer.GetActiveCamera().SetPosition(0, -1, 0)
+    left_renderer.GetActiveCamera().SetFocalPoint(0, 0, 0)
+    left_renderer.GetActiveCamera().SetViewUp(0, 0, 1)
+    left_renderer.GetActiveCamera().Azimuth(30)
+    left_renderer.GetActiveCamera().Elevation(30)
+    left_renderer.ResetCamera()
+    right_renderer.SetActiveCamera(left_renderer.GetActiveCamera())
+
+    # Offsets up to a quarter of the grid either side of the surface.
+    reach = 0.25 * max(x[-1] - x[0], y[-1] - y[0], z[-1] - z[0])
+    slider = make_slider(interactor, -reach, reach, offset)
+    slider.AddObserver(vtkCommand.InteractionEvent, OffsetCallback(clipper))
+
+    render_window.Render()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,7 @@ import numpy as np
 import vtkmodules.vtkInteractionStyle
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import numpy_to_vtk
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonCore import vtkFloatArray
 from vtkmodules.vtkCommonDataModel import (
@@ -42,33 +43,12 @@ def main():
     implicitPolyDataDistance = vtkImplicitPolyDataDistance()
     implicitPolyDataDistance.SetInput(cone.GetOutput())
 
-    # create a grid
+    # create a grid, the coordinates are made with numpy and copied in one call
     dimension = 51
-    xCoords = vtkFloatArray()
-    for x, i in enumerate(np.linspace(-1.0, 1.0, dimension)):
-        xCoords.InsertNextValue(i)
-
-    yCoords = vtkFloatArray()
-    for y, i in enumerate(np.linspace(-1.0, 1.0, dimension)):
-        yCoords.InsertNextValue(i)
-
-    zCoords = vtkFloatArray()
-    for z, i in enumerate(np.linspace(-1.0, 1.0, dimension)):
-        zCoords.InsertNextValue(i)
-
-    # # create a grid - if not using numpy
-    # dimension = 51
-    # xCoords = vtkFloatArray()
-    # for i in range(0, dimension):
-    #     xCoords.InsertNextValue(-1.0 + i * 2.0 / (dimension - 1))
-    #
-    # yCoords = vtkFloatArray()
-    # for i in range(0, dimension):
-    #     yCoords.InsertNextValue(-1.0 + i * 2.0 / (dimension - 1))
-    #
-    # zCoords = vtkFloatArray()
-    # for i in range(0, dimension):
-    #     zCoords.InsertNextValue(-1.0 + i * 2.0 / (dimension - 1))
+    coords = np.linspace(-1.0, 1.0, dimension)
+    xCoords = numpy_to_vtk(coords.astype(np.float32), deep=True)
+    yCoords = numpy_to_vtk(coords.astype(np.float32), deep=True)
+    zCoords = numpy_to_vtk(coords.astype(np.float32), deep=True)
 
     # The coordinates are assigned to the rectilinear grid. Make sure that
     # the number of values in each of the XCoordinates, YCoordinates,
@@ -81,17 +61,15 @@ def main():
     rgrid.SetYCoordinates(yCoords)
     rgrid.SetZCoordinates(zCoords)
 
-    # Create an array to hold distance information
+    # Evaluate the signed distance function at all of the grid points,
+    # in one call rather than one point at a time.
+    # See ClipDataSetWithDistanceField for evaluating it on threads and caching it.
+    zz, yy, xx = np.meshgrid(coords, coords, coords, indexing='ij')
+    points = numpy_to_vtk(np.column_stack([xx.ravel(), yy.ravel(), zz.ravel()]), deep=True)
     signedDistances = vtkFloatArray()
-    signedDistances.SetNumberOfComponents(1)
+    implicitPolyDataDistance.FunctionValue(points, signedDistances)
     signedDistances.SetName('SignedDistances')
 
-    # Evaluate the signed distance function at all of the grid points
-    for pointId in range(0, rgrid.GetNumberOfPoints()):
-        p = rgrid.GetPoint(pointId)
-        signedDistance = implicitPolyDataDistance.EvaluateFunction(p)
-        signedDistances.InsertNextValue(signedDistance)
-
     # Add the SignedDistances to the grid
     rgrid.GetPointData().SetScalars(signedDistances)
 
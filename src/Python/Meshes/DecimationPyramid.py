@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import (
+    vtkCompositeDataSet,
+    vtkMultiBlockDataSet
+)
+from vtkmodules.vtkFiltersCore import (
+    vtkQuadricDecimation,
+    vtkTriangleFilter
+)
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOGeometry import (
+    vtkBYUReader,
+    vtkOBJReader,
+    vtkSTLReader
+)
+from vtkmodules.vtkIOLegacy import vtkPolyDataReader
+from vtkmodules.vtkIOPLY import vtkPLYReader
+from vtkmodules.vtkIOXML import (
+    vtkXMLMultiBlockDataWriter,
+    vtkXMLPolyDataReader
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkLODProp3D,
+    vtkPolyDataMapper,
+    vtkProperty,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# Bump this if the decimation settings change so that old cache entries are ignored.
+CACHE_VERSION = 2
+
+
+def get_program_parameters():
+    import argparse
+    description = 'A pyramid of decimated levels of a mesh, cached on disk and shown with a vtkLODProp3D.'
+    epilogue = '''
+The levels are made with vtkQuadricDecimation, each from the previous finer level, and
+ stored as a .vtm file in a cache directory keyed by a hash of the mesh and the reductions.
+When the pyramid is cached the coarsest level is shown at once and the finer levels,
+ then the mesh itself, are added as they are read.
+
+The vtkLODProp3D picks the level that can be rendered in the time allowed, so the
+ coarse levels are used while the camera moves. Use -d to pick the level from the
+ size of the mesh on the screen instead.
+
+The cache directory is, in order of precedence, the -c option,
+ the environment variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', nargs='?', default=None, help='Optional input filename e.g Armadillo.ply.')
+    parser.add_argument('-r', '--reductions', type=float, nargs='+', default=[0.5, 0.75, 0.9, 0.97],
+                        help='The target reductions of the levels.')
+    parser.add_argument('-d', '--distance', action='store_true',
+                        help='Select the level from the size on the screen.')
+    parser.add_argument('-c', '--cache_dir', default=None, help='The cache directory.')
+    parser.add_argument('-o', '--overwrite', action='store_true', help='Rebuild the pyramid even if it is cached.')
+    args = parser.parse_args()
+    return args.filename, args.reductions, args.distance, args.cache_dir, args.overwrite
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the pyramids, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'lod-pyramids'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def read_poly_data(file_name):
+    """
+    Read a mesh, as in Decimation, and triangulate it.
+
+    :return: The polydata or None if the extension is unknown.
+    """
+    extension = Path(file_name).suffix.lower()
+    readers = {'.ply': vtkPLYReader, '.vtp': vtkXMLPolyDataReader, '.obj': vtkOBJReader, '.stl': vtkSTLReader,
+               '.vtk': vtkPolyDataReader, '.g': vtkBYUReader}
+    if extension not in readers:
+        return None
+    reader = readers[extension]()
+    if extension == '.g':
+        reader.SetGeometryFileName(str(file_name))
+    else:
+        reader.SetFileName(str(file_name))
+    triangles = vtkTriangleFilter()
+    triangles.SetInputConnection(reader.GetOutputPort())
+    triangles.Update()
+    return triangles.GetOutput()
+
+
+def pyramid_key(reductions, file_name=None, poly_data=None):
+    """
+    Hash the reductions with the contents of the file or, without a file, the points and triangles of the mesh.
+
+    Hashing the file means a cached pyramid is found without reading the mesh.
+    """
+    h = hashlib.sha256(f'pyramid-v{CACHE_VERSION}:{sorted(reductions)}'.encode())
+    if file_name is not None:
+        with open(file_name, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    else:
+        h.update(vtk_to_numpy(poly_data.GetPoints().GetData()).tobytes())
+        polys = poly_data.GetPolys()
+        h.update(vtk_to_numpy(polys.GetOffsetsArray()).tobytes())
+        h.update(vtk_to_numpy(polys.GetConnectivityArray()).tobytes())
+    return h.hexdigest()
+
+
+def decimate(poly_data, reduction):
+    decimation = vtkQuadricDecimation()
+    decimation.SetInputData(poly_data)
+    decimation.SetTargetReduction(reduction)
+    decimation.Update()
+    return decimation.GetOutput()
+
+
+def build_pyramid(poly_data, reductions):
+    """
+    Decimate the mesh to each reduction, each level is made from the previous finer one.
+
+    The reduction of a level is rescaled to the number of cells of the level it is
+     made from, so the total cost is about that of decimating the mesh once.
+
+    :return: The levels, the coarsest first.
+    """
+    cells = poly_data.GetNumberOfCells()
+    levels = list()
+    level = poly_data
+    for reduction in sorted(reductions):
+        target = (1.0 - reduction) * cells
+        level = decimate(level, max(0.0, 1.0 - target / max(1, level.GetNumberOfCells())))
+        levels.append(level)
+    return levels[::-1]
+
+
+def save_pyramid(levels, reductions, path):
+    """
+    Save the levels as a multi-block .vtm file, each block named by its reduction.
+
+    The pyramid is written into a temporary directory which is then renamed, so
+     a partially written pyramid is never picked up as a cache entry.
+
+    :param levels: The levels, the coarsest first.
+    :param reductions: The reductions of the levels.
+    :param path: The directory of the cache entry.
+    """
+    blocks = vtkMultiBlockDataSet()
+    for i, (level, reduction) in enumerate(zip(levels, sorted(reductions, reverse=True))):
+        blocks.SetBlock(i, level)
+        blocks.GetMetaData(i).Set(vtkCompositeDataSet.NAME(), f'{reduction:g}')
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp.mkdir(parents=True, exist_ok=True)
+    writer = vtkXMLMultiBlockDataWriter()
+    writer.SetFileName(str(tmp / 'pyramid.vtm'))
+    writer.SetInputData(blocks)
+    writer.SetDataModeToAppended()
+    writer.EncodeAppendedDataOff()
+    writer.SetCompressorTypeToZLib()
+    if not writer.Write():
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise RuntimeError(f'Failed to write {path}')
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+
+def pyramid_files(path):
+    """
+    The files of the levels of a cached pyramid, the coarsest first, from its .vtm file.
+
+    Reading the levels one at a time lets the coarsest be shown before the others are read.
+
+    :return: A list of (name, file) or None if the pyramid is not cached.
+    """
+    vtm = path / 'pyramid.vtm'
+    if not vtm.is_file():
+        return None
+    blocks = ET.parse(vtm).getroot().iter('DataSet')
+    return [(b.get('name'), path / b.get('file')) for b in sorted(blocks, key=lambda b: int(b.get('index')))]
+
+
+def read_level(file_name):
+    reader = vtkXMLPolyDataReader()
+    reader.SetFileName(str(file_name))
+    reader.Update()
+    return reader.GetOutput()
+
+
+class LODPyramid:
+    """
+    The levels of a mesh in a vtkLODProp3D, added one at a time.
+    """
+
+    def __init__(self, prop, colors):
+        self.prop = prop
+        self.property = vtkProperty()
+        self.property.SetColor(colors.GetColor3d('NavajoWhite'))
+        self.backface = vtkProperty()
+        self.backface.SetColor(colors.GetColor3d('Gold'))
+        self.ids = list()
+        self.cells = list()
+
+    def add(self, poly_data):
+        """
+        Add a level, they must be added from the coarsest to the finest.
+        """
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(poly_data)
+        # An initial estimate of the render time, proportional to the size, it is refined as it is rendered.
+        lod_id = self.prop.AddLOD(mapper, self.property, self.backface, None, poly_data.GetNumberOfCells() * 1.0e-8)
+        self.ids.append(lod_id)
+        self.cells.append(poly_data.GetNumberOfCells())
+        return lod_id
+
+
+class ScreenSizeSelector:
+    """
+    Select the level of a LODPyramid from the size of the mesh on the screen.
+
+    The level chosen is the coarsest with at least a given number of triangles per
+     pixel of the area the mesh covers.
+    """
+
+    def __init__(self, pyramid, renderer, triangles_per_pixel=0.5):
+        self.pyramid = pyramid
+        self.renderer = renderer
+        self.triangles_per_pixel = triangles_per_pixel
+        pyramid.prop.AutomaticLODSelectionOff()
+
+    def __call__(self, caller, ev):
+        if not self.pyramid.ids:
+            return
+        bounds = np.array(self.pyramid.prop.GetBounds()).reshape(3, 2)
+        center, radius = bounds.mean(axis=1), np.linalg.norm(bounds[:, 1] - bounds[:, 0]) / 2.0
+        camera = self.renderer.GetActiveCamera()
+        distance = max(np.linalg.norm(center - np.array(camera.GetPosition())), 1.0e-6)
+        height = self.renderer.GetSize()[1]
+        if camera.GetParallelProjection():
+            pixels = radius / camera.GetParallelScale() * height
+        else:
+            pixels = radius / (distance * np.tan(np.radians(camera.GetViewAngle() / 2.0))) * height
+        wanted = self.triangles_per_pixel * np.pi * (pixels / 2.0) ** 2
+        level = next((i for i, n in enumerate(self.pyramid.cells) if n >= wanted), len(self.pyramid.cells) - 1)
+        self.pyramid.prop.SetSelectedLODID(self.pyramid.ids[level])
+
+
+class Refiner:
+    """
+    Add the levels to the pyramid as a worker thread reads or makes them.
+    """
+
+    def __init__(self, pyramid, render_window, futures):
+        self.pyramid = pyramid
+        self.render_window = render_window
+        self.futures = list(futures)
+
+    def __call__(self, caller, ev):
+        added = False
+        while self.futures and self.futures[0].done():
+            level = self.futures.pop(0).result()
+            self.pyramid.add(level)
+            print(f'Added a level of {level.GetNumberOfCells()} cells')
+            added = True
+        if added:
+            self.render_window.Render()
+
+
+def main():
+    file_name, reductions, by_distance, cache_dir, overwrite = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    renderer = vtkRenderer()
+    renderer.SetBackground(colors.GetColor3d('CornflowerBlue'))
+    render_window = vtkRenderWindow()
+    render_window.SetSize(600, 600)
+    render_window.AddRenderer(renderer)
+    render_window.SetWindowName('DecimationPyramid')
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+    interactor.Initialize()
+
+    prop = vtkLODProp3D()
+    pyramid = LODPyramid(prop, colors)
+    renderer.AddViewProp(prop)
+    if by_distance:
+        renderer.AddObserver('StartEvent', ScreenSizeSelector(pyramid, renderer))
+
+    def load_mesh():
+        if file_name is None:
+            sphere = vtkSphereSource()
+            sphere.SetThetaResolution(300)
+            sphere.SetPhiResolution(300)
+            sphere.Update()
+            return sphere.GetOutput()
+        mesh = read_poly_data(file_name)
+        if mesh is None:
+            raise ValueError(f'Unknown file type {file_name}')
+        return mesh
+
+    executor = ThreadPoolExecutor(1)
+    start = time.perf_counter()
+    mesh = None
+    if file_name is None:
+        mesh = load_mesh()
+        key = pyramid_key(reductions, poly_data=mesh)
+    else:
+        key = pyramid_key(reductions, file_name=file_name)
+    entry = get_cache_dir(cache_dir) / key
+    files = None if overwrite else pyramid_files(entry)
+    if files is not None:
+        # Show the coarsest level now, read the others and then the mesh itself in the background.
+        pyramid.add(read_level(files[0][1]))
+        print(f'Opened the cached level {files[0][0]} in {time.perf_counter() - start:0.3f}s')
+        futures = [executor.submit(read_level, fn) for name, fn in files[1:]]
+        futures.append(executor.submit(load_mesh) if mesh is None else executor.submit(lambda: mesh))
+    else:
+        if mesh is None:
+            mesh = load_mesh()
+        print(f'Building the pyramid of {mesh.GetNumberOfCells()} cells ...')
+        levels = build_pyramid(mesh, reductions)
+        print(f'Built {len(levels)} levels in {time.perf_counter() - start:0.3f}s')
+        save_pyramid(levels, reductions, entry)
+        for level in levels + [mesh]:
+            pyramid.add(level)
+        futures = list()
+
+    refiner = Refiner(pyramid, render_window, futures)
+    interactor.AddObserver('TimerEvent', refiner)
+    interactor.CreateRepeatingTimer(100)
+    # Interaction asks for frames at this rate, so the coarse levels are used while the camera moves.
+    interactor.SetDesiredUpdateRate(15.0)
+
+    renderer.ResetCamera()
+    render_window.Render()
+    interactor.Start()
+    executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 
+import numpy as np
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkInteractionStyle
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import numpy_to_vtkIdTypeArray
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonCore import vtkPoints
 from vtkmodules.vtkCommonDataModel import (
@@ -75,14 +77,13 @@ def main():
                  (bounds[1] + bounds[0]) / 2.0,
                  (bounds[3] + bounds[2]) / 2.0,
                  bounds[5] + 0.1 * (bounds[5] - bounds[4]))
-    tris = vtkCellArray()
-
-    cells = [[2, 0, 4], [1, 2, 4], [3, 1, 4], [0, 3, 4], [0, 2, 5], [2, 1, 5], [1, 3, 5], [3, 0, 5]]
 
-    for cell in cells:
-        tris.InsertNextCell(3)
-        for c in cell:
-            tris.InsertCellPoint(c)
+    # The triangles are set from arrays of offsets and point ids in one call.
+    cells = np.array([[2, 0, 4], [1, 2, 4], [3, 1, 4], [0, 3, 4], [0, 2, 5], [2, 1, 5], [1, 3, 5], [3, 0, 5]])
+    offsets = np.arange(0, cells.size + 1, 3)
+    tris = vtkCellArray()
+    tris.SetData(numpy_to_vtkIdTypeArray(offsets.astype(np.int64), deep=True),
+                 numpy_to_vtkIdTypeArray(cells.ravel().astype(np.int64), deep=True))
 
     pd = vtkPolyData()
     pd.SetPoints(pts)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import (
+    vtkCommand,
+    vtkPoints
+)
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkPolyData
+)
+from vtkmodules.vtkFiltersCore import vtkElevationFilter
+from vtkmodules.vtkFiltersGeneral import vtkDeformPointSet
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkInteractionWidgets import (
+    vtkHandleWidget,
+    vtkPointHandleRepresentation3D
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# Bump this if the way the weights are found changes so that old cache entries are ignored.
+CACHE_VERSION = 1
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Cage based deformation of a large mesh, with the weights of vtkDeformPointSet cached.'
+    epilogue = '''
+The sphere of DeformPointSet is deformed by the same octahedral control mesh, or cage,
+ but the control points can be dragged.
+
+vtkDeformPointSet computes the mean value coordinates of every point once, the
+ expensive step, then each point is a weighted sum of the control points.
+The weights are read back from the filter, cached on disk, and the weighted sum
+ is done with NumPy straight into the points that are rendered.
+
+The cache directory is, in order of precedence, the -c option,
+ the environment variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--resolution', type=int, default=1000,
+                        help='The theta and phi resolution of the sphere, 1000 gives about a million points.')
+    parser.add_argument('-c', '--cache_dir', default=None, help='The cache directory.')
+    args = parser.parse_args()
+    return args.resolution, args.cache_dir
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the weights, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'cage-weights'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def triangle_cells(triangles):
+    """
+    A vtkCellArray of an (n, 3) array of point ids, made in one call.
+    """
+    triangles = np.ascontiguousarray(triangles, dtype=np.int64)
+    offsets = np.arange(0, triangles.size + 1, 3, dtype=np.int64)
+    cells = vtkCellArray()
+    cells.SetData(numpy_to_vtkIdTypeArray(offsets, deep=True), numpy_to_vtkIdTypeArray(triangles.ravel(), deep=True))
+    return cells
+
+
+def control_mesh(points, triangles):
+    """
+    A polydata of the control points, an (n, 3) array, and the triangles.
+
+    The points of the polydata are a view of the array, so changing the array
+     and calling Modified() on the points moves the mesh.
+    """
+    vtk_points = vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(points, deep=False))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(vtk_points)
+    poly_data.SetPolys(triangle_cells(triangles))
+    return poly_data
+
+
+def octahedron_cage(bounds, pad=0.1):
+    """
+    The control mesh of DeformPointSet, an octahedron just outside the bounds.
+
+    :return: The (6, 3) points and the (8, 3) triangles.
+    """
+    bounds = np.asarray(bounds, dtype=float).reshape(3, 2)
+    centre = bounds.mean(axis=1)
+    half = 0.5 * (bounds[:, 1] - bounds[:, 0]) * (1.0 + 2.0 * pad)
+    points = np.repeat(centre[np.newaxis, :], 6, axis=0)
+    for axis in range(3):
+        points[2 * axis, axis] -= half[axis]
+        points[2 * axis + 1, axis] += half[axis]
+    triangles = np.array([[2, 0, 4], [1, 2, 4], [3, 1, 4], [0, 3, 4], [0, 2, 5], [2, 1, 5], [1, 3, 5], [3, 0, 5]])
+    return points, triangles
+
+
+def weights_key(poly_data, cage_points, cage_triangles):
+    """
+    Hash the points of the mesh with the control mesh.
+    """
+    h = hashlib.sha256(f'cage-v{CACHE_VERSION}'.encode())
+    h.update(vtk_to_numpy(poly_data.GetPoints().GetData()).astype(np.float64).tobytes())
+    h.update(np.asarray(cage_points, dtype=np.float64).tobytes())
+    h.update(np.asarray(cage_triangles, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def deformation_weights(poly_data, cage_points, cage_triangles):
+    """
+    The weights vtkDeformPointSet gives each control point for each point of the mesh.
+
+    The filter computes the weights on its first run and keeps them. Each later run
+     only sums the control points with them, so with control point j at a unit vector
+     along an axis and the others at the origin, the output coordinate along that
+     axis is the weight of j. Three control points are read back in each run.
+
+    :param poly_data: The mesh to deform.
+    :param cage_points: The (k, 3) control points in their initial position.
+    :param cage_triangles: The triangles of the control mesh.
+    :return: An (n, k) array, the points of the mesh are weights @ control points.
+    """
+    control = np.array(cage_points, dtype=float)
+    cage = control_mesh(control, cage_triangles)
+    deform = vtkDeformPointSet()
+    deform.SetInputData(poly_data)
+    deform.SetControlMeshData(cage)
+    deform.Update()
+
+    k = len(control)
+    weights = np.empty((poly_data.GetNumberOfPoints(), k), dtype=np.float32)
+    for first in range(0, k, 3):
+        control[:] = 0.0
+        columns = range(first, min(first + 3, k))
+        for axis, j in enumerate(columns):
+            control[j, axis] = 1.0
+        cage.GetPoints().Modified()
+        deform.Update()
+        output = vtk_to_numpy(deform.GetOutput().GetPoints().GetData())
+        for axis, j in enumerate(columns):
+            weights[:, j] = output[:, axis]
+    return weights
+
+
+def cached_weights(poly_data, cage_points, cage_triangles, cache_dir=None):
+    """
+    The weights of deformation_weights(), read from the cache if they are there.
+
+    :return: The weights and True if they were read from the cache.
+    """
+    file_name = get_cache_dir(cache_dir) / f'{weights_key(poly_data, cage_points, cage_triangles)}.npy'
+    if file_name.is_file():
+        return np.load(file_name), True
+    weights = deformation_weights(poly_data, cage_points, cage_triangles)
+    # Write under a temporary name so that a partly written file is never read.
+    tmp = file_name.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, weights)
+    os.replace(tmp, file_name)
+    return weights, False
+
+
+class CageDeformer:
+    """
+    A copy of a mesh whose points follow the control points of a cage.
+
+    The points of the copy are a view of a NumPy array, so a deformation is a
+     single matrix product written into them.
+    """
+
+    def __init__(self, poly_data, weights, cage_points):
+        """
+        :param poly_data: The mesh, its point data are shared with the copy.
+        :param weights: The (n, k) weights of the control points.
+        :param cage_points: The (k, 3) control points.
+        """
+        self.weights = weights
+        self.control = np.array(cage_points, dtype=np.float32)
+        self.points = weights @ self.control
+        vtk_points = vtkPoints()
+        vtk_points.SetData(numpy_to_vtk(self.points, deep=False))
+        self.output = vtkPolyData()
+        self.output.ShallowCopy(poly_data)
+        self.output.SetPoints(vtk_points)
+
+    def move(self, j, position):
+        """
+        Move control point j to position and deform the mesh.
+        """
+        self.control[j] = position
+        np.matmul(self.weights, self.control, out=self.points)
+        self.output.GetPoints().Modified()
+
+
+class HandleCallback:
+    """
+    Move a control point, and the cage showing it, with a handle widget.
+    """
+
+    def __init__(self, deformer, cage, j):
+        self.deformer = deformer
+        self.cage = cage
+        self.j = j
+
+    def __call__(self, caller, ev):
+        position = caller.GetRepresentation().GetWorldPosition()
+        start = time.perf_counter()
+        self.deformer.move(self.j, position)
+        elapsed = time.perf_counter() - start
+        vtk_to_numpy(self.cage.GetPoints().GetData())[self.j] = position
+        self.cage.GetPoints().Modified()
+        if ev == 'EndInteractionEvent':
+            print(f'Deformed {len(self.deformer.points)} points in {elapsed * 1000:0.1f}ms')
+
+
+def main():
+    resolution, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    # Create a sphere to deform, colored as in DeformPointSet.
+    sphere = vtkSphereSource()
+    sphere.SetThetaResolution(resolution)
+    sphere.SetPhiResolution(resolution)
+    sphere.Update()
+    bounds = sphere.GetOutput().GetBounds()
+
+    ele = vtkElevationFilter()
+    ele.SetInputConnection(sphere.GetOutputPort())
+    ele.SetLowPoint((bounds[1] + bounds[0]) / 2.0, (bounds[3] + bounds[2]) / 2.0, -bounds[5])
+    ele.SetHighPoint((bounds[1] + bounds[0]) / 2.0, (bounds[3] + bounds[2]) / 2.0, bounds[5])
+    ele.Update()
+    mesh = ele.GetOutput()
+
+    cage_points, cage_triangles = octahedron_cage(bounds)
+    start = time.perf_counter()
+    weights, cached = cached_weights(mesh, cage_points, cage_triangles, cache_dir)
+    print(f'Weights of {weights.shape[1]} control points for {weights.shape[0]} points'
+          f' {"read" if cached else "computed"} in {time.perf_counter() - start:0.3f}s')
+
+    deformer = CageDeformer(mesh, weights, cage_points)
+    cage = control_mesh(np.array(cage_points, dtype=np.float32), cage_triangles)
+
+    mesh_mapper = vtkPolyDataMapper()
+    mesh_mapper.SetInputData(cage)
+    mesh_actor = vtkActor()
+    mesh_actor.SetMapper(mesh_mapper)
+    mesh_actor.GetProperty().SetRepresentationToWireframe()
+    mesh_actor.GetProperty().SetColor(colors.GetColor3d('Black'))
+
+    poly_mapper = vtkPolyDataMapper()
+    poly_mapper.SetInputData(deformer.output)
+    poly_actor = vtkActor()
+    poly_actor.SetMapper(poly_mapper)
+
+    renderer = vtkRenderer()
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    renderer.AddActor(poly_actor)
+    renderer.AddActor(mesh_actor)
+
+    # A handle on each control point.
+    widgets = list()
+    for j, point in enumerate(cage_points):
+        rep = vtkPointHandleRepresentation3D()
+        rep.SetPlaceFactor(1.0)
+        rep.SetHandleSize(20)
+        rep.GetProperty().SetColor(colors.GetColor3d('Tomato'))
+        rep.SetWorldPosition(point)
+        widget = vtkHandleWidget()
+        widget.SetInteractor(iren)
+        widget.SetRepresentation(rep)
+        callback = HandleCallback(deformer, cage, j)
+        widget.AddObserver(vtkCommand.InteractionEvent, callback)
+        widget.AddObserver(vtkCommand.EndInteractionEvent, callback)
+        widgets.append(widget)
+
+    # Pull the top of the cage up, as DeformPointSet does.
+    top = cage_points[5].copy()
+    top[2] = bounds[5] + 0.8 * (bounds[5] - bounds[4])
+    widgets[5].GetRepresentation().SetWorldPosition(top)
+    HandleCallback(deformer, cage, 5)(widgets[5], 'EndInteractionEvent')
+
+    renderer.GetActiveCamera().SetPosition(1, 1, 1)
+    renderer.ResetCamera()
+    renderer.SetBackground(colors.GetColor3d('DarkSlateGray'))
+
+    ren_win.SetSize(640, 640)
+    ren_win.SetWindowName('DeformPointSetCage')
+    ren_win.Render()
+    for widget in widgets:
+        widget.On()
+
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
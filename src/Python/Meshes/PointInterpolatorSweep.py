@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import (
+    vtkCommand,
+    vtkPoints
+)
+from vtkmodules.vtkCommonDataModel import (
+    vtkImageData,
+    vtkPolyData,
+    vtkStaticPointLocator
+)
+from vtkmodules.vtkFiltersGeneral import vtkTableToPolyData
+from vtkmodules.vtkFiltersPoints import (
+    vtkGaussianKernel,
+    vtkPointInterpolator
+)
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOGeometry import vtkSTLReader
+from vtkmodules.vtkIOInfovis import vtkDelimitedTextReader
+from vtkmodules.vtkInteractionWidgets import (
+    vtkSliderRepresentation2D,
+    vtkSliderWidget
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Sweep the kernel radius of vtkPointInterpolator, with the point locator built once.'
+    epilogue = '''
+The points and surface of PointInterpolator are used if they are given, otherwise
+ a million random points with a smooth field are interpolated onto a sphere.
+
+One vtkStaticPointLocator is built for the points and shared by every interpolation,
+ whatever the kernel or the probe. The probe points are interpolated in chunks on
+ a thread pool, and the box of PointInterpolator can be interpolated slice by slice.
+Drag the slider to change the radius of the Gaussian kernel.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('points_fn', nargs='?', default=None, help='sparsePoints.txt.')
+    parser.add_argument('probe_fn', nargs='?', default=None, help='InterpolatingOnSTL_final.stl.')
+    parser.add_argument('-n', '--number_of_points', type=int, default=1_000_000,
+                        help='The number of random points if no points are given.')
+    parser.add_argument('-r', '--radius', type=float, default=None,
+                        help='The initial radius of the kernel, the default is 12 for the files, 0.03 otherwise.')
+    parser.add_argument('-s', '--sharpness', type=float, default=2.0, help='The sharpness of the Gaussian kernel.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of chunks interpolated at once.')
+    parser.add_argument('-b', '--box', type=int, default=0,
+                        help='Also interpolate a box of this many samples a side, slice by slice.')
+    args = parser.parse_args()
+    return (args.points_fn, args.probe_fn, args.number_of_points, args.radius, args.sharpness, args.jobs,
+            args.box)
+
+
+def read_points(file_name):
+    """
+    Read the x, y, z and val columns of a tab delimited file, as in PointInterpolator.
+    """
+    points_reader = vtkDelimitedTextReader()
+    points_reader.SetFileName(file_name)
+    points_reader.DetectNumericColumnsOn()
+    points_reader.SetFieldDelimiterCharacters('\t')
+    points_reader.SetHaveHeaders(True)
+
+    table_points = vtkTableToPolyData()
+    table_points.SetInputConnection(points_reader.GetOutputPort())
+    table_points.SetXColumn('x')
+    table_points.SetYColumn('y')
+    table_points.SetZColumn('z')
+    table_points.Update()
+
+    points = table_points.GetOutput()
+    points.GetPointData().SetActiveScalars('val')
+    return points
+
+
+def random_points(n, seed=0):
+    """
+    n random points in the unit cube around the origin with a smooth field 'val'.
+    """
+    rng = np.random.default_rng(seed)
+    xyz = rng.uniform(-1.0, 1.0, (n, 3))
+    val = np.sin(3.0 * xyz[:, 0]) * np.cos(2.0 * xyz[:, 1]) + xyz[:, 2] + rng.normal(0.0, 0.1, n)
+    points = points_poly_data(xyz)
+    scalars = numpy_to_vtk(val, deep=True)
+    scalars.SetName('val')
+    points.GetPointData().SetScalars(scalars)
+    return points
+
+
+def points_poly_data(xyz):
+    vtk_points = vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(np.ascontiguousarray(xyz), deep=True))
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(vtk_points)
+    return poly_data
+
+
+class PointInterpolation:
+    """
+    Interpolate the scalars of a set of points at probe points, with any Gaussian kernel.
+
+    A vtkStaticPointLocator is built once and given to every vtkPointInterpolator;
+     it is only rebuilt by the interpolator if the points are modified. Searching a
+     built static locator does not change it, so the chunks of a probe are
+     interpolated on several threads, each with its own interpolator and kernel.
+    """
+
+    def __init__(self, source, jobs=4, chunk_size=65536):
+        """
+        :param source: The polydata with the points and their active scalars.
+        :param jobs: The number of chunks interpolated at once.
+        :param chunk_size: The number of probe points in a chunk.
+        """
+        self.source = source
+        self.array_name = source.GetPointData().GetScalars().GetName()
+        self.locator = vtkStaticPointLocator()
+        self.locator.SetDataSet(source)
+        self.locator.BuildLocator()
+        self.jobs = max(1, jobs)
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(self.jobs)
+
+    def interpolate_data_set(self, probe, radius, sharpness=2.0):
+        """
+        Interpolate at the points of a dataset, on the calling thread.
+
+        :return: The interpolated values as a NumPy array.
+        """
+        kernel = vtkGaussianKernel()
+        kernel.SetRadius(radius)
+        kernel.SetSharpness(sharpness)
+        interpolator = vtkPointInterpolator()
+        interpolator.SetInputData(probe)
+        interpolator.SetSourceData(self.source)
+        interpolator.SetLocator(self.locator)
+        interpolator.SetKernel(kernel)
+        interpolator.PassPointArraysOff()
+        interpolator.PassCellArraysOff()
+        interpolator.PassFieldArraysOff()
+        interpolator.Update()
+        return vtk_to_numpy(interpolator.GetOutput().GetPointData().GetArray(self.array_name))
+
+    def interpolate(self, xyz, radius, sharpness=2.0):
+        """
+        Interpolate at an (n, 3) array of probe points, in chunks on the thread pool.
+        """
+        chunks = [xyz[i:i + self.chunk_size] for i in range(0, len(xyz), self.chunk_size)]
+        results = self.executor.map(
+            lambda chunk: self.interpolate_data_set(points_poly_data(chunk), radius, sharpness), chunks)
+        return np.concatenate(list(results))
+
+    def interpolate_slices(self, origin, spacing, dims, radius, sharpness=2.0):
+        """
+        Interpolate a box slice by slice, jobs slices are interpolated ahead.
+
+        :param origin: The origin of the box.
+        :param spacing: The spacing of the box.
+        :param dims: The (nx, ny, nz) dimensions of the box.
+        :return: A generator of (k, values) with the values of slice k as an (ny, nx) array, in order of k.
+        """
+        nx, ny, nz = (int(d) for d in dims)
+
+        def slice_values(k):
+            image = vtkImageData()
+            image.SetDimensions(nx, ny, 1)
+            image.SetSpacing(spacing)
+            image.SetOrigin(origin[0], origin[1], origin[2] + k * spacing[2])
+            return self.interpolate_data_set(image, radius, sharpness).reshape(ny, nx)
+
+        pending = deque()
+        for k in range(nz):
+            pending.append((k, self.executor.submit(slice_values, k)))
+            if len(pending) > self.jobs:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class RadiusCallback:
+    """
+    Interpolate onto the surface with the radius of the slider.
+    """
+
+    def __init__(self, interpolation, surface, sharpness):
+        self.interpolation = interpolation
+        self.surface = surface
+        self.xyz = vtk_to_numpy(surface.GetPoints().GetData()).astype(float)
+        self.sharpness = sharpness
+
+    def interpolate(self, radius):
+        start = time.perf_counter()
+        values = self.interpolation.interpolate(self.xyz, radius, self.sharpness)
+        scalars = numpy_to_vtk(values, deep=True)
+        scalars.SetName(self.interpolation.array_name)
+        self.surface.GetPointData().SetScalars(scalars)
+        print(f'Radius {radius:0.4g}: {len(values)} points interpolated in {time.perf_counter() - start:0.3f}s')
+
+    def __call__(self, caller, ev):
+        self.interpolate(caller.GetRepresentation().GetValue())
+
+
+def make_slider(interactor, value_min, value_max, value):
+    colors = vtkNamedColors()
+    slider = vtkSliderRepresentation2D()
+    slider.SetMinimumValue(value_min)
+    slider.SetMaximumValue(value_max)
+    slider.SetValue(value)
+    slider.SetTitleText('Kernel radius')
+    slider.SetLabelFormat('%0.3g')
+    slider.GetPoint1Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint1Coordinate().SetValue(0.1, 0.1)
+    slider.GetPoint2Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint2Coordinate().SetValue(0.9, 0.1)
+    slider.GetTubeProperty().SetColor(colors.GetColor3d('LightSlateGray'))
+    slider.GetSliderProperty().SetColor(colors.GetColor3d('Wheat'))
+    slider.GetTitleProperty().SetColor(colors.GetColor3d('AliceBlue'))
+    slider.GetLabelProperty().SetColor(colors.GetColor3d('AliceBlue'))
+
+    widget = vtkSliderWidget()
+    widget.SetInteractor(interactor)
+    widget.SetRepresentation(slider)
+    widget.SetAnimationModeToJump()
+    widget.EnabledOn()
+    return widget
+
+
+def main():
+    points_fn, probe_fn, number_of_points, radius, sharpness, jobs, box = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    if points_fn is not None and Path(points_fn).is_file():
+        points = read_points(points_fn)
+        radius = 12.0 if radius is None else radius
+    else:
+        points = random_points(number_of_points)
+        radius = 0.03 if radius is None else radius
+    if probe_fn is not None and Path(probe_fn).is_file():
+        stl_reader = vtkSTLReader()
+        stl_reader.SetFileName(probe_fn)
+        stl_reader.Update()
+        surface = stl_reader.GetOutput()
+    else:
+        sphere = vtkSphereSource()
+        sphere.SetRadius(0.9)
+        sphere.SetThetaResolution(400)
+        sphere.SetPhiResolution(200)
+        sphere.Update()
+        surface = sphere.GetOutput()
+    scalar_range = points.GetPointData().GetScalars().GetRange()
+
+    start = time.perf_counter()
+    interpolation = PointInterpolation(points, jobs)
+    print(f'Locator of {points.GetNumberOfPoints()} points built in {time.perf_counter() - start:0.3f}s')
+
+    callback = RadiusCallback(interpolation, surface, sharpness)
+    callback.interpolate(radius)
+
+    if box > 1:
+        # The box of PointInterpolator, streamed a slice at a time.
+        bounds = np.array(surface.GetBounds())
+        dims = np.array([box, box, box])
+        spacing = (bounds[1::2] - bounds[:-1:2]) / (dims - 1)
+        start = time.perf_counter()
+        low, high = np.inf, -np.inf
+        for k, values in interpolation.interpolate_slices(bounds[::2], spacing, dims, radius, sharpness):
+            low, high = min(low, values.min()), max(high, values.max())
+        print(f'Box of {box}^3 interpolated slice by slice in {time.perf_counter() - start:0.3f}s,'
+              f' values in [{low:0.3g}, {high:0.3g}]')
+
+    mapper = vtkPolyDataMapper()
+    mapper.SetInputData(surface)
+    mapper.SetScalarRange(scalar_range)
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+
+    renderer = vtkRenderer()
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    renderer.AddActor(actor)
+    renderer.SetBackground(colors.GetColor3d('SlateGray'))
+
+    ren_win.SetSize(640, 480)
+    ren_win.SetWindowName('PointInterpolatorSweep')
+
+    renderer.ResetCamera()
+    renderer.GetActiveCamera().Elevation(-45)
+
+    slider = make_slider(iren, 0.25 * radius, 4.0 * radius, radius)
+    slider.AddObserver(vtkCommand.EndInteractionEvent, callback)
+
+    iren.Initialize()
+    ren_win.Render()
+    iren.Start()
+    interpolation.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingContextOpenGL2
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkChartsCore import (
+    vtkAxis,
+    vtkChart,
+    vtkChartXY
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkStringArray
+from vtkmodules.vtkCommonDataModel import vtkTable
+from vtkmodules.vtkViewsContext2D import vtkContextView
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Build a vtkTable from NumPy arrays and plot a decimated series.'
+    epilogue = '''
+The columns are wrapped, not copied, into the table.
+Before plotting, each series is reduced to the minimum and maximum in each pixel column,
+ so the chart only draws a few thousand points however long the series is.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--samples', type=int, default=10 ** 6, help='The number of samples.')
+    args = parser.parse_args()
+    return args.samples
+
+
+def as_vtk_column(name, values):
+    """
+    Wrap a one dimensional array as a VTK array without copying it.
+
+    A copy is only made if the array is not contiguous or is of a type VTK cannot wrap,
+     strings are stored in a vtkStringArray.
+
+    :param name: The name of the column.
+    :param values: A NumPy array, pandas Series or a sequence.
+    :return: The VTK array.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'OSU':
+        column = vtkStringArray()
+        column.SetNumberOfValues(len(values))
+        for i, value in enumerate(values):
+            column.SetValue(i, str(value))
+    else:
+        if values.dtype.kind == 'b':
+            values = values.astype(np.uint8)
+        # numpy_to_vtk keeps a reference to the array, it must stay unchanged in size.
+        column = numpy_to_vtk(np.ascontiguousarray(values))
+    column.SetName(str(name))
+    return column
+
+
+def table_from_columns(columns):
+    """
+    Make a vtkTable whose columns share their memory with NumPy arrays.
+
+    :param columns: A dictionary of name: array or a pandas DataFrame.
+    :return: The table.
+    """
+    table = vtkTable()
+    for name, values in columns.items():
+        table.AddColumn(as_vtk_column(name, values))
+    return table
+
+
+def update_table(table, columns):
+    """
+    Update the columns of a table from NumPy arrays.
+
+    If the number of rows is unchanged, the values are copied into the existing arrays
+     and columns not already in the table are added. Otherwise, the table is emptied
+     and rebuilt from the columns.
+
+    :param table: The table.
+    :param columns: A dictionary of name: array or a pandas DataFrame.
+    """
+    columns = {str(name): np.asarray(values) for name, values in columns.items()}
+    rows = {len(values) for values in columns.values()}
+    if rows != {table.GetNumberOfRows()}:
+        table.GetRowData().Initialize()
+    for name, values in columns.items():
+        column = table.GetColumnByName(name)
+        if (column is not None and column.IsNumeric() and values.dtype.kind not in 'OSU'
+                and column.GetNumberOfTuples() == len(values)):
+            vtk_to_numpy(column)[...] = values
+            column.Modified()
+        else:
+            # AddColumn replaces a column of the same name.
+            table.AddColumn(as_vtk_column(name, values))
+    table.Modified()
+
+
+def min_max_indices(y, bins):
+    """
+    The indices of the minimum and maximum of y in each of the bins.
+
+    The samples are split into bins whose sizes differ by at most one, so every
+     sample is in a bin. A bin is a pixel column if the samples are evenly spaced
+     and there are as many bins as pixels.
+
+    :param y: The values.
+    :param bins: The number of bins.
+    :return: The sorted indices, at most 2 * bins + 1 of them.
+    """
+    n = len(y)
+    bins = max(1, bins)
+    if n <= 2 * bins:
+        return np.arange(n)
+    # The first n % bins bins have one sample more than the others.
+    size, extra = divmod(n, bins)
+    split = extra * (size + 1)
+    indices = [[n - 1]]
+    for start, blocks in ((0, y[:split].reshape(extra, size + 1)), (split, y[split:].reshape(bins - extra, size))):
+        offsets = start + np.arange(len(blocks)) * blocks.shape[1]
+        indices += [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    return np.unique(np.concatenate(indices))
+
+
+def decimate(columns, x_name, bins):
+    """
+    Min/max decimation of the columns of a table.
+
+    Every series keeps its extremes in each bin, the union of these is used for all
+     the columns, so they continue to share the x column.
+
+    :param columns: A dictionary of name: array or a pandas DataFrame.
+    :param x_name: The name of the x column, it is only used for choosing the samples if there is no other column.
+    :param bins: The number of bins, usually the width of the chart in pixels.
+    :return: A dictionary of the decimated columns.
+    """
+    arrays = {str(name): np.asarray(values) for name, values in columns.items()}
+    series = [values for name, values in arrays.items() if name != x_name] or [arrays[x_name]]
+    indices = np.unique(np.concatenate([min_max_indices(values, bins) for values in series]))
+    return {name: values[indices] for name, values in arrays.items()}
+
+
+def telemetry(samples, seed=42):
+    """
+    Synthetic telemetry, a drifting signal with noise and a few spikes.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 100.0, samples)
+    signal = np.sin(t) + 0.3 * np.sin(7.3 * t) + 0.002 * t
+    noise = rng.normal(0.0, 0.1, samples)
+    spikes = np.zeros(samples)
+    spikes[rng.integers(0, samples, 10)] = rng.uniform(-2.0, 2.0, 10)
+    return {'Time': t, 'Signal': signal + noise + spikes, 'Reference': signal}
+
+
+class DecimateOnResize:
+    """
+    Decimate again, to the new width of the chart, when the window is resized.
+    """
+
+    def __init__(self, view, table, columns, x_name):
+        self.view = view
+        self.table = table
+        self.columns = columns
+        self.x_name = x_name
+        self.width = None
+
+    def __call__(self, caller=None, ev=None):
+        width = self.view.GetRenderWindow().GetSize()[0]
+        if width == self.width:
+            return
+        self.width = width
+        update_table(self.table, decimate(self.columns, self.x_name, width))
+
+
+def main():
+    samples = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    columns = telemetry(samples)
+
+    start = time.perf_counter()
+    full_table = table_from_columns(columns)
+    print(f'Wrapped {full_table.GetNumberOfRows()} rows in {time.perf_counter() - start:0.4f}s')
+
+    view = vtkContextView()
+    view.GetRenderer().SetBackground(colors.GetColor3d('SlateGray'))
+    view.GetRenderWindow().SetSize(800, 400)
+    view.GetRenderWindow().SetWindowName('ColumnarTable')
+
+    chart = vtkChartXY()
+    view.GetScene().AddItem(chart)
+    chart.SetShowLegend(True)
+    chart.GetAxis(vtkAxis.BOTTOM).SetTitle('Time')
+    chart.GetAxis(vtkAxis.LEFT).SetTitle('Value')
+
+    start = time.perf_counter()
+    table = table_from_columns(decimate(columns, 'Time', 800))
+    print(f'Decimated to {table.GetNumberOfRows()} rows in {time.perf_counter() - start:0.4f}s')
+
+    line = chart.AddPlot(vtkChart.LINE)
+    line.SetInputData(table, 'Time', 'Signal')
+    line.SetColor(*colors.GetColor4ub('Wheat'))
+    line = chart.AddPlot(vtkChart.LINE)
+    line.SetInputData(table, 'Time', 'Reference')
+    line.SetColor(*colors.GetColor4ub('Navy'))
+    line.SetWidth(2.0)
+
+    view.GetRenderWindow().SetMultiSamples(0)
+    view.GetRenderWindow().AddObserver('WindowResizeEvent', DecimateOnResize(view, table, columns, 'Time'))
+    view.GetInteractor().Initialize()
+    view.GetInteractor().Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingContextOpenGL2
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkChartsCore import (
+    vtkAxis,
+    vtkChart,
+    vtkChartXY
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import vtkTable
+from vtkmodules.vtkViewsContext2D import vtkContextView
+
+# The min/max decimation is shared with the ColumnarTable example.
+from ColumnarTable import min_max_indices
+
+
+def get_program_parameters():
+    import argparse
+    description = 'A chart of live data, kept in a ring buffer and redrawn on a timer.'
+    epilogue = '''
+A thread simulates a sensor producing samples at a fixed rate.
+The chart shows the last few seconds and is redrawn at most at the requested frame rate.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--rate', type=int, default=5000, help='The samples per second.')
+    parser.add_argument('-w', '--window', type=float, default=10.0, help='The number of seconds shown.')
+    parser.add_argument('-f', '--fps', type=int, default=30, help='The maximum frame rate.')
+    args = parser.parse_args()
+    return args.rate, args.window, args.fps
+
+
+class RingBuffer:
+    """
+    The last capacity samples of several channels.
+
+    Every sample is written twice, capacity samples apart, so the window is always
+     a contiguous view of the buffer and never needs copying or reordering.
+    """
+
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.data = np.zeros((channels, 2 * capacity))
+        self.head = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, samples):
+        """
+        Append samples, this can be called from another thread.
+
+        :param samples: A (channels, N) array.
+        """
+        samples = np.asarray(samples)[:, -self.capacity:]
+        n = samples.shape[1]
+        with self.lock:
+            idx = (self.head + np.arange(n)) % self.capacity
+            self.data[:, idx] = samples
+            self.data[:, idx + self.capacity] = samples
+            self.head = (self.head + n) % self.capacity
+            self.count = min(self.count + n, self.capacity)
+
+    def window(self):
+        """
+        A view of the samples in order, the oldest first. Hold the lock while using it.
+
+        :return: A (channels, count) array.
+        """
+        start = self.head + self.capacity - self.count
+        return self.data[:, start:start + self.count]
+
+
+class StreamingChart:
+    """
+    A vtkChartXY showing the contents of a ring buffer.
+
+    The chart's table has a fixed number of rows, its columns are NumPy arrays
+     allocated once. When the window holds more samples than the table, it is
+     reduced to the minimum and maximum of each series in each bin, otherwise the
+     samples are copied as they are. Unused rows repeat the last sample.
+    """
+
+    def __init__(self, chart, buffer, names, points=2000):
+        """
+        :param chart: The chart.
+        :param buffer: The RingBuffer, the first channel is x.
+        :param names: The names of the channels.
+        :param points: The number of rows in the table, about twice the width of the chart in pixels.
+        """
+        self.chart = chart
+        self.buffer = buffer
+        # At least one bin, two samples, per series and the last sample.
+        points = max(points, 2 * (len(names) - 1) + 1)
+        self.points = points
+        self.columns = np.zeros((len(names), points))
+        self.table = vtkTable()
+        for name, column in zip(names, self.columns):
+            array = numpy_to_vtk(column)
+            array.SetName(name)
+            self.table.AddColumn(array)
+        self.plots = list()
+        for name in names[1:]:
+            plot = chart.AddPlot(vtkChart.LINE)
+            plot.SetInputData(self.table, names[0], name)
+            self.plots.append(plot)
+
+    def update(self):
+        """
+        Copy, decimating if necessary, the window of the buffer into the table.
+
+        :return: False if there is nothing to show.
+        """
+        with self.buffer.lock:
+            window = self.buffer.window()
+            n = window.shape[1]
+            if n == 0:
+                return False
+            if n <= self.points:
+                self.columns[:, :n] = window
+            else:
+                # Each series keeps at most two samples per bin, plus the last one. The bins
+                #  cover the whole window, so the newest samples are never left out.
+                bins = max(1, (self.points - 1) // (2 * (len(window) - 1)))
+                indices = np.unique(np.concatenate([min_max_indices(y, bins) for y in window[1:]]))
+                n = len(indices)
+                self.columns[:, :n] = window[:, indices]
+        self.columns[:, n:] = self.columns[:, n - 1:n]
+        for i in range(self.table.GetNumberOfColumns()):
+            self.table.GetColumn(i).Modified()
+        self.table.Modified()
+        self.chart.RecalculateBounds()
+        return True
+
+
+class RenderTimer:
+    """
+    Update the chart and render on a repeating timer.
+    """
+
+    def __init__(self, view, streaming_chart, fps):
+        self.view = view
+        self.streaming_chart = streaming_chart
+        self.interval = max(1, int(1000 / fps))
+        self.frames = 0
+        self.start_time = time.perf_counter()
+
+    def start(self):
+        self.view.GetInteractor().AddObserver('TimerEvent', self)
+        self.view.GetInteractor().CreateRepeatingTimer(self.interval)
+
+    def __call__(self, caller, ev):
+        if self.streaming_chart.update():
+            self.view.GetRenderWindow().Render()
+            self.frames += 1
+            elapsed = time.perf_counter() - self.start_time
+            self.view.GetRenderWindow().SetWindowName(f'StreamingChart {self.frames / elapsed:0.1f} FPS')
+
+
+class Sensor(threading.Thread):
+    """
+    Simulate a sensor, appending blocks of samples to a ring buffer at a fixed rate.
+    """
+
+    def __init__(self, buffer, rate, block=0.01):
+        super().__init__(daemon=True)
+        self.buffer = buffer
+        self.rate = rate
+        self.block = block
+        self.rng = np.random.default_rng(42)
+        self.running = True
+
+    def run(self):
+        start = time.perf_counter()
+        produced = 0
+        while self.running:
+            time.sleep(self.block)
+            total = int((time.perf_counter() - start) * self.rate)
+            t = np.arange(produced, total) / self.rate
+            produced = total
+            signal = np.sin(2.0 * np.pi * 0.5 * t) + 0.2 * np.sin(2.0 * np.pi * 13.0 * t)
+            noisy = signal + self.rng.normal(0.0, 0.1, len(t))
+            self.buffer.append(np.stack([t, noisy, signal]))
+
+
+def main():
+    rate, window, fps = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    view = vtkContextView()
+    view.GetRenderer().SetBackground(colors.GetColor3d('SlateGray'))
+    view.GetRenderWindow().SetSize(800, 400)
+    view.GetRenderWindow().SetWindowName('StreamingChart')
+
+    chart = vtkChartXY()
+    view.GetScene().AddItem(chart)
+    chart.SetShowLegend(True)
+    chart.GetAxis(vtkAxis.BOTTOM).SetTitle('Time (s)')
+    chart.GetAxis(vtkAxis.LEFT).SetTitle('Value')
+
+    buffer = RingBuffer(int(rate * window), 3)
+    streaming_chart = StreamingChart(chart, buffer, ['Time', 'Measured', 'Filtered'], 1600)
+    streaming_chart.plots[0].SetColor(*colors.GetColor4ub('Wheat'))
+    streaming_chart.plots[1].SetColor(*colors.GetColor4ub('Navy'))
+    streaming_chart.plots[1].SetWidth(2.0)
+
+    sensor = Sensor(buffer, rate)
+    sensor.start()
+
+    view.GetRenderWindow().SetMultiSamples(0)
+    view.GetInteractor().Initialize()
+    RenderTimer(view, streaming_chart, fps).start()
+    view.GetInteractor().Start()
+    sensor.running = False
+
+
+if __name__ == '__main__':
+    main()
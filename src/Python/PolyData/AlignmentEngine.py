@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkIterativeClosestPointTransform,
+    vtkPolyData,
+    vtkStaticPointLocator
+)
+from vtkmodules.vtkCommonTransforms import (
+    vtkLandmarkTransform,
+    vtkTransform
+)
+from vtkmodules.vtkFiltersGeneral import (
+    vtkOBBTree,
+    vtkTransformPolyDataFilter
+)
+from vtkmodules.vtkFiltersPoints import (
+    vtkPointInterpolator,
+    vtkVoronoiKernel
+)
+from vtkmodules.vtkIOGeometry import (
+    vtkBYUReader,
+    vtkOBJReader,
+    vtkSTLReader
+)
+from vtkmodules.vtkIOLegacy import vtkPolyDataReader
+from vtkmodules.vtkIOPLY import vtkPLYReader
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkDataSetMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# vtkCellLocator moved from vtkFiltersGeneral to vtkCommonDataModel in VTK 9.1.
+try:
+    from vtkmodules.vtkCommonDataModel import vtkCellLocator
+except ImportError:
+    from vtkmodules.vtkFiltersGeneral import vtkCellLocator
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Align one or more vtkPolyData\'s with a target.'
+    epilogue = '''
+The alignment is the same as in AlignTwoPolyDatas, but:
+ - Each mesh gets a vtkStaticPointLocator that is built once.
+ - The source as it is and the twelve oriented bounding box candidates are scored on
+    a random subsample of the points, concurrently, and only the best few are confirmed
+    with all the points.
+ - The target's cell locator is shared by every ICP refinement.
+
+Several sources can be given, the first aligned source is displayed.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('tgt_fn', help='The polydata target file name, e.g. greatWhite.stl.')
+    parser.add_argument('src_fns', nargs='+',
+                        help='The polydata source file names, e.g. thingiverse/Grey_Nurse_Shark.stl.')
+    parser.add_argument('-s', '--sample_size', type=int, default=1000,
+                        help='The number of points used to score the candidates.')
+    parser.add_argument('-c', '--confirm', type=int, default=3,
+                        help='The number of best candidates confirmed with all the points.')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='The number of threads.')
+    parser.add_argument('-n', '--no_display', action='store_true', help='Do not display the result.')
+
+    args = parser.parse_args()
+    return args.tgt_fn, args.src_fns, args.sample_size, args.confirm, args.jobs, args.no_display
+
+
+class MeshIndex:
+    """
+    The points of a mesh as a NumPy array with a static point locator built once.
+    """
+
+    def __init__(self, poly_data, seed=0):
+        self.poly_data = poly_data
+        self.xyz = vtk_to_numpy(poly_data.GetPoints().GetData()).astype(np.float64)
+        self.rng = np.random.default_rng(seed)
+        self.samples = dict()
+
+        # A point cloud carrying its own coordinates as point data, so that
+        #  vtkPointInterpolator returns the closest point of the mesh.
+        self.cloud = vtkPolyData()
+        self.cloud.SetPoints(poly_data.GetPoints())
+        coords = numpy_to_vtk(self.xyz)
+        coords.SetName('Coords')
+        self.cloud.GetPointData().AddArray(coords)
+
+        self.locator = vtkStaticPointLocator()
+        self.locator.SetDataSet(self.cloud)
+        self.locator.BuildLocator()
+
+    def sample(self, size):
+        """
+        A random subsample of the points, the same one is returned for the same size.
+
+        The subsample is drawn on the first call for a size, make that call before
+         the subsample is used from several threads.
+        """
+        if size is None or size >= len(self.xyz):
+            return self.xyz
+        if size not in self.samples:
+            self.samples[size] = self.xyz[self.rng.choice(len(self.xyz), size, replace=False)]
+        return self.samples[size]
+
+    def distances(self, query):
+        """
+        The distance from each query point to the closest point of the mesh.
+
+        A new vtkPointInterpolator is made for each call, so this can be called
+         from several threads, but they all share the locator.
+
+        :param query: An (N, 3) array of points.
+        :return: The N distances.
+        """
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(np.ascontiguousarray(query), deep=True))
+        probe = vtkPolyData()
+        probe.SetPoints(points)
+
+        interpolator = vtkPointInterpolator()
+        interpolator.SetInputData(probe)
+        interpolator.SetSourceData(self.cloud)
+        interpolator.SetKernel(vtkVoronoiKernel())
+        interpolator.SetLocator(self.locator)
+        interpolator.Update()
+        closest = vtk_to_numpy(interpolator.GetOutput().GetPointData().GetArray('Coords'))
+        return np.linalg.norm(query - closest, axis=1)
+
+
+def apply_matrix(m, xyz):
+    return xyz @ m[:3, :3].T + m[:3, 3]
+
+
+def matrix_from_vtk(transform):
+    m = transform.GetMatrix()
+    return np.array([[m.GetElement(i, j) for j in range(4)] for i in range(4)])
+
+
+def matrix_to_transform(m):
+    transform = vtkTransform()
+    transform.SetMatrix(m.ravel())
+    return transform
+
+
+def hausdorff(m, source, target, sample_size=None):
+    """
+    The (symmetric) Hausdorff distance between the source, transformed by m, and the target.
+
+    The distances from the target to the transformed source are found by mapping
+     the target into the source's frame with the inverse transform, so the source
+     locator never needs rebuilding. For a similarity transform the distances
+     then only need to be scaled.
+
+    :param m: A 4x4 similarity transform.
+    :param source: The source MeshIndex.
+    :param target: The target MeshIndex.
+    :param sample_size: The number of points to use from each mesh, None for all.
+    :return: The distance.
+    """
+    forward = target.distances(apply_matrix(m, source.sample(sample_size)))
+    scale = abs(np.linalg.det(m[:3, :3])) ** (1.0 / 3.0)
+    backward = source.distances(apply_matrix(np.linalg.inv(m), target.sample(sample_size))) * scale
+    return max(forward.max(), backward.max())
+
+
+def obb_corners(poly_data):
+    obb_tree = vtkOBBTree()
+    obb_tree.SetDataSet(poly_data)
+    obb_tree.SetMaxLevel(1)
+    obb_tree.BuildLocator()
+    landmarks = vtkPolyData()
+    obb_tree.GenerateRepresentation(0, landmarks)
+    return landmarks.GetPoints()
+
+
+def rotation_about(axis, angle, center):
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    r = np.eye(4)
+    r[i, i], r[i, j], r[j, i], r[j, j] = c, -s, s, c
+    t = np.eye(4)
+    t[:3, 3] = center
+    return t @ r @ np.linalg.inv(t)
+
+
+class AlignmentEngine:
+    """
+    Align sources with a target using oriented bounding boxes followed by ICP.
+
+    The target is indexed once and reused for every source.
+    """
+
+    def __init__(self, target, sample_size=1000, confirm=3, jobs=4):
+        self.target = MeshIndex(target)
+        self.target_corners = obb_corners(target)
+        self.sample_size = sample_size
+        self.confirm = max(1, confirm)
+        self.target.sample(sample_size)
+        self.jobs = max(1, jobs)
+        # ICP needs a cell locator on the target, it is only built once.
+        self.cell_locator = vtkCellLocator()
+        self.cell_locator.SetDataSet(target)
+        self.cell_locator.SetNumberOfCellsPerBucket(1)
+        self.cell_locator.BuildLocator()
+
+    def candidates(self, source):
+        """
+        The twelve similarity transforms mapping the rotated source OBB corners onto the target corners.
+        """
+        corners = vtk_to_numpy(obb_corners(source).GetData()).astype(np.float64)
+        center = corners.mean(axis=0)
+        result = list()
+        for axis in range(3):
+            for angle in (0.0, 90.0, 180.0, 270.0):
+                rotated = vtkPoints()
+                rotated.SetData(numpy_to_vtk(apply_matrix(rotation_about(axis, angle, center), corners), deep=True))
+                lm_transform = vtkLandmarkTransform()
+                lm_transform.SetModeToSimilarity()
+                lm_transform.SetSourceLandmarks(rotated)
+                lm_transform.SetTargetLandmarks(self.target_corners)
+                lm_transform.Update()
+                result.append(matrix_from_vtk(lm_transform))
+        return result
+
+    def map(self, function, items):
+        if self.jobs == 1:
+            return list(map(function, items))
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(function, items))
+
+    def icp(self, source, m):
+        """
+        Refine the transform m with rigid body ICP.
+        """
+        start = vtkTransformPolyDataFilter()
+        start.SetInputData(source)
+        start.SetTransform(matrix_to_transform(m))
+        start.Update()
+
+        icp = vtkIterativeClosestPointTransform()
+        icp.SetSource(start.GetOutput())
+        icp.SetTarget(self.target.poly_data)
+        icp.SetLocator(self.cell_locator)
+        icp.GetLandmarkTransform().SetModeToRigidBody()
+        icp.SetMaximumNumberOfLandmarks(100)
+        icp.SetMaximumMeanDistance(.00001)
+        icp.SetMaximumNumberOfIterations(500)
+        icp.CheckMeanDistanceOn()
+        icp.StartByMatchingCentroidsOn()
+        icp.Update()
+        if math.isnan(icp.GetMeanDistance()) or math.isinf(icp.GetMeanDistance()):
+            return None
+        return matrix_from_vtk(icp) @ m
+
+    def align(self, source_poly_data):
+        """
+        Align a source with the target.
+
+        :param source_poly_data: The source.
+        :return: The best 4x4 transform, its Hausdorff distance and a dictionary of the distances at each stage.
+        """
+        source = MeshIndex(source_poly_data)
+        # Draw the subsample once, so the candidates scored concurrently all use the same points.
+        source.sample(self.sample_size)
+
+        # The source as it is competes with the bounding box candidates. Closest points
+        #  far from a mesh are slow to find, so it is only scored with all the points
+        #  if it is one of the best few.
+        candidates = [np.eye(4)] + self.candidates(source_poly_data)
+        # A quick score for every candidate on a subsample of the points.
+        scores = self.map(lambda m: hausdorff(m, source, self.target, self.sample_size), candidates)
+        best = [int(i) for i in np.argsort(scores)[:self.confirm]]
+        # Confirm the best few with all the points.
+        confirmed = dict(zip(best, self.map(lambda i: hausdorff(candidates[i], source, self.target), best)))
+
+        results = dict()
+        if 0 in confirmed:
+            results['original'] = (candidates[0], confirmed.pop(0))
+        if confirmed:
+            i = min(confirmed, key=confirmed.get)
+            results['obb'] = (candidates[i], confirmed[i])
+        # The distance of the source as it is, estimated on the subsample if it was not confirmed.
+        distances = {'original': results['original'][1] if 'original' in results else scores[0]}
+
+        m, d = min(results.values(), key=lambda r: r[1])
+        icp_m = self.icp(source_poly_data, m)
+        if icp_m is not None:
+            results['icp'] = (icp_m, hausdorff(icp_m, source, self.target))
+
+        m, d = min(results.values(), key=lambda r: r[1])
+        distances.update({k: v[1] for k, v in results.items()})
+        return m, d, distances
+
+
+def read_poly_data(file_name):
+    import os
+    path, extension = os.path.splitext(file_name)
+    extension = extension.lower()
+    if extension == ".ply":
+        reader = vtkPLYReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    elif extension == ".vtp":
+        reader = vtkXMLPolyDataReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    elif extension == ".obj":
+        reader = vtkOBJReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    elif extension == ".stl":
+        reader = vtkSTLReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    elif extension == ".vtk":
+        reader = vtkPolyDataReader()
+        reader.SetFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    elif extension == ".g":
+        reader = vtkBYUReader()
+        reader.SetGeometryFileName(file_name)
+        reader.Update()
+        poly_data = reader.GetOutput()
+    else:
+        # Return a None if the extension is unknown.
+        poly_data = None
+    return poly_data
+
+
+def main():
+    colors = vtkNamedColors()
+
+    tgt_fn, src_fns, sample_size, confirm, jobs, no_display = get_program_parameters()
+
+    print('Loading target:', tgt_fn)
+    target = read_poly_data(tgt_fn)
+    start = time.perf_counter()
+    engine = AlignmentEngine(target, sample_size, confirm, jobs)
+    print(f'Indexed the target in {time.perf_counter() - start:0.3f}s')
+
+    first = None
+    for src_fn in src_fns:
+        source = read_poly_data(src_fn)
+        if source is None:
+            print('Unable to read:', src_fn)
+            continue
+        start = time.perf_counter()
+        m, d, distances = engine.align(source)
+        print(f'{Path(src_fn).name}: aligned in {time.perf_counter() - start:0.3f}s')
+        for k, v in distances.items():
+            print(f'  {k:>8s}: {v:0.5f}')
+        if first is None:
+            first = (source, m)
+
+    if no_display or first is None:
+        return
+
+    aligned = vtkTransformPolyDataFilter()
+    aligned.SetInputData(first[0])
+    aligned.SetTransform(matrix_to_transform(first[1]))
+
+    source_mapper = vtkDataSetMapper()
+    source_mapper.SetInputConnection(aligned.GetOutputPort())
+    source_mapper.ScalarVisibilityOff()
+    source_actor = vtkActor()
+    source_actor.SetMapper(source_mapper)
+    source_actor.GetProperty().SetOpacity(0.6)
+    source_actor.GetProperty().SetDiffuseColor(colors.GetColor3d('White'))
+
+    target_mapper = vtkDataSetMapper()
+    target_mapper.SetInputData(target)
+    target_mapper.ScalarVisibilityOff()
+    target_actor = vtkActor()
+    target_actor.SetMapper(target_mapper)
+    target_actor.GetProperty().SetDiffuseColor(colors.GetColor3d('Tomato'))
+
+    renderer = vtkRenderer()
+    renderer.AddActor(source_actor)
+    renderer.AddActor(target_actor)
+    renderer.SetBackground(colors.GetColor3d('sea_green_light'))
+    renderer.UseHiddenLineRemovalOn()
+
+    render_window = vtkRenderWindow()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(640, 480)
+    render_window.SetWindowName('AlignmentEngine')
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+    render_window.Render()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkCommonMath import vtkMatrix4x4
+from vtkmodules.vtkIOGeometry import vtkBYUReader
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer,
+    vtkTextActor,
+    vtkTexture,
+    vtkWindowToImageFilter
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Keyframed rigid body animation driven by a timer, with trails.'
+    epilogue = '''
+The motions are those of WalkCow and Rotations, e.g. the cow walking around the origin.
+The transforms for every frame are precomputed as an array of 4x4 matrices.
+
+Sequences: x, y, z, xy, v0, vv, walk.
+Use -n to add a herd of cows walking in concentric circles.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', help='The file cow.g.')
+    parser.add_argument('-s', '--sequence', default='walk',
+                        choices=['x', 'y', 'z', 'xy', 'v0', 'vv', 'walk'], help='The motion to play.')
+    parser.add_argument('-n', '--herd', default=0, type=int, help='The number of additional cows.')
+    parser.add_argument('-f', '--frames_per_step', default=30, type=int,
+                        help='The number of frames between the keyframes.')
+    parser.add_argument('-r', '--rate', default=60, type=int, help='The requested frame rate.')
+    parser.add_argument('-t', '--no_trails', action='store_true', help='Do not leave trails.')
+    args = parser.parse_args()
+    return args.filename, args.sequence, args.herd, args.frames_per_step, args.rate, args.no_trails
+
+
+def translation_matrices(offsets):
+    """
+    :param offsets: An (N, 3) array of translations.
+    :return: An (N, 4, 4) array of translation matrices.
+    """
+    offsets = np.atleast_2d(offsets)
+    m = np.tile(np.eye(4), (len(offsets), 1, 1))
+    m[:, :3, 3] = offsets
+    return m
+
+
+def rotation_matrices(axis, angles, center=(0.0, 0.0, 0.0)):
+    """
+    Rotations about an axis passing through a point, one matrix per angle.
+
+    :param axis: The axis of rotation.
+    :param angles: The angles in degrees.
+    :param center: A point on the axis.
+    :return: An (N, 4, 4) array of homogeneous matrices.
+    """
+    axis = np.asarray(axis, dtype=float)
+    axis = axis / np.linalg.norm(axis)
+    theta = np.radians(np.atleast_1d(angles))
+    c = np.cos(theta)[:, np.newaxis, np.newaxis]
+    s = np.sin(theta)[:, np.newaxis, np.newaxis]
+    x, y, z = axis
+    k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    # Rodrigues' rotation formula.
+    r = c * np.eye(3) + s * k + (1 - c) * np.outer(axis, axis)
+    m = np.tile(np.eye(4), (len(theta), 1, 1))
+    m[:, :3, :3] = r
+    center = np.asarray(center, dtype=float)
+    return translation_matrices(center) @ m @ translation_matrices(-center)
+
+
+def interpolate_angles(steps, step_angle, frames_per_step):
+    """
+    The angles for the frames of a sequence of equal rotations, the keyframes are every frames_per_step frames.
+    """
+    return np.linspace(0.0, steps * step_angle, steps * frames_per_step + 1)
+
+
+def cow_keyframes(sequence, frames_per_step):
+    """
+    The transforms for the WalkCow and Rotations sequences.
+
+    :param sequence: The name of the sequence.
+    :param frames_per_step: The number of frames between the keyframes.
+    :return: The (frames, 4, 4) transforms and the camera position, view up.
+    """
+    angles = interpolate_angles(6, 60.0, frames_per_step)
+    nose_axis = (2.19574, -1.42455, -0.0331036)
+    if sequence == 'x':
+        return rotation_matrices((1, 0, 0), angles), (2, 25, 0), (0, 0, -1)
+    if sequence == 'y':
+        return rotation_matrices((0, 1, 0), angles), (2, 0, 25), (0, 1, 0)
+    if sequence == 'z':
+        return rotation_matrices((0, 0, 1), angles), (2, 0, 25), (0, 1, 0)
+    if sequence == 'xy':
+        # vtkProp3D pre-multiplies: RotateX(60) then RotateY is Rx(60) Ry(angle).
+        return rotation_matrices((1, 0, 0), 60.0) @ rotation_matrices((0, 1, 0), angles), (2, 0, 25), (0, 1, 0)
+    if sequence == 'v0':
+        return rotation_matrices(nose_axis, angles), (16, 9, -12), (0, 1, 0)
+    if sequence == 'vv':
+        return rotation_matrices(nose_axis, angles, (6.11414, 1.27386, 0.015175)), (31, 23, -21), (0, 1, 0)
+    # The cow walking around the global origin.
+    return rotation_matrices((0, 1, 0), angles) @ translation_matrices((0, 0, 5)), (1, 24, 16), (0, 0, -1)
+
+
+def herd_keyframes(number, frames_per_step):
+    """
+    Cows walking in concentric circles, each at its own pace.
+
+    :return: An (number, frames, 4, 4) array.
+    """
+    if number == 0:
+        return np.empty((0, 6 * frames_per_step + 1, 4, 4))
+    rng = np.random.default_rng(42)
+    radii = 10.0 + 5.0 * np.arange(number) / max(1, number // 12)
+    phase = rng.uniform(0.0, 360.0, number)
+    speed = rng.uniform(0.5, 1.5, number)
+    angles = interpolate_angles(6, 60.0, frames_per_step)
+    return np.stack([rotation_matrices((0, 1, 0), phase[i] + speed[i] * angles) @ translation_matrices((0, 0, radii[i]))
+                     for i in range(number)])
+
+
+class KeyframeAnimator:
+    """
+    Play back precomputed rigid body transforms on a repeating timer.
+
+    Each actor gets one vtkMatrix4x4 as its user matrix, every frame only
+     the matrix elements are updated and the window is rendered once.
+
+    Trails are kept in a single image used as the textured background of the
+     renderer. At each keyframe the rendered window is copied into this image,
+     so the history is never re-rendered.
+    """
+
+    def __init__(self, iren, renderer, actors, keyframes, keyframe_every, rate=60, trails=True):
+        """
+        :param iren: The interactor.
+        :param renderer: The renderer containing the actors.
+        :param actors: The actors to animate.
+        :param keyframes: An (actors, frames, 4, 4) array of transforms.
+        :param keyframe_every: Leave a trail every keyframe_every frames.
+        :param rate: The requested frame rate.
+        :param trails: If True, leave trails.
+        """
+        self.iren = iren
+        self.renderer = renderer
+        self.ren_win = iren.GetRenderWindow()
+        self.actors = actors
+        # Row major, flattened matrices ready for vtkMatrix4x4.DeepCopy().
+        self.keyframes = np.ascontiguousarray(keyframes).reshape(len(actors), -1, 16)
+        self.number_of_frames = self.keyframes.shape[1]
+        self.keyframe_every = keyframe_every
+        self.interval = max(1, int(1000 / rate))
+        self.trails = trails
+        self.frame = 0
+        self.timer_id = None
+        self.start_time = None
+        self.rendered = 0
+
+        self.matrices = list()
+        for actor in actors:
+            m = vtkMatrix4x4()
+            actor.SetUserMatrix(m)
+            self.matrices.append(m)
+
+        self.trail_image = vtkImageData()
+        self.grabber = vtkWindowToImageFilter()
+        self.grabber.SetInput(self.ren_win)
+        self.grabber.SetInputBufferTypeToRGB()
+        self.grabber.ReadFrontBufferOff()
+        self.grabber.ShouldRerenderOff()
+        self.texture = vtkTexture()
+        self.texture.SetInputData(self.trail_image)
+
+        self.fps_text = vtkTextActor()
+        self.fps_text.GetTextProperty().SetFontSize(16)
+        self.fps_text.SetDisplayPosition(10, 10)
+        renderer.AddViewProp(self.fps_text)
+
+        # Trails are in screen space, so they are cleared when the camera moves.
+        renderer.GetActiveCamera().AddObserver('ModifiedEvent', self.clear_trails)
+
+    def set_frame(self, frame):
+        for m, keyframes in zip(self.matrices, self.keyframes):
+            m.DeepCopy(keyframes[frame])
+
+    def clear_trails(self, caller=None, ev=None):
+        self.renderer.TexturedBackgroundOff()
+
+    def stamp(self):
+        """
+        Copy the rendered window, including the previous trails, into the trail image.
+        """
+        self.grabber.Modified()
+        self.grabber.Update()
+        self.trail_image.DeepCopy(self.grabber.GetOutput())
+        self.renderer.SetBackgroundTexture(self.texture)
+        self.renderer.TexturedBackgroundOn()
+
+    def start(self):
+        self.frame = 0
+        self.rendered = 0
+        self.clear_trails()
+        self.set_frame(0)
+        self.start_time = time.perf_counter()
+        self.timer_id = self.iren.CreateRepeatingTimer(self.interval)
+        self.iren.AddObserver('TimerEvent', self.execute)
+
+    def fps(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.rendered / elapsed if elapsed > 0 else 0.0
+
+    def execute(self, caller, ev):
+        if self.timer_id is None:
+            return
+        self.set_frame(self.frame)
+        self.fps_text.SetInput(f'Frame {self.frame:4d}/{self.number_of_frames - 1}  {self.fps():5.1f} FPS')
+        self.ren_win.Render()
+        self.rendered += 1
+        if self.trails and self.frame % self.keyframe_every == 0:
+            # Hide the text so that it does not become part of the trail.
+            self.fps_text.VisibilityOff()
+            self.ren_win.Render()
+            self.stamp()
+            self.fps_text.VisibilityOn()
+        self.frame += 1
+        if self.frame == self.number_of_frames:
+            self.iren.DestroyTimer(self.timer_id)
+            self.timer_id = None
+            print(f'Played {self.rendered} frames of {len(self.actors)} actor(s) at {self.fps():0.1f} FPS.')
+
+
+def main():
+    file_name, sequence, herd, frames_per_step, rate, no_trails = get_program_parameters()
+
+    colors = vtkNamedColors()
+    colors.SetColor('BkgColor', [60, 93, 144, 255])
+
+    cow = vtkBYUReader()
+    cow.SetGeometryFileName(file_name)
+    cow.Update()
+
+    cow_mapper = vtkPolyDataMapper()
+    cow_mapper.SetInputConnection(cow.GetOutputPort())
+    cow_mapper.ScalarVisibilityOff()
+
+    ren = vtkRenderer()
+    ren.SetBackground(colors.GetColor3d('BkgColor'))
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(ren)
+    ren_win.SetSize(600, 480)
+    ren_win.SetWindowName('KeyframeAnimation')
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    cow_frames, camera_position, view_up = cow_keyframes(sequence, frames_per_step)
+    herd_frames = herd_keyframes(herd, frames_per_step)
+    keyframes = np.concatenate([cow_frames[np.newaxis], herd_frames])
+
+    actors = list()
+    for i in range(len(keyframes)):
+        actor = vtkActor()
+        actor.SetMapper(cow_mapper)
+        actor.GetProperty().SetColor(colors.GetColor3d('Wheat' if i == 0 else 'Tan'))
+        ren.AddActor(actor)
+        actors.append(actor)
+
+    # The camera as in WalkCow, looking at the center of the cow.
+    ren.GetActiveCamera().SetFocalPoint(cow.GetOutput().GetCenter())
+    ren.GetActiveCamera().SetPosition(camera_position)
+    ren.GetActiveCamera().SetViewUp(view_up)
+    if herd:
+        ren.ResetCamera()
+    ren.ResetCameraClippingRange()
+
+    iren.Initialize()
+    ren_win.Render()
+
+    animator = KeyframeAnimator(iren, ren, actors, keyframes, frames_per_step, rate, not no_trails)
+    animator.start()
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    get_vtk_to_numpy_typemap,
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import (
+    VTK_ID_TYPE,
+    vtkIdList,
+    vtkPoints
+)
+from vtkmodules.vtkCommonDataModel import (
+    VTK_HEXAHEDRON,
+    VTK_POLYHEDRON,
+    VTK_TETRA,
+    VTK_WEDGE,
+    vtkCellArray,
+    vtkPolyData,
+    vtkUnstructuredGrid
+)
+from vtkmodules.vtkFiltersGeneral import vtkShrinkFilter
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkDataSetMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# The NumPy type matching vtkIdType, either int32 or int64.
+ID_TYPE = get_vtk_to_numpy_typemap()[VTK_ID_TYPE]
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Build vtkPolyData and vtkUnstructuredGrid from NumPy arrays.'
+    epilogue = '''
+A block of n x n x n hexahedra, wedges and tetrahedra, along with some polyhedra,
+ is built from NumPy arrays without inserting points or cells one at a time.
+The time taken is compared with InsertNextCell() for the same cells.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--number', default=20, type=int,
+                        help='The number of cells along each side of the block.')
+    args = parser.parse_args()
+    return args.number
+
+
+def as_id_array(a):
+    """
+    Convert to a contiguous NumPy array of vtkIdType, copying only if necessary.
+    """
+    return np.ascontiguousarray(a, dtype=ID_TYPE)
+
+
+def points_from_numpy(xyz):
+    """
+    Wrap an (N, 3) array as vtkPoints without copying.
+
+    The vtkPoints keeps a reference to the array.
+    """
+    xyz = np.ascontiguousarray(xyz)
+    if xyz.dtype not in (np.float32, np.float64):
+        xyz = xyz.astype(np.float64)
+    points = vtkPoints()
+    points.SetData(numpy_to_vtk(xyz.reshape(-1, 3)))
+    return points
+
+
+def cell_array_from_numpy(cells):
+    """
+    Make a vtkCellArray from NumPy arrays without copying.
+
+    :param cells: Either an (N, k) array, N cells each with k points,
+                  or a tuple (offsets, connectivity) for cells of varying size,
+                  where offsets has N + 1 entries and starts with 0.
+    :return: The vtkCellArray.
+    """
+    if isinstance(cells, tuple):
+        offsets, connectivity = cells
+        offsets = as_id_array(offsets)
+        connectivity = as_id_array(connectivity)
+    else:
+        cells = np.asarray(cells)
+        n, k = cells.shape
+        offsets = np.arange(0, (n + 1) * k, k, dtype=ID_TYPE)
+        connectivity = as_id_array(cells).ravel()
+    cell_array = vtkCellArray()
+    cell_array.SetData(numpy_to_vtkIdTypeArray(offsets), numpy_to_vtkIdTypeArray(connectivity))
+    return cell_array
+
+
+def offsets_from_sizes(sizes):
+    offsets = np.zeros(len(sizes) + 1, dtype=ID_TYPE)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
+
+
+def polydata_from_numpy(xyz, verts=None, lines=None, polys=None, strips=None):
+    """
+    Make vtkPolyData from NumPy arrays.
+
+    Each of verts, lines, polys and strips are passed to cell_array_from_numpy().
+    """
+    poly_data = vtkPolyData()
+    poly_data.SetPoints(points_from_numpy(xyz))
+    if verts is not None:
+        poly_data.SetVerts(cell_array_from_numpy(verts))
+    if lines is not None:
+        poly_data.SetLines(cell_array_from_numpy(lines))
+    if polys is not None:
+        poly_data.SetPolys(cell_array_from_numpy(polys))
+    if strips is not None:
+        poly_data.SetStrips(cell_array_from_numpy(strips))
+    return poly_data
+
+
+def mixed_cells(groups):
+    """
+    Combine groups of cells of the same type.
+
+    :param groups: A list of (cell type, (N, k) array of point ids).
+    :return: The cell types, offsets and connectivity arrays for all the cells.
+    """
+    types = np.concatenate([np.full(len(c), t, dtype=np.uint8) for t, c in groups])
+    sizes = np.concatenate([np.full(len(c), np.shape(c)[1], dtype=ID_TYPE) for t, c in groups])
+    connectivity = np.concatenate([as_id_array(c).ravel() for t, c in groups])
+    return types, offsets_from_sizes(sizes), connectivity
+
+
+def polyhedra_arrays(polyhedra, point_offset=0):
+    """
+    The arrays describing polyhedra.
+
+    :param polyhedra: A list of polyhedra, each a list of faces, each face a list of point ids.
+    :param point_offset: Added to the point ids.
+    :return: The offsets and connectivity of the polyhedra points, the number of faces
+             in each polyhedron, the face offsets and the face connectivity.
+    """
+    faces = [f for p in polyhedra for f in p]
+    face_connectivity = as_id_array(np.concatenate(faces)) + point_offset
+    face_offsets = offsets_from_sizes([len(f) for f in faces])
+    faces_per_cell = np.array([len(p) for p in polyhedra], dtype=ID_TYPE)
+    cell_points = [np.unique(np.concatenate(p)) + point_offset for p in polyhedra]
+    cell_offsets = offsets_from_sizes([len(c) for c in cell_points])
+    return cell_offsets, as_id_array(np.concatenate(cell_points)), faces_per_cell, face_offsets, face_connectivity
+
+
+def unstructured_grid_from_numpy(xyz, types, offsets, connectivity, polyhedra=None):
+    """
+    Make a vtkUnstructuredGrid from NumPy arrays.
+
+    :param xyz: The (N, 3) points.
+    :param types: The cell types.
+    :param offsets: The cell offsets, with one more entry than the number of cells.
+    :param connectivity: The point ids of the cells.
+    :param polyhedra: Optionally, (faces per cell, face offsets, face connectivity)
+                      for every cell, the counts are 0 for cells that are not polyhedra.
+    :return: The vtkUnstructuredGrid.
+    """
+    ug = vtkUnstructuredGrid()
+    ug.SetPoints(points_from_numpy(xyz))
+    cell_types = numpy_to_vtk(np.ascontiguousarray(types, dtype=np.uint8))
+    cells = cell_array_from_numpy((offsets, connectivity))
+    if polyhedra is None:
+        ug.SetCells(cell_types, cells)
+        return ug
+
+    faces_per_cell, face_offsets, face_connectivity = polyhedra
+    if hasattr(ug, 'SetPolyhedralCells'):
+        # VTK 9.4 and later, the faces are a vtkCellArray and the faces of each cell
+        #  are a vtkCellArray of face ids.
+        faces = cell_array_from_numpy((face_offsets, face_connectivity))
+        face_locations = cell_array_from_numpy((offsets_from_sizes(faces_per_cell),
+                                                np.arange(len(face_offsets) - 1, dtype=ID_TYPE)))
+        ug.SetPolyhedralCells(cell_types, cells, face_locations, faces)
+    else:
+        # Earlier versions use a single stream per polyhedron:
+        #  (number of faces, number of points in face 0, ids of face 0, ...)
+        #  and the location of each stream, -1 for cells that are not polyhedra.
+        face_sizes = np.diff(face_offsets)
+        stream_sizes = np.where(faces_per_cell > 0, 1 + faces_per_cell, 0)
+        np.add.at(stream_sizes, np.repeat(np.arange(len(faces_per_cell)), faces_per_cell), face_sizes)
+        locations = offsets_from_sizes(stream_sizes)[:-1]
+        locations[faces_per_cell == 0] = -1
+        stream = list()
+        face = 0
+        for n in faces_per_cell:
+            if n == 0:
+                continue
+            stream.append([n])
+            for f in range(face, face + n):
+                stream.append([face_sizes[f]])
+                stream.append(face_connectivity[face_offsets[f]:face_offsets[f + 1]])
+            face += n
+        ug.SetCells(cell_types, cells, numpy_to_vtkIdTypeArray(as_id_array(locations)),
+                    numpy_to_vtkIdTypeArray(as_id_array(np.concatenate(stream))))
+    return ug
+
+
+def block_mesh(n):
+    """
+    The points and cells of an n x n x n block: the first third of the
+     layers are hexahedra, then wedges, then tetrahedra.
+
+    :return: The points and a list of (cell type, (N, k) point ids).
+    """
+    g = np.linspace(0.0, 1.0, n + 1)
+    z, y, x = np.meshgrid(g, g, g, indexing='ij')
+    xyz = np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+
+    # The ids of the first corner of each voxel, then the eight corners.
+    idx = np.arange((n + 1) ** 3).reshape(n + 1, n + 1, n + 1)[:-1, :-1, :-1]
+    s = (1, n + 1, (n + 1) ** 2)
+    corners = np.stack([idx, idx + s[0], idx + s[0] + s[1], idx + s[1],
+                        idx + s[2], idx + s[0] + s[2], idx + s[0] + s[1] + s[2], idx + s[1] + s[2]], axis=-1)
+
+    layers = np.array_split(np.arange(n), 3)
+    hexes = corners[layers[0]].reshape(-1, 8)
+    c = corners[layers[1]].reshape(-1, 8)
+    wedges = np.concatenate([c[:, [0, 1, 3, 4, 5, 7]], c[:, [1, 2, 3, 5, 6, 7]]])
+    c = corners[layers[2]].reshape(-1, 8)
+    # Five tetrahedra per voxel.
+    tets = np.concatenate([c[:, [0, 1, 3, 4]], c[:, [1, 2, 3, 6]], c[:, [1, 4, 5, 6]],
+                           c[:, [3, 4, 6, 7]], c[:, [1, 3, 4, 6]]])
+    return xyz, [(VTK_HEXAHEDRON, hexes), (VTK_WEDGE, wedges), (VTK_TETRA, tets)]
+
+
+def cube_polyhedra(centers, size):
+    """
+    Cubes represented as polyhedra, as in Polyhedron.
+
+    :return: The points and the faces of each polyhedron.
+    """
+    corners = np.array([[-1, -1, -1], [1, -1, -1], [1, 1, -1], [-1, 1, -1],
+                        [-1, -1, 1], [1, -1, 1], [1, 1, 1], [-1, 1, 1]]) * size / 2
+    faces = np.array([[0, 3, 2, 1], [0, 4, 7, 3], [4, 5, 6, 7], [5, 1, 2, 6], [0, 1, 5, 4], [2, 3, 7, 6]])
+    xyz = (centers[:, np.newaxis, :] + corners).reshape(-1, 3)
+    polyhedra = [list(faces + 8 * i) for i in range(len(centers))]
+    return xyz, polyhedra
+
+
+def insert_next_cell(xyz, groups):
+    """
+    The same grid built one point and one cell at a time, for comparison.
+    """
+    points = vtkPoints()
+    for p in xyz:
+        points.InsertNextPoint(p)
+    ug = vtkUnstructuredGrid()
+    ug.SetPoints(points)
+    ids = vtkIdList()
+    for cell_type, cells in groups:
+        for cell in cells:
+            ids.Reset()
+            for i in cell:
+                ids.InsertNextId(int(i))
+            ug.InsertNextCell(cell_type, ids)
+    return ug
+
+
+def main():
+    n = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    xyz, groups = block_mesh(n)
+    start = time.perf_counter()
+    types, offsets, connectivity = mixed_cells(groups)
+
+    # Add a row of polyhedra above the block.
+    centers = np.column_stack([np.linspace(0.1, 0.9, 5), np.full(5, 0.5), np.full(5, 1.3)])
+    poly_xyz, polyhedra = cube_polyhedra(centers, 0.15)
+    poly_offsets, poly_connectivity, faces_per_cell, face_offsets, face_connectivity = polyhedra_arrays(
+        polyhedra, point_offset=len(xyz))
+
+    types = np.concatenate([types, np.full(len(polyhedra), VTK_POLYHEDRON, dtype=np.uint8)])
+    offsets = np.concatenate([offsets, offsets[-1] + poly_offsets[1:]])
+    connectivity = np.concatenate([connectivity, poly_connectivity])
+    faces_per_cell = np.concatenate([np.zeros(len(types) - len(polyhedra), dtype=ID_TYPE), faces_per_cell])
+    ug = unstructured_grid_from_numpy(np.concatenate([xyz, poly_xyz]), types, offsets, connectivity,
+                                      (faces_per_cell, face_offsets, face_connectivity))
+    numpy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    insert_next_cell(xyz, groups)
+    insert_time = time.perf_counter() - start
+
+    print(f'{ug.GetNumberOfCells()} cells, {ug.GetNumberOfPoints()} points')
+    print(f'NumPy arrays:     {numpy_time:0.4f}s')
+    print(f'InsertNextCell(): {insert_time:0.4f}s (without the polyhedra)')
+
+    shrink = vtkShrinkFilter()
+    shrink.SetInputData(ug)
+    shrink.SetShrinkFactor(0.8)
+
+    mapper = vtkDataSetMapper()
+    mapper.SetInputConnection(shrink.GetOutputPort())
+    mapper.ScalarVisibilityOff()
+
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.GetProperty().SetColor(colors.GetColor3d('Tomato'))
+    actor.GetProperty().EdgeVisibilityOn()
+
+    renderer = vtkRenderer()
+    renderer.AddActor(actor)
+    renderer.SetBackground(colors.GetColor3d('SlateGray'))
+    renderer.GetActiveCamera().Azimuth(30)
+    renderer.GetActiveCamera().Elevation(30)
+    renderer.ResetCamera()
+
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    ren_win.SetSize(640, 480)
+    ren_win.SetWindowName('NumPyMeshBuilder')
+
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+    ren_win.Render()
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
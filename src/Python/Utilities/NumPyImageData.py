@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingVolumeOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonDataModel import (
+    vtkImageData,
+    vtkPiecewiseFunction
+)
+from vtkmodules.vtkImagingCore import vtkImageCast
+from vtkmodules.vtkImagingMath import vtkImageWeightedSum
+from vtkmodules.vtkRenderingCore import (
+    vtkColorTransferFunction,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer,
+    vtkVolume,
+    vtkVolumeProperty
+)
+from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Wrap NumPy arrays, including memory mapped files, as vtkImageData and process them in slabs.'
+    epilogue = '''
+Two volumes are made as memory mapped files, their weighted sum is computed
+ slab by slab with vtkImageWeightedSum, normalised to unsigned char and displayed.
+Only a few slabs are in memory at any time, set the budget with -m.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--size', type=int, default=128, help='The size of the volume along each axis.')
+    parser.add_argument('-m', '--memory', type=float, default=16.0, help='The memory budget for a slab in MB.')
+    parser.add_argument('-d', '--directory', default=None,
+                        help='The directory for the memory mapped files, a temporary one by default.')
+    args = parser.parse_args()
+    return args.size, args.memory, args.directory
+
+
+def image_from_numpy(array, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0), name='Scalars', offset=(0, 0, 0)):
+    """
+    Wrap a NumPy array as the scalars of a vtkImageData without copying it.
+
+    The array is indexed [z, y, x] or [z, y, x, component], so x varies fastest as VTK expects.
+     It can be a np.memmap, the pages are then read as VTK touches them.
+
+    The VTK array keeps a reference to the NumPy array, so the array lives at least
+     as long as the image. The array must not be resized while the image is in use.
+
+    :param array: A C contiguous array with 3 or 4 dimensions.
+    :param spacing: The spacing of the image.
+    :param origin: The origin of the image.
+    :param name: The name of the scalars.
+    :param offset: The (x, y, z) index of the first voxel, so a slab keeps its place in a larger volume.
+    :return: The image.
+    """
+    if array.ndim == 3:
+        array = array[..., np.newaxis]
+    if array.ndim != 4:
+        raise ValueError(f'Expected an array indexed [z, y, x] or [z, y, x, component], got {array.ndim} dimensions.')
+    if not array.flags.c_contiguous:
+        raise ValueError('The array must be C contiguous to be wrapped without a copy.')
+    nz, ny, nx, nc = array.shape
+    scalars = numpy_to_vtk(array.reshape(-1, nc), deep=False)
+    scalars.SetName(name)
+    image = vtkImageData()
+    image.SetExtent(offset[0], offset[0] + nx - 1, offset[1], offset[1] + ny - 1, offset[2], offset[2] + nz - 1)
+    image.SetSpacing(spacing)
+    image.SetOrigin(origin)
+    image.GetPointData().SetScalars(scalars)
+    return image
+
+
+def numpy_from_image(image, name=None):
+    """
+    A NumPy view of the point data of an image, indexed [z, y, x] or [z, y, x, component].
+
+    The view keeps a reference to the VTK array.
+
+    :param image: The image.
+    :param name: The array name, the scalars if None.
+    :return: The view.
+    """
+    data = image.GetPointData()
+    vtk_array = data.GetScalars() if name is None else data.GetArray(name)
+    nx, ny, nz = image.GetDimensions()
+    array = vtk_to_numpy(vtk_array)
+    nc = vtk_array.GetNumberOfComponents()
+    return array.reshape((nz, ny, nx) if nc == 1 else (nz, ny, nx, nc))
+
+
+def slab_depth(arrays, memory_budget):
+    """
+    The number of z slices in a slab, so that a slab of all the arrays fits in the budget.
+
+    :param arrays: The arrays processed together, indexed [z, ...].
+    :param memory_budget: The budget in bytes.
+    :return: The number of slices.
+    """
+    slice_bytes = sum(a[0].nbytes for a in arrays)
+    return int(max(1, min(len(arrays[0]), memory_budget // max(slice_bytes, 1))))
+
+
+def slabs(depth, slab):
+    """
+    The (start, stop) z ranges of the slabs.
+    """
+    for start in range(0, depth, slab):
+        yield start, min(start + slab, depth)
+
+
+def stream_filter(inputs, output, make_filter, memory_budget=64 * 2 ** 20):
+    """
+    Run a VTK image filter over the arrays slab by slab, writing into the output array.
+
+    Each slab of the inputs is wrapped, not copied, as a vtkImageData and the
+     output of the filter is copied into the same slab of the output array.
+     The filter must not need neighbouring slices, e.g. point wise operations.
+
+    :param inputs: The input arrays, indexed [z, y, x], e.g. np.memmap's.
+    :param output: The output array, e.g. a np.memmap opened for writing.
+    :param make_filter: A function returning the filter, connected to the list of slab images it is given.
+    :param memory_budget: The bytes for the slabs of the inputs and the output.
+    :return: The number of slabs.
+    """
+    depth = slab_depth(list(inputs) + [output], memory_budget)
+    count = 0
+    for start, stop in slabs(len(output), depth):
+        images = [image_from_numpy(np.ascontiguousarray(a[start:stop]), offset=(0, 0, start)) for a in inputs]
+        image_filter = make_filter(images)
+        image_filter.Update()
+        output[start:stop] = numpy_from_image(image_filter.GetOutput()).reshape(output[start:stop].shape)
+        count += 1
+    return count
+
+
+def weighted_sum(inputs, weights, output, normalize_by_weight=True, memory_budget=64 * 2 ** 20):
+    """
+    The weighted sum of the arrays, with vtkImageWeightedSum applied slab by slab.
+
+    :param inputs: The input arrays.
+    :param weights: The weights.
+    :param output: The output array, the sum is computed in double precision.
+    :param normalize_by_weight: Divide by the sum of the weights, as vtkImageWeightedSum does by default.
+    :param memory_budget: The bytes for the slabs of the inputs and the output.
+    :return: The number of slabs.
+    """
+
+    def make_filter(images):
+        sum_filter = vtkImageWeightedSum()
+        sum_filter.SetNormalizeByWeight(normalize_by_weight)
+        for i, (image, weight) in enumerate(zip(images, weights)):
+            # vtkImageWeightedSum needs inputs of the same type, only this slab is cast.
+            cast = vtkImageCast()
+            cast.SetInputData(image)
+            cast.SetOutputScalarTypeToDouble()
+            sum_filter.AddInputConnection(cast.GetOutputPort())
+            sum_filter.SetWeight(i, weight)
+        return sum_filter
+
+    return stream_filter(inputs, output, make_filter, memory_budget)
+
+
+def streamed_range(array, memory_budget=64 * 2 ** 20):
+    """
+    The minimum and maximum of an array, read slab by slab.
+    """
+    lo, hi = np.inf, -np.inf
+    for start, stop in slabs(len(array), slab_depth([array], memory_budget)):
+        slab = array[start:stop]
+        lo, hi = min(lo, slab.min()), max(hi, slab.max())
+    return lo, hi
+
+
+def normalise(array, output, low=0.0, high=255.0, memory_budget=64 * 2 ** 20):
+    """
+    Rescale an array linearly to [low, high], slab by slab. The output can have a different type.
+
+    :return: The range of the input.
+    """
+    lo, hi = streamed_range(array, memory_budget)
+    scale = (high - low) / (hi - lo) if hi > lo else 0.0
+    depth = slab_depth([array, output], memory_budget)
+    for start, stop in slabs(len(array), depth):
+        values = (array[start:stop] - lo) * scale + low
+        if np.issubdtype(output.dtype, np.integer):
+            np.rint(values, out=values)
+        output[start:stop] = values
+    return lo, hi
+
+
+def make_volumes(directory, size):
+    """
+    Two volumes as memory mapped files: three overlapping cubes, as in VTKWithNumpy, and a radial ramp.
+    """
+    shape = (size, size, size)
+    cubes = np.memmap(directory / 'cubes.raw', dtype=np.uint8, mode='w+', shape=shape)
+    a, b, c, d = (int(size * f) for f in (0.47, 0.33, 0.73, 0.6))
+    cubes[:] = 0
+    cubes[0:a, 0:a, 0:a] = 50
+    cubes[b:c, b:c, b:c] = 100
+    cubes[d:, d:, d:] = 150
+    cubes.flush()
+
+    ramp = np.memmap(directory / 'ramp.raw', dtype=np.float32, mode='w+', shape=shape)
+    y, x = np.mgrid[0:size, 0:size] / size - 0.5
+    for start, stop in slabs(size, 16):
+        z = (np.arange(start, stop) / size - 0.5)[:, np.newaxis, np.newaxis]
+        ramp[start:stop] = 1.0 - np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    ramp.flush()
+    return cubes, ramp
+
+
+def main():
+    size, memory, directory = get_program_parameters()
+    memory_budget = int(memory * 2 ** 20)
+
+    colors = vtkNamedColors()
+
+    temporary = None
+    if directory is None:
+        temporary = tempfile.TemporaryDirectory()
+        directory = temporary.name
+    directory = Path(directory)
+
+    cubes, ramp = make_volumes(directory, size)
+    shape = cubes.shape
+    summed = np.memmap(directory / 'sum.raw', dtype=np.float64, mode='w+', shape=shape)
+    normalised = np.memmap(directory / 'normalised.raw', dtype=np.uint8, mode='w+', shape=shape)
+
+    start = time.perf_counter()
+    count = weighted_sum([cubes, ramp], [0.8, 100.0], summed, memory_budget=memory_budget)
+    print(f'Weighted sum of {shape} volumes in {count} slabs in {time.perf_counter() - start:0.3f}s')
+    start = time.perf_counter()
+    lo, hi = normalise(summed, normalised, memory_budget=memory_budget)
+    print(f'Normalised [{lo:0.2f}, {hi:0.2f}] to [0, 255] in {time.perf_counter() - start:0.3f}s')
+
+    # The whole volume, still memory mapped, for display.
+    image = image_from_numpy(normalised)
+
+    opacity = vtkPiecewiseFunction()
+    opacity.AddPoint(0, 0.0)
+    opacity.AddPoint(80, 0.0)
+    opacity.AddPoint(160, 0.05)
+    opacity.AddPoint(255, 0.2)
+    color = vtkColorTransferFunction()
+    color.AddRGBPoint(80, *colors.GetColor3d('Red'))
+    color.AddRGBPoint(160, *colors.GetColor3d('Lime'))
+    color.AddRGBPoint(255, *colors.GetColor3d('Blue'))
+    volume_property = vtkVolumeProperty()
+    volume_property.SetColor(color)
+    volume_property.SetScalarOpacity(opacity)
+
+    volume_mapper = vtkFixedPointVolumeRayCastMapper()
+    volume_mapper.SetInputData(image)
+    volume = vtkVolume()
+    volume.SetMapper(volume_mapper)
+    volume.SetProperty(volume_property)
+
+    renderer = vtkRenderer()
+    renderer.AddVolume(volume)
+    renderer.SetBackground(colors.GetColor3d('MistyRose'))
+    render_window = vtkRenderWindow()
+    render_window.AddRenderer(renderer)
+    render_window.SetSize(400, 400)
+    render_window.SetWindowName('NumPyImageData')
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+    render_window.Render()
+    interactor.Start()
+
+    # Release the memory maps before the temporary directory is removed.
+    del image, volume_mapper, cubes, ramp, summed, normalised
+    if temporary is not None:
+        temporary.cleanup()
+
+
+if __name__ == '__main__':
+    main()
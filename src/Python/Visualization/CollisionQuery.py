@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+import math
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingFreeType
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import vtk_to_numpy
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonMath import vtkMatrix4x4
+from vtkmodules.vtkCommonTransforms import vtkTransform
+from vtkmodules.vtkFiltersModeling import vtkCollisionDetectionFilter
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer,
+    vtkTextActor
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'The time of first contact of a moving object with a fixed one.'
+    epilogue = '''
+The moving sphere of CollisionDetection follows the same path, but instead of
+ stepping along it the time of first contact is found by bisection.
+The OBB trees of vtkCollisionDetectionFilter are built once and reused by every query.
+
+The path is sampled coarsely with -s samples, so that a thin object cannot be passed
+ through between two samples, then the first interval with a contact is bisected.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--resolution', type=int, default=30, help='The resolution of the spheres.')
+    parser.add_argument('-s', '--samples', type=int, default=1, help='The number of coarse samples of the path.')
+    parser.add_argument('-t', '--tolerance', type=float, default=1.0e-6,
+                        help='The tolerance of the time of contact, as a fraction of the path.')
+    args = parser.parse_args()
+    return args.resolution, args.samples, args.tolerance
+
+
+def matrix_from_numpy(array):
+    matrix = vtkMatrix4x4()
+    matrix.DeepCopy(np.asarray(array, dtype=float).ravel())
+    return matrix
+
+
+def translation_path(start, end):
+    """
+    A motion from start to end, as a function of t in [0, 1] returning a 4x4 array.
+    """
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+
+    def motion(t):
+        m = np.eye(4)
+        m[:3, 3] = start + t * (end - start)
+        return m
+
+    return motion
+
+
+class CollisionQuery:
+    """
+    Collision queries between two polydata with changing transforms.
+
+    A single vtkCollisionDetectionFilter is kept, so the OBB trees of the
+     inputs are built on the first query and reused by all the others, only the
+     matrices change.
+    """
+
+    def __init__(self, fixed, moving, cells_per_node=2):
+        """
+        :param fixed: The polydata that does not move.
+        :param moving: The polydata that moves.
+        :param cells_per_node: The number of cells in a leaf of the OBB trees.
+        """
+        self.matrices = (vtkMatrix4x4(), vtkMatrix4x4())
+        self.collide = vtkCollisionDetectionFilter()
+        self.collide.SetInputData(0, fixed)
+        self.collide.SetInputData(1, moving)
+        self.collide.SetMatrix(0, self.matrices[0])
+        self.collide.SetMatrix(1, self.matrices[1])
+        self.collide.SetBoxTolerance(0.0)
+        self.collide.SetCellTolerance(0.0)
+        self.collide.SetNumberOfCellsPerNode(cells_per_node)
+        self.evaluations = 0
+
+    def set_moving(self, matrix):
+        self.matrices[1].DeepCopy(np.asarray(matrix, dtype=float).ravel())
+
+    def in_contact(self, matrix):
+        """
+        True if the moving polydata, placed by the 4x4 matrix, touches the fixed one.
+        """
+        self.set_moving(matrix)
+        # Stop at the first contact, the pairs are not needed.
+        self.collide.SetCollisionModeToFirstContact()
+        self.collide.Update()
+        self.evaluations += 1
+        return self.collide.GetNumberOfContacts() > 0
+
+    def contacts(self, matrix):
+        """
+        All the pairs of contacting cells, with the moving polydata placed by the 4x4 matrix.
+
+        :return: The cell ids in the fixed and the moving polydata, and the (contacts, 2, 3) contact points.
+        """
+        self.set_moving(matrix)
+        self.collide.SetCollisionModeToAllContacts()
+        self.collide.Update()
+        self.evaluations += 1
+        n = self.collide.GetNumberOfContacts()
+        if n == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty((0, 2, 3))
+        # Copies, the filter reuses its arrays on the next query.
+        cells0 = vtk_to_numpy(self.collide.GetContactCells(0)).astype(np.int64)
+        cells1 = vtk_to_numpy(self.collide.GetContactCells(1)).astype(np.int64)
+        points = vtk_to_numpy(self.collide.GetContactsOutput().GetPoints().GetData()).reshape(n, 2, 3).copy()
+        return cells0, cells1, points
+
+    def time_of_impact(self, motion, samples=1, tolerance=1.0e-6):
+        """
+        The first time the moving polydata touches the fixed one along a motion.
+
+        The times i / samples are tested in order until one is in contact, then the
+         interval before it is bisected. With one sample the motion is assumed to
+         stay in contact once it has touched, as when one part is pushed into another;
+         use more samples when the parts may pass through each other.
+
+        :param motion: A function of t in [0, 1] returning the 4x4 matrix of the moving polydata.
+        :param samples: The number of coarse samples.
+        :param tolerance: The width of the interval holding the first contact.
+        :return: The time of first contact, or None if there is none.
+        """
+        if self.in_contact(motion(0.0)):
+            return 0.0
+        lo = 0.0
+        for i in range(1, samples + 1):
+            hi = i / samples
+            if self.in_contact(motion(hi)):
+                break
+            lo = hi
+        else:
+            return None
+        # Not in contact at lo, in contact at hi.
+        while hi - lo > tolerance:
+            mid = 0.5 * (lo + hi)
+            if self.in_contact(motion(mid)):
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+
+def main():
+    resolution, samples, tolerance = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    # The spheres of CollisionDetection, the moving one is the first there.
+    moving_source = vtkSphereSource()
+    moving_source.SetRadius(0.29)
+    moving_source.SetPhiResolution(resolution + 1)
+    moving_source.SetThetaResolution(resolution + 1)
+    moving_source.Update()
+
+    fixed_source = vtkSphereSource()
+    fixed_source.SetPhiResolution(resolution)
+    fixed_source.SetThetaResolution(resolution)
+    fixed_source.SetRadius(0.3)
+    fixed_source.Update()
+
+    # CollisionDetection moves the sphere 2 units, in 100 steps, from x = -2.3.
+    motion = translation_path((-2.3, 0.0, 0.0), (-0.3, 0.0, 0.0))
+
+    query = CollisionQuery(fixed_source.GetOutput(), moving_source.GetOutput())
+    start = time.perf_counter()
+    query.in_contact(motion(0.0))
+    print(f'Built the OBB trees in {time.perf_counter() - start:0.3f}s')
+
+    query.evaluations = 0
+    start = time.perf_counter()
+    t = query.time_of_impact(motion, samples, tolerance)
+    elapsed = time.perf_counter() - start
+    if t is None:
+        print(f'No contact, {query.evaluations} queries in {elapsed * 1000:0.2f}ms')
+        return
+    print(f'First contact at t = {t:0.7f}, x = {motion(t)[0, 3]:0.7f},'
+          f' {query.evaluations} queries in {elapsed * 1000:0.2f}ms'
+          f' (stepping at this tolerance needs {math.ceil(t / tolerance)})')
+
+    cells0, cells1, points = query.contacts(motion(t))
+    print(f'{len(cells0)} contacting cell pairs')
+    for c0, c1, p in zip(cells0[:5], cells1[:5], points[:5]):
+        print(f'  fixed cell {c0:5d}, moving cell {c1:5d}, at {np.round(p[0], 5)}')
+
+    # Show the contact.
+    transform = vtkTransform()
+    transform.SetMatrix(matrix_from_numpy(motion(t)))
+
+    moving_mapper = vtkPolyDataMapper()
+    moving_mapper.SetInputData(moving_source.GetOutput())
+    moving_actor = vtkActor()
+    moving_actor.SetMapper(moving_mapper)
+    moving_actor.SetUserTransform(transform)
+    moving_actor.GetProperty().BackfaceCullingOn()
+    moving_actor.GetProperty().SetDiffuseColor(colors.GetColor3d('Tomato'))
+    moving_actor.GetProperty().SetRepresentationToWireframe()
+
+    fixed_mapper = vtkPolyDataMapper()
+    fixed_mapper.SetInputData(fixed_source.GetOutput())
+    fixed_actor = vtkActor()
+    fixed_actor.SetMapper(fixed_mapper)
+    fixed_actor.GetProperty().BackfaceCullingOn()
+
+    contacts_mapper = vtkPolyDataMapper()
+    contacts_mapper.SetInputConnection(query.collide.GetContactsOutputPort())
+    contacts_mapper.SetResolveCoincidentTopologyToPolygonOffset()
+    contacts_actor = vtkActor()
+    contacts_actor.SetMapper(contacts_mapper)
+    contacts_actor.GetProperty().SetColor(colors.GetColor3d('Black'))
+    contacts_actor.GetProperty().SetLineWidth(3.0)
+
+    txt = vtkTextActor()
+    txt.GetTextProperty().SetFontSize(18)
+    txt.SetInput(f'First contact at t = {t:0.6f} after {query.evaluations} queries:'
+                 f' {len(cells0)} contact cells')
+
+    renderer = vtkRenderer()
+    renderer.UseHiddenLineRemovalOn()
+    renderer.AddActor(moving_actor)
+    renderer.AddActor(fixed_actor)
+    renderer.AddActor(contacts_actor)
+    renderer.AddActor(txt)
+    renderer.SetBackground(colors.GetColor3d('Gray'))
+
+    render_window = vtkRenderWindow()
+    render_window.SetSize(640, 480)
+    render_window.AddRenderer(renderer)
+    render_window.SetWindowName('CollisionQuery')
+
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    renderer.ResetCamera()
+    renderer.GetActiveCamera().Azimuth(-60)
+    renderer.GetActiveCamera().Elevation(45)
+    renderer.GetActiveCamera().Dolly(1.2)
+    renderer.ResetCameraClippingRange()
+    render_window.Render()
+    interactor.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+
+import time
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkMinimalStandardRandomSequence
+from vtkmodules.vtkFiltersSources import (
+    vtkCylinderSource,
+    vtkPlaneSource
+)
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkCamera,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer,
+    vtkTextActor,
+    vtkWindowToImageFilter
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Towers of Hanoi played back by a timer driven animation scheduler.'
+    epilogue = '''
+Keys:
+   space    Pause/resume.
+   Left     Seek back one move.
+   Right    Seek forward one move.
+   Home     Go to the start.
+   End      Go to the end.
+   +/-      Double/halve the playback speed.
+
+With -o the moves are rendered off screen to a sequence of PNG images.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-p', '--number_of_pucks', default=5, type=int, help='The number of pucks.')
+    parser.add_argument('-r', '--puck_resolution', default=48, type=int, help='The puck resolution.')
+    parser.add_argument('-t', '--move_time', default=0.6, type=float, help='The time for one move in seconds.')
+    parser.add_argument('-f', '--fps', default=30, type=int, help='The requested frame rate.')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Render off screen to PNG files with this prefix, e.g. frames/hanoi.')
+    args = parser.parse_args()
+    return args.number_of_pucks, args.puck_resolution, args.move_time, args.fps, args.output
+
+
+def hanoi_moves(n, source=0, target=2, helper=1):
+    """
+    The moves solving the Towers of Hanoi, generated iteratively.
+
+    :return: An (2**n - 1, 2) array of (from peg, to peg).
+    """
+    moves = list()
+    stack = [(n, source, target, helper, False)]
+    while stack:
+        k, s, t, h, expanded = stack.pop()
+        if k == 0:
+            continue
+        if expanded:
+            moves.append((s, t))
+            continue
+        # Pushed in reverse order: move k-1 to the helper, move disk k, move k-1 to the target.
+        stack.append((k - 1, h, t, s, False))
+        stack.append((k, s, t, h, True))
+        stack.append((k - 1, s, h, t, False))
+    return np.array(moves, dtype=np.int8).reshape(-1, 2)
+
+
+class HanoiTimeline:
+    """
+    The precomputed state of the puzzle.
+
+    For each move, the puck moved and its start and end levels are stored,
+     along with the peg of every puck before the move. The position of every
+     puck at any time can then be computed without replaying the moves.
+    """
+
+    def __init__(self, number_of_pucks, move_time, geometry):
+        self.number_of_pucks = number_of_pucks
+        self.move_time = move_time
+        self.L, self.H, self.D, self.r_max = geometry
+        self.moves = hanoi_moves(number_of_pucks)
+        self.number_of_moves = len(self.moves)
+        self.duration = self.number_of_moves * move_time
+
+        # Puck 0 is the largest, at the bottom of peg 0.
+        self.pegs = np.zeros((self.number_of_moves + 1, number_of_pucks), dtype=np.int8)
+        self.puck = np.zeros(self.number_of_moves, dtype=np.int32)
+        self.levels = np.zeros((self.number_of_moves, 2), dtype=np.int32)
+        stacks = [list(range(number_of_pucks)), [], []]
+        for i, (p1, p2) in enumerate(self.moves):
+            self.pegs[i + 1] = self.pegs[i]
+            puck = stacks[p1].pop()
+            self.puck[i] = puck
+            self.levels[i] = len(stacks[p1]), len(stacks[p2])
+            stacks[p2].append(puck)
+            self.pegs[i + 1, puck] = p2
+
+    def resting(self, move):
+        """
+        The positions of the pucks before a move.
+
+        :return: An (number_of_pucks, 3) array.
+        """
+        pegs = self.pegs[move]
+        same_peg = pegs[np.newaxis, :] == pegs[:, np.newaxis]
+        # The level of a puck is the number of larger pucks on its peg.
+        levels = np.tril(same_peg, -1).sum(axis=1)
+        positions = np.zeros((self.number_of_pucks, 3))
+        positions[:, 0] = pegs * self.D
+        positions[:, 1] = levels * self.L + self.L / 2
+        return positions
+
+    def state(self, t):
+        """
+        The puck positions and the flip angle of the moving puck at time t.
+
+        :return: The positions, the moving puck (or -1) and its angle.
+        """
+        t = min(max(t, 0.0), self.duration)
+        move = int(t / self.move_time)
+        if move >= self.number_of_moves:
+            return self.resting(self.number_of_moves), -1, 0.0
+        positions = self.resting(move)
+        puck = self.puck[move]
+        p1, p2 = self.moves[move]
+        l1, l2 = self.levels[move]
+        y1 = l1 * self.L + self.L / 2
+        y2 = l2 * self.L + self.L / 2
+        top = self.H + self.r_max
+        # Up, across and down each take a third of the move.
+        s = 3.0 * (t / self.move_time - move)
+        angle = 0.0
+        if s < 1.0:
+            positions[puck] = p1 * self.D, y1 + s * (top - y1), 0.0
+        elif s < 2.0:
+            positions[puck] = (p1 + (s - 1.0) * (p2 - p1)) * self.D, top, 0.0
+            angle = 180.0 * (s - 1.0)
+        else:
+            positions[puck] = p2 * self.D, top + (s - 2.0) * (y2 - top), 0.0
+            angle = 180.0
+        return positions, puck, angle
+
+
+class AnimationScheduler:
+    """
+    Drive an animation from a repeating timer.
+
+    The animation time comes from the wall clock, so the playback speed does
+     not depend on the speed of the machine. If rendering a frame takes longer
+     than the frame budget, timer events are skipped until the budget is met.
+     The interactor stays responsive since control returns to the event loop
+     after every frame.
+    """
+
+    def __init__(self, iren, duration, apply, fps=30):
+        """
+        :param iren: The interactor.
+        :param duration: The length of the animation in seconds.
+        :param apply: A function taking the animation time, that updates the scene.
+        :param fps: The requested frame rate.
+        """
+        self.iren = iren
+        self.ren_win = iren.GetRenderWindow()
+        self.duration = duration
+        self.apply = apply
+        self.budget = 1.0 / fps
+        self.interval = max(1, int(1000 * self.budget))
+        self.speed = 1.0
+        self.t = 0.0
+        self.paused = False
+        self.last_tick = None
+        self.last_render_time = 0.0
+        self.next_render = 0.0
+        self.rendered = 0
+        self.skipped = 0
+        self.timer_id = None
+
+    def start(self):
+        self.iren.AddObserver('TimerEvent', self.tick)
+        self.last_tick = time.perf_counter()
+        self.timer_id = self.iren.CreateRepeatingTimer(self.interval)
+
+    def pause(self, paused=None):
+        self.paused = not self.paused if paused is None else paused
+        self.last_tick = time.perf_counter()
+
+    def seek(self, t):
+        self.t = min(max(t, 0.0), self.duration)
+        self.render()
+
+    def render(self):
+        start = time.perf_counter()
+        self.apply(self.t)
+        self.ren_win.Render()
+        self.last_render_time = time.perf_counter() - start
+        self.next_render = start + max(self.budget, self.last_render_time)
+        self.rendered += 1
+
+    def tick(self, caller, ev):
+        now = time.perf_counter()
+        if not self.paused:
+            self.t = min(self.t + (now - self.last_tick) * self.speed, self.duration)
+        self.last_tick = now
+        if self.paused:
+            return
+        if now < self.next_render and self.t < self.duration:
+            # Over budget, drop this frame.
+            self.skipped += 1
+            return
+        self.render()
+        if self.t >= self.duration:
+            self.paused = True
+            print(f'Rendered {self.rendered} frames, skipped {self.skipped}.')
+
+
+def render_sequence(ren_win, apply, duration, fps, prefix):
+    """
+    Render the animation off screen, writing one PNG file per frame.
+
+    :param ren_win: The render window.
+    :param apply: A function taking the animation time, that updates the scene.
+    :param duration: The length of the animation in seconds.
+    :param fps: The frame rate of the image sequence.
+    :param prefix: The path and prefix of the image files.
+    """
+    path = Path(prefix)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ren_win.SetOffScreenRendering(True)
+    grabber = vtkWindowToImageFilter()
+    grabber.SetInput(ren_win)
+    grabber.SetInputBufferTypeToRGB()
+    grabber.ReadFrontBufferOff()
+    writer = vtkPNGWriter()
+    writer.SetInputConnection(grabber.GetOutputPort())
+    times = np.arange(0.0, duration + 0.5 / fps, 1.0 / fps)
+    for i, t in enumerate(times):
+        apply(t)
+        ren_win.Render()
+        grabber.Modified()
+        writer.SetFileName(f'{path}{i:06d}.png')
+        writer.Write()
+    print(f'Wrote {len(times)} frames to {path}*.png')
+
+
+class KeyPressCallback:
+    def __init__(self, scheduler, move_time):
+        self.scheduler = scheduler
+        self.move_time = move_time
+
+    def __call__(self, caller, ev):
+        key = caller.GetKeySym()
+        s = self.scheduler
+        if key == 'space':
+            s.pause()
+        elif key == 'Left':
+            s.seek((np.ceil(s.t / self.move_time) - 1) * self.move_time)
+        elif key == 'Right':
+            s.seek((np.floor(s.t / self.move_time) + 1) * self.move_time)
+        elif key == 'Home':
+            s.seek(0.0)
+        elif key == 'End':
+            s.seek(s.duration)
+        elif key in ('plus', 'equal'):
+            s.speed *= 2.0
+        elif key == 'minus':
+            s.speed /= 2.0
+
+
+def main():
+    number_of_pucks, puck_resolution, move_time, fps, output = get_program_parameters()
+    if number_of_pucks < 2:
+        print('Please use more pucks!')
+        return
+
+    colors = vtkNamedColors()
+
+    # The geometry, as in Hanoi.
+    L = 1.0  # Puck height.
+    H = 1.1 * number_of_pucks * L  # Peg height.
+    R = 0.5  # Peg radius.
+    r_min = 4.0 * R  # The minimum allowable radius of disks.
+    r_max = 12.0 * R  # The maximum allowable radius of disks
+    D = 1.1 * 1.25 * r_max  # The distance between the pegs.
+
+    ren = vtkRenderer()
+    ren.SetBackground(colors.GetColor3d('PapayaWhip'))
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(ren)
+    ren_win.SetSize(1200, 750)
+    ren_win.SetWindowName('HanoiScheduler')
+
+    camera = vtkCamera()
+    camera.SetPosition(41.0433, 27.9637, 30.442)
+    camera.SetFocalPoint(11.5603, -1.51931, 0.95899)
+    camera.SetClippingRange(18.9599, 91.6042)
+    camera.SetViewUp(0, 1, 0)
+    ren.SetActiveCamera(camera)
+
+    peg_geometry = vtkCylinderSource()
+    peg_geometry.SetResolution(8)
+    peg_mapper = vtkPolyDataMapper()
+    peg_mapper.SetInputConnection(peg_geometry.GetOutputPort())
+
+    puck_geometry = vtkCylinderSource()
+    puck_geometry.SetResolution(puck_resolution)
+    puck_mapper = vtkPolyDataMapper()
+    puck_mapper.SetInputConnection(puck_geometry.GetOutputPort())
+
+    table_geometry = vtkPlaneSource()
+    table_geometry.SetResolution(10, 10)
+    table_mapper = vtkPolyDataMapper()
+    table_mapper.SetInputConnection(table_geometry.GetOutputPort())
+
+    table = vtkActor()
+    table.SetMapper(table_mapper)
+    table.GetProperty().SetColor(colors.GetColor3d('SaddleBrown'))
+    table.AddPosition(D, 0, 0)
+    table.SetScale(4 * D, 2 * D, 3 * D)
+    table.RotateX(90)
+    ren.AddActor(table)
+
+    for i in range(0, 3):
+        peg = vtkActor()
+        peg.SetMapper(peg_mapper)
+        peg.GetProperty().SetColor(colors.GetColor3d('Lavender'))
+        peg.AddPosition(i * D, H / 2, 0)
+        peg.SetScale(1, H, 1)
+        ren.AddActor(peg)
+
+    pucks = list()
+    random_sequence = vtkMinimalStandardRandomSequence()
+    random_sequence.SetSeed(1)
+    for i in range(0, number_of_pucks):
+        puck = vtkActor()
+        puck.SetMapper(puck_mapper)
+        color = [0, 0, 0]
+        for j in range(0, 3):
+            color[j] = random_sequence.GetValue()
+            random_sequence.Next()
+        puck.GetProperty().SetColor(*color)
+        scale = r_max - i * (r_max - r_min) / (number_of_pucks - 1)
+        puck.SetScale(scale, 1, scale)
+        ren.AddActor(puck)
+        pucks.append(puck)
+
+    status = vtkTextActor()
+    status.GetTextProperty().SetFontSize(18)
+    status.GetTextProperty().SetColor(colors.GetColor3d('Black'))
+    status.SetDisplayPosition(10, 10)
+    ren.AddViewProp(status)
+
+    timeline = HanoiTimeline(number_of_pucks, move_time, (L, H, D, r_max))
+    print(f'Number of moves: {timeline.number_of_moves}, playback time: {timeline.duration:0.1f}s')
+
+    def apply(t):
+        positions, moving, angle = timeline.state(t)
+        for i, puck in enumerate(pucks):
+            puck.SetPosition(positions[i])
+            puck.SetOrientation(angle if i == moving else 0.0, 0.0, 0.0)
+        status.SetInput(f'Move {min(int(t / move_time) + 1, timeline.number_of_moves)}'
+                        f' of {timeline.number_of_moves}')
+
+    if output:
+        status.VisibilityOff()
+        render_sequence(ren_win, apply, timeline.duration, fps, output)
+        return
+
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+    iren.Initialize()
+
+    scheduler = AnimationScheduler(iren, timeline.duration, apply, fps)
+    iren.AddObserver('KeyPressEvent', KeyPressCallback(scheduler, move_time))
+    scheduler.seek(0.0)
+    scheduler.start()
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,24 @@
 #!/usr/bin/env python
 
-from math import pi, cos, sin, sqrt
-
+import numpy as np
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkInteractionStyle
 # noinspection PyUnresolvedReferences
 import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    get_vtk_to_numpy_typemap,
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray
+)
 from vtkmodules.vtkCommonColor import vtkNamedColors
 from vtkmodules.vtkCommonCore import (
-    vtkIntArray,
+    VTK_ID_TYPE,
     vtkLookupTable,
     vtkPoints
 )
 from vtkmodules.vtkCommonDataModel import (
     vtkCellArray,
-    vtkPolyData,
-    vtkPolyLine,
-    vtkTriangle
+    vtkPolyData
 )
 from vtkmodules.vtkRenderingCore import (
     vtkActor,
@@ -28,116 +30,131 @@ from vtkmodules.vtkRenderingCore import (
 
 LEVEL = 6
 
+# The NumPy type matching vtkIdType.
+ID_TYPE = get_vtk_to_numpy_typemap()[VTK_ID_TYPE]
+
+# The Koch curve as an edge rewriting L-system: F -> F+F--F+F.
+# Each edge is replaced by the points of the generator, given as (u, v) where
+# u is the distance along the edge and v the distance along the edge normal,
+# both as fractions of the edge length. The negative v makes the new points
+# face outward for a curve traversed counterclockwise.
+KOCH_GENERATOR = np.array([[1.0 / 3.0, 0.0],
+                           [0.5, -np.sqrt(3.0) / 6.0],
+                           [2.0 / 3.0, 0.0],
+                           [1.0, 0.0]])
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Koch snowflake.'
+    epilogue = '''
+    Each level of the snowflake is computed with NumPy operations on all the edges at once.
+    '''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('level', default=LEVEL, type=int, nargs='?', help='The level of the snowflake.')
+    args = parser.parse_args()
+    return args.level
+
+
+def rewrite_edges(points, generator, level):
+    '''
+    Apply an edge rewriting L-system to a polyline.
+
+    Every edge of the polyline is replaced by the generator. The new points of
+    a level are computed for all the edges at once. Any curve of this type,
+    e.g. the quadratic Koch or Cesaro curves, can be made by changing the generator.
+
+    :param points: The (N, 2) points of the initial polyline.
+    :param generator: The (M, 2) generator, the last point must be (1, 0).
+    :param level: The number of times to rewrite the edges.
+    :return: The (1 + (N - 1) * M**level, 2) points of the curve.
+    '''
+    u = generator[:, 0][np.newaxis, :, np.newaxis]
+    v = generator[:, 1][np.newaxis, :, np.newaxis]
+    for i in range(level):
+        p0 = points[:-1]
+        d = points[1:] - p0
+        # The edge normals, the edge direction rotated by 90 degrees.
+        n = np.column_stack([-d[:, 1], d[:, 0]])
+        new_points = p0[:, np.newaxis, :] + u * d[:, np.newaxis, :] + v * n[:, np.newaxis, :]
+        points = np.concatenate([points[:1], new_points.reshape(-1, 2)])
+    return points
+
 
 def as_polyline(points, level):
     '''
     Koch Snowflake as a vtkPolyLine
     '''
-    # Use the points from the previous iteration to create the points of the next
-    # level. There is an assumption on my part that the curve is traversed in a
-    # counterclockwise fashion. If the initial triangle above is written to
-    # describe clockwise motion, the points will face inward instead of outward.
-    for i in range(level):
-        temp = vtkPoints()
-        # The first point of the previous vtkPoints is the first point of the next vtkPoints.
-        temp.InsertNextPoint(*points.GetPoint(0))
-
-        # Iterate over 'edges' in the vtkPoints
-        for i in range(1, points.GetNumberOfPoints()):
-            x0, y0, z0 = points.GetPoint(i - 1)
-            x1, y1, z1 = points.GetPoint(i)
-            t = sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
-            nx = (x1 - x0) / t  # x-component of edge unit tangent
-            ny = (y1 - y0) / t  # y-component of edge unit tangent
-
-            # the points describing the Koch snowflake edge
-            temp.InsertNextPoint(x0 + nx * t / 3, y0 + ny * t / 3, 0.)
-            temp.InsertNextPoint(x0 + nx * t / 2 + ny * t * sqrt(3) / 6, y0 + ny * t / 2 - nx * t * sqrt(3) / 6, 0.)
-            temp.InsertNextPoint(x0 + nx * 2 * t / 3, y0 + ny * 2 * t / 3, 0.)
-            temp.InsertNextPoint(x0 + nx * t, y0 + ny * t, 0.)
-
-        points = temp
-
-    # draw the outline
+    xy = rewrite_edges(points, KOCH_GENERATOR, level)
+    xyz = np.column_stack([xy, np.zeros(len(xy))])
+
+    vtk_points = vtkPoints()
+    vtk_points.SetData(numpy_to_vtk(xyz.astype(np.float32)))
+
+    # draw the outline, a single polyline through all the points.
     lines = vtkCellArray()
-    pl = vtkPolyLine()
-    pl.GetPointIds().SetNumberOfIds(points.GetNumberOfPoints())
-    for i in range(points.GetNumberOfPoints()):
-        pl.GetPointIds().SetId(i, i)
-    lines.InsertNextCell(pl)
+    lines.SetData(numpy_to_vtkIdTypeArray(np.array([0, len(xy)], dtype=ID_TYPE)),
+                  numpy_to_vtkIdTypeArray(np.arange(len(xy), dtype=ID_TYPE)))
 
     # complete the polydata
     polydata = vtkPolyData()
     polydata.SetLines(lines)
-    polydata.SetPoints(points)
+    polydata.SetPoints(vtk_points)
 
     return polydata
 
 
-def as_triangles(indices, cellarray, level, data):
+def as_triangles(level):
     '''
-    Koch Snowflake as a collection of vtkTriangles
-    '''
-    if len(indices) >= 3:
-        stride = len(indices) // 4
-        indices.append(indices[-1] + 1)
+    Koch Snowflake as a collection of triangles.
 
-        triangle = vtkTriangle()
-        triangle.GetPointIds().SetId(0, indices[stride])
-        triangle.GetPointIds().SetId(1, indices[2 * stride])
-        triangle.GetPointIds().SetId(2, indices[3 * stride])
+    The points of each side of the snowflake are numbered consecutively, so the
+    triangles can be written down directly. At iteration level l each side is split
+    into segments of s = 4**(level - l + 1) edges and the triangle added to the
+    segment starting at point a is (a + s/4, a + s/2, a + 3s/4).
 
-        cellarray.InsertNextCell(triangle)
-        data.InsertNextValue(level)
+    :param level: The level of the snowflake.
+    :return: The triangles as a vtkCellArray and the iteration level of each triangle.
+    '''
+    side = 4 ** level
+    # This is the starting triangle.
+    triangles = [np.array([[0, side, 2 * side]], dtype=ID_TYPE)]
+    levels = [np.zeros(1, dtype=np.int32)]
+    for i in range(1, level + 1):
+        s = side // 4 ** (i - 1)
+        a = np.arange(0, 3 * side, s, dtype=ID_TYPE)[:, np.newaxis]
+        triangles.append(a + np.array([s // 4, s // 2, 3 * s // 4], dtype=ID_TYPE))
+        levels.append(np.full(len(a), i, dtype=np.int32))
+    triangles = np.concatenate(triangles)
+
+    cells = vtkCellArray()
+    cells.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 3 * len(triangles) + 1, 3, dtype=ID_TYPE)),
+                  numpy_to_vtkIdTypeArray(triangles.ravel()))
 
-        as_triangles(indices[0: stride], cellarray, level + 1, data)
-        as_triangles(indices[stride: 2 * stride], cellarray, level + 1, data)
-        as_triangles(indices[2 * stride: 3 * stride], cellarray, level + 1, data)
-        as_triangles(indices[3 * stride: -1], cellarray, level + 1, data)
+    # The cell data will allow us to color the triangles based on the level of
+    # the iteration of the Koch snowflake.
+    data = numpy_to_vtk(np.concatenate(levels))
+    data.SetName('Iteration Level')
+    return cells, data
 
 
 def main():
     colors = vtkNamedColors()
 
+    level = get_program_parameters()
+
     # Initially, set up the points to be an equilateral triangle. Note that the
     # first point is the same as the last point to make this a closed curve when
     # I create the vtkPolyLine.
-    points = vtkPoints()
-    for i in range(4):
-        points.InsertNextPoint(cos(2.0 * pi * i / 3), sin(2 * pi * i / 3.0), 0.0)
+    angles = 2.0 * np.pi * np.arange(4) / 3.0
+    points = np.column_stack([np.cos(angles), np.sin(angles)])
 
-    outline_pd = as_polyline(points, LEVEL)
+    outline_pd = as_polyline(points, level)
     # You have already gone through the trouble of putting the points in the
     # right places - so 'all' you need to do now is to create polygons from the
     # points that are in the vtkPoints.
-
-    # The points that are passed in, have an overlap of the beginning and the
-    # end. For this next trick, I will need a list of the indices in the
-    # vtkPoints. They're consecutive, so thats pretty straightforward.
-
-    indices = [i for i in range(outline_pd.GetPoints().GetNumberOfPoints() + 1)]
-    triangles = vtkCellArray()
-
-    # Set this up for each of the initial sides, then call the recursive function.
-    stride = (len(indices) - 1) // 3
-
-    # The cell data will allow us to color the triangles based on the level of
-    # the iteration of the Koch snowflake.
-    data = vtkIntArray()
-    data.SetNumberOfComponents(0)
-    data.SetName('Iteration Level')
-
-    # This is the starting triangle.
-    t = vtkTriangle()
-    t.GetPointIds().SetId(0, 0)
-    t.GetPointIds().SetId(1, stride)
-    t.GetPointIds().SetId(2, 2 * stride)
-    triangles.InsertNextCell(t)
-    data.InsertNextValue(0)
-
-    as_triangles(indices[0: stride + 1], triangles, 1, data)
-    as_triangles(indices[stride: 2 * stride + 1], triangles, 1, data)
-    as_triangles(indices[2 * stride: -1], triangles, 1, data)
+    triangles, data = as_triangles(level)
 
     triangle_pd = vtkPolyData()
     triangle_pd.SetPoints(outline_pd.GetPoints())
@@ -158,7 +175,7 @@ def main():
 
     triangle_mapper = vtkPolyDataMapper()
     triangle_mapper.SetInputData(triangle_pd)
-    triangle_mapper.SetScalarRange(0.0, LEVEL)
+    triangle_mapper.SetScalarRange(0.0, level)
     triangle_mapper.SetLookupTable(lut)
 
     outline_actor = vtkActor()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkPlane,
+    vtkStructuredGrid
+)
+from vtkmodules.vtkCommonExecutionModel import vtkTrivialProducer
+from vtkmodules.vtkFiltersCore import (
+    vtkContourFilter,
+    vtkCutter,
+    vtkPolyDataNormals,
+    vtkStructuredGridOutlineFilter
+)
+from vtkmodules.vtkFiltersGeneral import vtkGradientFilter
+from vtkmodules.vtkIOParallel import vtkMultiBlockPLOT3DReader
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Read the PLOT3D combustor data once and share it between several views.'
+    epilogue = '''
+The grid and solution are read once, saved as NumPy arrays in a cache directory
+ and memory mapped on later runs. Derived quantities are computed on demand
+ and cached, every view shares the same vtkStructuredGrid.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename1', help='combxyz.bin.')
+    parser.add_argument('filename2', help='combq.bin.')
+    parser.add_argument('-c', '--cache_dir', default=None,
+                        help='The cache directory, the default is ~/.cache/vtk-examples.')
+    args = parser.parse_args()
+    return args.filename1, args.filename2, args.cache_dir
+
+
+class CombustorData:
+    """
+    A shared, read-once PLOT3D dataset.
+
+    The primary PLOT3D variables, density, momentum and stagnation energy are
+     stored as NumPy arrays and wrapped (without copying) as the arrays of a
+     single vtkStructuredGrid. Derived quantities are computed the first time
+     they are requested and then kept on the grid.
+    """
+
+    # The ratio of specific heats used by vtkMultiBlockPLOT3DReader.
+    gamma = 1.4
+
+    def __init__(self, xyz_file, q_file, cache_dir=None):
+        self.xyz_file = Path(xyz_file)
+        self.q_file = Path(q_file)
+        if cache_dir is None:
+            cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+        self.cache_dir = Path(cache_dir, 'plot3d', self.key())
+        self.arrays = dict()
+        self.grid = vtkStructuredGrid()
+        self.producer = vtkTrivialProducer()
+        self.producer.SetOutput(self.grid)
+        self.derived = {
+            'Velocity': self.compute_velocity,
+            'VelocityMagnitude': self.compute_velocity_magnitude,
+            'Pressure': self.compute_pressure,
+            'Vorticity': self.compute_vorticity,
+            'VorticityMagnitude': self.compute_vorticity_magnitude,
+        }
+        self.load()
+
+    def key(self):
+        """
+        The key identifying the pair of files.
+
+        Hashing the names, sizes and modification times is enough to detect
+         a changed input without reading the (large) files.
+        """
+        h = hashlib.sha256()
+        for p in (self.xyz_file, self.q_file):
+            st = p.stat()
+            h.update(f'{p.resolve()}:{st.st_size}:{st.st_mtime_ns}'.encode())
+        return h.hexdigest()[:16]
+
+    def load(self):
+        names = ('Points', 'Dimensions', 'Density', 'Momentum', 'StagnationEnergy')
+        files = {name: self.cache_dir / f'{name}.npy' for name in names}
+        if not all(f.is_file() for f in files.values()):
+            self.read_plot3d(files)
+        # Copy-on-write mappings give writable buffers, as VTK requires,
+        #  without reading the data into memory or modifying the files.
+        arrays = {name: np.load(f, mmap_mode='c') for name, f in files.items()}
+
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(arrays['Points']))
+        self.grid.SetDimensions(*(int(d) for d in arrays['Dimensions']))
+        self.grid.SetPoints(points)
+        for name in ('Density', 'Momentum', 'StagnationEnergy'):
+            self.add_array(name, arrays[name])
+        self.grid.GetPointData().SetActiveScalars('Density')
+
+    def read_plot3d(self, files):
+        reader = vtkMultiBlockPLOT3DReader()
+        reader.SetXYZFileName(str(self.xyz_file))
+        reader.SetQFileName(str(self.q_file))
+        reader.Update()
+        block = reader.GetOutput().GetBlock(0)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.save(files['Points'], vtk_to_numpy(block.GetPoints().GetData()))
+        self.save(files['Dimensions'], np.array(block.GetExtent()[1::2]) + 1)
+        pd = block.GetPointData()
+        for name in ('Density', 'Momentum', 'StagnationEnergy'):
+            self.save(files[name], vtk_to_numpy(pd.GetArray(name)))
+
+    @staticmethod
+    def save(file_name, values):
+        # Write under a temporary name so that a partly written file is never read.
+        tmp = file_name.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp, file_name)
+
+    def add_array(self, name, values):
+        vtk_array = numpy_to_vtk(values)
+        vtk_array.SetName(name)
+        self.grid.GetPointData().AddArray(vtk_array)
+        self.arrays[name] = values
+
+    def get(self, name):
+        """
+        Get a point data array as a NumPy array, computing it if necessary.
+
+        :param name: The name of a primary or derived quantity.
+        :return: The NumPy array.
+        """
+        if name not in self.arrays:
+            if name not in self.derived:
+                raise KeyError(f'Unknown quantity: {name}, it must be one of: {", ".join(self.quantities())}')
+            self.add_array(name, self.derived[name]())
+            self.grid.Modified()
+        return self.arrays[name]
+
+    def quantities(self):
+        return ['Density', 'Momentum', 'StagnationEnergy'] + list(self.derived.keys())
+
+    def output_port(self, *names):
+        """
+        The output port of the shared grid after making sure the quantities exist.
+
+        :param names: The quantities needed by the pipeline.
+        :return: The output port.
+        """
+        for name in names:
+            self.get(name)
+        return self.producer.GetOutputPort()
+
+    def compute_velocity(self):
+        return self.get('Momentum') / self.get('Density')[:, np.newaxis]
+
+    def compute_velocity_magnitude(self):
+        return np.linalg.norm(self.get('Velocity'), axis=1)
+
+    def compute_pressure(self):
+        rho = self.get('Density')
+        kinetic = 0.5 * rho * np.einsum('ij,ij->i', self.get('Velocity'), self.get('Velocity'))
+        return (self.gamma - 1.0) * (self.get('StagnationEnergy') - kinetic)
+
+    def compute_vorticity(self):
+        # The grid is curvilinear so let VTK compute the derivatives.
+        self.get('Velocity')
+        gradient = vtkGradientFilter()
+        gradient.SetInputData(self.grid)
+        gradient.SetInputArrayToProcess(0, 0, 0, 0, 'Velocity')
+        gradient.ComputeGradientOff()
+        gradient.ComputeVorticityOn()
+        gradient.Update()
+        return vtk_to_numpy(gradient.GetOutput().GetPointData().GetArray('Vorticity')).copy()
+
+    def compute_vorticity_magnitude(self):
+        return np.linalg.norm(self.get('Vorticity'), axis=1)
+
+
+def main():
+    xyz_file, q_file, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    start = time.perf_counter()
+    data = CombustorData(xyz_file, q_file, cache_dir)
+    print(f'Loaded the combustor data in {time.perf_counter() - start:0.3f}s from {data.cache_dir}')
+
+    # All the views use the same grid.
+    views = list()
+
+    # The density isosurface, as in CombustorIsosurface.
+    iso = vtkContourFilter()
+    iso.SetInputConnection(data.output_port('Density'))
+    iso.SetInputArrayToProcess(0, 0, 0, 0, 'Density')
+    iso.SetValue(0, 0.38)
+    normals = vtkPolyDataNormals()
+    normals.SetInputConnection(iso.GetOutputPort())
+    normals.SetFeatureAngle(45)
+    iso_mapper = vtkPolyDataMapper()
+    iso_mapper.SetInputConnection(normals.GetOutputPort())
+    iso_mapper.ScalarVisibilityOff()
+    iso_actor = vtkActor()
+    iso_actor.SetMapper(iso_mapper)
+    iso_actor.GetProperty().SetColor(colors.GetColor3d('WhiteSmoke'))
+    views.append(('Density', iso_actor))
+
+    # A cut through the combustor colored by the velocity magnitude.
+    plane = vtkPlane()
+    plane.SetOrigin(data.grid.GetCenter())
+    plane.SetNormal(0, 1, 0)
+    cutter = vtkCutter()
+    cutter.SetInputConnection(data.output_port('VelocityMagnitude'))
+    cutter.SetCutFunction(plane)
+    cut_mapper = vtkPolyDataMapper()
+    cut_mapper.SetInputConnection(cutter.GetOutputPort())
+    cut_mapper.SetScalarModeToUsePointFieldData()
+    cut_mapper.SelectColorArray('VelocityMagnitude')
+    cut_mapper.SetScalarRange(data.get('VelocityMagnitude').min(), data.get('VelocityMagnitude').max())
+    cut_actor = vtkActor()
+    cut_actor.SetMapper(cut_mapper)
+    views.append(('VelocityMagnitude', cut_actor))
+
+    # An isosurface of the vorticity magnitude colored by the pressure.
+    vorticity = data.get('VorticityMagnitude')
+    vort_iso = vtkContourFilter()
+    vort_iso.SetInputConnection(data.output_port('VorticityMagnitude', 'Pressure'))
+    vort_iso.SetInputArrayToProcess(0, 0, 0, 0, 'VorticityMagnitude')
+    vort_iso.SetValue(0, float(np.percentile(vorticity, 90)))
+    vort_mapper = vtkPolyDataMapper()
+    vort_mapper.SetInputConnection(vort_iso.GetOutputPort())
+    vort_mapper.SetScalarModeToUsePointFieldData()
+    vort_mapper.SelectColorArray('Pressure')
+    vort_mapper.SetScalarRange(data.get('Pressure').min(), data.get('Pressure').max())
+    vort_actor = vtkActor()
+    vort_actor.SetMapper(vort_mapper)
+    views.append(('Vorticity', vort_actor))
+
+    outline = vtkStructuredGridOutlineFilter()
+    outline.SetInputConnection(data.output_port())
+    outline_mapper = vtkPolyDataMapper()
+    outline_mapper.SetInputConnection(outline.GetOutputPort())
+
+    ren_win = vtkRenderWindow()
+    ren_win.SetSize(1200, 400)
+    ren_win.SetWindowName('CombustorDashboard')
+
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    camera = None
+    for i, (name, actor) in enumerate(views):
+        outline_actor = vtkActor()
+        outline_actor.SetMapper(outline_mapper)
+        outline_actor.GetProperty().SetColor(colors.GetColor3d('Black'))
+
+        ren = vtkRenderer()
+        ren.SetViewport(i / len(views), 0, (i + 1) / len(views), 1)
+        ren.SetBackground(colors.GetColor3d('DarkSlateGray'))
+        ren.AddActor(outline_actor)
+        ren.AddActor(actor)
+        ren_win.AddRenderer(ren)
+        if camera is None:
+            camera = ren.GetActiveCamera()
+            camera.SetFocalPoint(9.71821, 0.458166, 29.3999)
+            camera.SetPosition(2.7439, -37.3196, 38.7167)
+            camera.SetViewUp(-0.16123, 0.264271, 0.950876)
+            ren.ResetCamera()
+        else:
+            ren.SetActiveCamera(camera)
+
+    ren_win.Render()
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
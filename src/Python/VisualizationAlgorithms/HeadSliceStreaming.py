@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkFiltersCore import vtkContourFilter
+from vtkmodules.vtkFiltersSources import vtkOutlineSource
+from vtkmodules.vtkIOImage import (
+    vtkImageReader2,
+    vtkMetaImageReader
+)
+from vtkmodules.vtkImagingCore import vtkExtractVOI
+from vtkmodules.vtkInteractionWidgets import (
+    vtkSliderRepresentation2D,
+    vtkSliderWidget
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Contour slices of a volume, reading only the slabs that are needed.'
+    epilogue = '''
+The MetaImage header is read, then slabs of slices are read on demand by requesting
+ their extent from a vtkImageReader2 on the raw data. A few slabs are kept in a
+ least recently used cache and the neighbours of the current slab are read ahead.
+
+Scrub through the slices with the slider, or the Up and Down keys.
+
+A compressed volume, such as FullHead.raw.gz, is decompressed once into the cache directory.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename', help='FullHead.mhd.')
+    parser.add_argument('-d', '--depth', type=int, default=8, help='The number of slices in a slab.')
+    parser.add_argument('-n', '--slabs', type=int, default=6, help='The number of slabs kept in memory.')
+    parser.add_argument('-c', '--cache_dir', default=None,
+                        help='The cache directory, the default is $VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples.')
+    args = parser.parse_args()
+    return args.filename, args.depth, args.slabs, args.cache_dir
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory for the decompressed volumes, creating it if necessary.
+
+    :param cache_dir: An explicit cache directory, if None the environment
+                      variable VTK_EXAMPLES_CACHE or ~/.cache/vtk-examples is used.
+    :return: The directory as a pathlib Path.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('VTK_EXAMPLES_CACHE', Path.home() / '.cache' / 'vtk-examples')
+    path = Path(cache_dir) / 'volumes'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def read_meta_header(file_name):
+    """
+    The fields of a MetaImage header, and the size in bytes of the header.
+
+    :param file_name: The .mhd or .mha file.
+    :return: A dictionary of the fields and the header size.
+    """
+    fields = dict()
+    header_size = 0
+    with open(file_name, 'rb') as f:
+        for line in f:
+            header_size += len(line)
+            key, _, value = line.decode('latin-1').partition('=')
+            fields[key.strip()] = value.strip()
+            # The data follows this field.
+            if key.strip() == 'ElementDataFile':
+                break
+    return fields, header_size
+
+
+def decompress(source, destination, offset=0, block_size=1 << 20):
+    """
+    Decompress a zlib or gzip stream, starting offset bytes into the source, into a file a block at a time.
+    """
+    tmp = destination.with_name(destination.name + '.tmp')
+    # 32 + 15: detect a zlib or a gzip header.
+    decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    with open(source, 'rb') as fin, open(tmp, 'wb') as fout:
+        fin.seek(offset)
+        for block in iter(lambda: fin.read(block_size), b''):
+            fout.write(decompressor.decompress(block))
+        fout.write(decompressor.flush())
+    os.replace(tmp, destination)
+
+
+class SlabReader:
+    """
+    Read slabs of slices of a MetaImage volume.
+
+    vtkMetaImageReader always reads the whole volume, so it is only used for the
+     header. The data are read with a vtkImageReader2 which, given an update
+     extent, reads just those slices. Each read uses its own reader, so reads
+     can run on several threads and the slabs returned are never overwritten.
+    """
+
+    def __init__(self, file_name, cache_dir=None):
+        meta_reader = vtkMetaImageReader()
+        meta_reader.SetFileName(str(file_name))
+        meta_reader.UpdateInformation()
+        self.extent = meta_reader.GetDataExtent()
+        self.spacing = meta_reader.GetDataSpacing()
+        self.origin = meta_reader.GetDataOrigin()
+        self.scalar_type = meta_reader.GetDataScalarType()
+        self.components = meta_reader.GetNumberOfScalarComponents()
+
+        fields, header_size = read_meta_header(file_name)
+        data_file = fields.get('ElementDataFile', 'LOCAL')
+        self.big_endian = fields.get('BinaryDataByteOrderMSB', fields.get('ElementByteOrderMSB', 'False')) == 'True'
+        if data_file == 'LOCAL':
+            self.data_file = Path(file_name)
+            self.header_size = header_size
+        elif data_file.startswith('LIST') or '%' in data_file:
+            raise ValueError('Volumes stored as one file per slice are not handled.')
+        else:
+            self.data_file = Path(file_name).parent / data_file
+            self.header_size = 0
+        if fields.get('CompressedData', 'False') == 'True':
+            self.data_file = self.decompressed(cache_dir)
+            self.header_size = 0
+
+    def decompressed(self, cache_dir):
+        """
+        The decompressed data, in the cache directory, decompressing it if needed.
+        """
+        stat = self.data_file.stat()
+        key = hashlib.sha256(f'{self.data_file.resolve()}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()
+        path = get_cache_dir(cache_dir) / f'{key}.raw'
+        if not path.exists():
+            start = time.perf_counter()
+            decompress(self.data_file, path, self.header_size)
+            print(f'Decompressed {self.data_file.name} in {time.perf_counter() - start:0.2f}s')
+        return path
+
+    def read(self, z_min, z_max):
+        """
+        Read the slices z_min to z_max.
+
+        :return: A vtkImageData of the slab.
+        """
+        reader = vtkImageReader2()
+        reader.SetFileName(str(self.data_file))
+        reader.SetFileDimensionality(3)
+        # MetaImage rows are stored bottom up, as VTK expects.
+        reader.FileLowerLeftOn()
+        reader.SetHeaderSize(self.header_size)
+        reader.SetDataExtent(self.extent)
+        reader.SetDataSpacing(self.spacing)
+        reader.SetDataOrigin(self.origin)
+        reader.SetDataScalarType(self.scalar_type)
+        reader.SetNumberOfScalarComponents(self.components)
+        if self.big_endian:
+            reader.SetDataByteOrderToBigEndian()
+        else:
+            reader.SetDataByteOrderToLittleEndian()
+        reader.UpdateInformation()
+        x_min, x_max, y_min, y_max = self.extent[:4]
+        reader.UpdateExtent((x_min, x_max, y_min, y_max, z_min, z_max))
+        return reader.GetOutput()
+
+
+class SlabCache:
+    """
+    A least recently used cache of slabs, reading the neighbours of a slab ahead.
+    """
+
+    def __init__(self, slab_reader, depth=8, capacity=6):
+        """
+        :param slab_reader: The SlabReader.
+        :param depth: The number of slices in a slab.
+        :param capacity: The number of slabs kept, at least three for the read ahead to help.
+        """
+        self.slab_reader = slab_reader
+        self.depth = depth
+        self.capacity = max(3, capacity)
+        self.z_min, self.z_max = slab_reader.extent[4:6]
+        self.slabs = OrderedDict()
+        self.pending = dict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(1)
+        self.reads = 0
+
+    def number_of_slabs(self):
+        return (self.z_max - self.z_min) // self.depth + 1
+
+    def read(self, index):
+        z_min = self.z_min + index * self.depth
+        slab = self.slab_reader.read(z_min, min(z_min + self.depth - 1, self.z_max))
+        with self.lock:
+            self.reads += 1
+            self.slabs[index] = slab
+            self.pending.pop(index, None)
+            while len(self.slabs) > self.capacity:
+                self.slabs.popitem(last=False)
+        return slab
+
+    def get(self, index):
+        """
+        The slab, from the cache, the read ahead or read now.
+        """
+        with self.lock:
+            slab = self.slabs.get(index)
+            if slab is not None:
+                self.slabs.move_to_end(index)
+                return slab
+            future = self.pending.get(index)
+        if future is not None:
+            return future.result()
+        return self.read(index)
+
+    def prefetch(self, index):
+        with self.lock:
+            if index in self.slabs or index in self.pending or not 0 <= index < self.number_of_slabs():
+                return
+            self.pending[index] = self.executor.submit(self.read, index)
+
+    def slab_of(self, z):
+        """
+        The slab holding slice z, reading ahead the slabs either side of it.
+        """
+        index = (z - self.z_min) // self.depth
+        slab = self.get(index)
+        self.prefetch(index + 1)
+        self.prefetch(index - 1)
+        return slab
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class SliceScrubber:
+    """
+    Contour the slice selected by a slider, or the Up and Down keys.
+    """
+
+    def __init__(self, cache, extract, render_window, slider=None):
+        self.cache = cache
+        self.extract = extract
+        self.render_window = render_window
+        self.slider = slider
+        self.z = None
+
+    def set_slice(self, z):
+        z = int(min(max(z, self.cache.z_min), self.cache.z_max))
+        if z == self.z:
+            return
+        self.z = z
+        start = time.perf_counter()
+        slab = self.cache.slab_of(z)
+        x_min, x_max, y_min, y_max = self.cache.slab_reader.extent[:4]
+        self.extract.SetInputData(slab)
+        self.extract.SetVOI(x_min, x_max, y_min, y_max, z, z)
+        self.render_window.Render()
+        self.render_window.SetWindowName(f'HeadSliceStreaming slice {z}, {(time.perf_counter() - start) * 1000:0.1f}ms,'
+                                         f' {self.cache.reads} slabs read')
+        if self.slider is not None:
+            self.slider.GetRepresentation().SetValue(z)
+
+    def slider_moved(self, caller, ev):
+        self.set_slice(round(caller.GetRepresentation().GetValue()))
+
+    def key_press(self, caller, ev):
+        key = caller.GetKeySym()
+        if key == 'Up':
+            self.set_slice(self.z + 1)
+        elif key == 'Down':
+            self.set_slice(self.z - 1)
+
+
+def make_slider(interactor, z_min, z_max, z):
+    colors = vtkNamedColors()
+    slider = vtkSliderRepresentation2D()
+    slider.SetMinimumValue(z_min)
+    slider.SetMaximumValue(z_max)
+    slider.SetValue(z)
+    slider.SetTitleText('Slice')
+    slider.SetLabelFormat('%0.0f')
+    slider.GetPoint1Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint1Coordinate().SetValue(0.1, 0.1)
+    slider.GetPoint2Coordinate().SetCoordinateSystemToNormalizedDisplay()
+    slider.GetPoint2Coordinate().SetValue(0.9, 0.1)
+    slider.GetTubeProperty().SetColor(colors.GetColor3d('LightSlateGray'))
+    slider.GetSliderProperty().SetColor(colors.GetColor3d('Wheat'))
+    slider.GetTitleProperty().SetColor(colors.GetColor3d('AliceBlue'))
+    slider.GetLabelProperty().SetColor(colors.GetColor3d('AliceBlue'))
+
+    widget = vtkSliderWidget()
+    widget.SetInteractor(interactor)
+    widget.SetRepresentation(slider)
+    widget.SetAnimationModeToJump()
+    widget.EnabledOn()
+    return widget
+
+
+def main():
+    file_name, depth, number_of_slabs, cache_dir = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    slab_reader = SlabReader(file_name, cache_dir)
+    cache = SlabCache(slab_reader, depth, number_of_slabs)
+    print(f'Volume extent {slab_reader.extent}, {cache.number_of_slabs()} slabs of {depth} slices')
+
+    renderer = vtkRenderer()
+    render_window = vtkRenderWindow()
+    render_window.AddRenderer(renderer)
+    interactor = vtkRenderWindowInteractor()
+    interactor.SetRenderWindow(render_window)
+
+    # The pipeline of HeadSlice, its input is set to the slab holding the slice.
+    extract = vtkExtractVOI()
+
+    iso = vtkContourFilter()
+    iso.SetInputConnection(extract.GetOutputPort())
+    iso.GenerateValues(12, 500, 1150)
+
+    iso_mapper = vtkPolyDataMapper()
+    iso_mapper.SetInputConnection(iso.GetOutputPort())
+    iso_mapper.ScalarVisibilityOff()
+
+    iso_actor = vtkActor()
+    iso_actor.SetMapper(iso_mapper)
+    iso_actor.GetProperty().SetColor(colors.GetColor3d('Wheat'))
+
+    # The outline of the whole volume, from the header alone.
+    x_min, x_max, y_min, y_max, z_min, z_max = slab_reader.extent
+    ox, oy, oz = slab_reader.origin
+    sx, sy, sz = slab_reader.spacing
+    outline = vtkOutlineSource()
+    outline.SetBounds(ox + x_min * sx, ox + x_max * sx, oy + y_min * sy, oy + y_max * sy,
+                      oz + z_min * sz, oz + z_max * sz)
+
+    outline_mapper = vtkPolyDataMapper()
+    outline_mapper.SetInputConnection(outline.GetOutputPort())
+
+    outline_actor = vtkActor()
+    outline_actor.SetMapper(outline_mapper)
+
+    renderer.AddActor(outline_actor)
+    renderer.AddActor(iso_actor)
+    renderer.SetBackground(colors.GetColor3d('SlateGray'))
+
+    render_window.SetSize(640, 640)
+    render_window.SetWindowName('HeadSliceStreaming')
+
+    z = min(max(45, z_min), z_max)
+    slider = make_slider(interactor, z_min, z_max, z)
+    scrubber = SliceScrubber(cache, extract, render_window, slider)
+    slider.AddObserver('InteractionEvent', scrubber.slider_moved)
+    interactor.AddObserver('KeyPressEvent', scrubber.key_press)
+    scrubber.set_slice(z)
+
+    renderer.ResetCamera()
+    renderer.GetActiveCamera().Dolly(1.5)
+    renderer.ResetCameraClippingRange()
+
+    render_window.Render()
+    interactor.Start()
+    cache.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.util.numpy_support import (
+    numpy_to_vtk,
+    numpy_to_vtkIdTypeArray,
+    vtk_to_numpy
+)
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import (
+    vtkCellArray,
+    vtkPolyData,
+    vtkStaticCellLocator
+)
+from vtkmodules.vtkCommonMath import vtkRungeKutta4
+from vtkmodules.vtkFiltersCore import vtkStructuredGridOutlineFilter
+from vtkmodules.vtkFiltersFlowPaths import vtkStreamTracer
+from vtkmodules.vtkFiltersModeling import vtkRibbonFilter
+from vtkmodules.vtkIOParallel import vtkMultiBlockPLOT3DReader
+from vtkmodules.vtkInteractionWidgets import vtkLineWidget
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+# The find cell strategies were added in VTK 9.2.
+try:
+    from vtkmodules.vtkCommonDataModel import vtkCellLocatorStrategy
+    from vtkmodules.vtkFiltersFlowPaths import vtkCompositeInterpolatedVelocityField
+except ImportError:
+    vtkCellLocatorStrategy = None
+    vtkCompositeInterpolatedVelocityField = None
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Interactive streamlines that reuse the cell locator and previously traced lines.'
+    epilogue = '''
+Drag the line widget to move the seeds, only seeds that have not been traced
+ before are integrated. Press 'i' to toggle the line widget.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('filename1', help='combxyz.bin.')
+    parser.add_argument('filename2', help='combq.bin.')
+    parser.add_argument('-n', '--number_of_seeds', default=25, type=int, help='The number of seeds.')
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help='The number of threads used to trace the seeds.')
+    parser.add_argument('-c', '--cache_size', default=10000, type=int,
+                        help='The maximum number of streamlines to cache.')
+    args = parser.parse_args()
+    return args.filename1, args.filename2, args.number_of_seeds, args.jobs, args.cache_size
+
+
+class StreamlineEngine:
+    """
+    Trace streamlines, reusing the cell locator and the lines from seeds already traced.
+
+    Each thread gets a tracer with a vtkStaticCellLocator of the vector field,
+     both are built once and then used by every trace. Traced lines are cached per seed point, so when
+     the seeds change only the new seeds are integrated.
+    """
+
+    def __init__(self, data_set, cache_size=10000, jobs=1, decimals=6):
+        """
+        :param data_set: The dataset with the active vectors to trace.
+        :param cache_size: The maximum number of streamlines kept in the cache.
+        :param jobs: The number of threads to use, each thread traces a chunk of the seeds.
+        :param decimals: The seed coordinates are rounded to this many decimals to form the cache key.
+        """
+        self.data_set = data_set
+        self.cache_size = cache_size
+        self.jobs = max(1, jobs)
+        self.decimals = decimals
+        self.cache = OrderedDict()
+        self.array_names = None
+        self.traced = 0
+        self.reused = 0
+
+        start = time.perf_counter()
+        # Each thread traces with its own tracer, built once and kept. A worker
+        #  shares no VTK object with another, queries on a shared locator through
+        #  the find cell strategies are not thread safe.
+        self.tracers = [self.new_tracer() for _ in range(self.jobs)]
+        print(f'Built the cell locator of {self.jobs} tracer(s) in {time.perf_counter() - start:0.3f}s')
+
+    def new_tracer(self):
+        """
+        A stream tracer with its own shallow copy of the field and its own cell locator.
+        """
+        data_set = self.data_set.NewInstance()
+        data_set.ShallowCopy(self.data_set)
+        locator = vtkStaticCellLocator()
+        locator.SetDataSet(data_set)
+        locator.BuildLocator()
+        if hasattr(data_set, 'SetCellLocator'):
+            # vtkPointSet uses this locator instead of building its own.
+            data_set.SetCellLocator(locator)
+        tracer = vtkStreamTracer()
+        tracer.SetInputData(data_set)
+        tracer.SetMaximumPropagation(100)
+        tracer.SetInitialIntegrationStep(0.2)
+        tracer.SetIntegrationDirectionToForward()
+        tracer.SetComputeVorticity(True)
+        tracer.SetIntegrator(vtkRungeKutta4())
+        if vtkCellLocatorStrategy is not None:
+            strategy = vtkCellLocatorStrategy()
+            strategy.SetCellLocator(locator)
+            interpolator = vtkCompositeInterpolatedVelocityField()
+            interpolator.SetFindCellStrategy(strategy)
+            tracer.SetInterpolatorPrototype(interpolator)
+        return tracer
+
+    def trace(self, tracer, seeds):
+        """
+        Trace a set of seeds.
+
+        :param tracer: The tracer, used by one thread at a time.
+        :param seeds: An (N, 3) array of seed points.
+        :return: A dictionary mapping the index of each seed to its (points, point data) pair.
+        """
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(np.ascontiguousarray(seeds, dtype=np.float64), deep=True))
+        source = vtkPolyData()
+        source.SetPoints(points)
+
+        tracer.SetSourceData(source)
+        tracer.Update()
+        output = tracer.GetOutput()
+
+        result = dict()
+        if output.GetNumberOfCells() == 0:
+            return result
+        pd = output.GetPointData()
+        if self.array_names is None:
+            self.array_names = [pd.GetArrayName(i) for i in range(pd.GetNumberOfArrays())]
+        xyz = vtk_to_numpy(output.GetPoints().GetData())
+        arrays = {name: vtk_to_numpy(pd.GetArray(name)) for name in self.array_names}
+        seed_ids = vtk_to_numpy(output.GetCellData().GetArray('SeedIds'))
+        lines = output.GetLines()
+        offsets = vtk_to_numpy(lines.GetOffsetsArray())
+        connectivity = vtk_to_numpy(lines.GetConnectivityArray())
+        for cell, seed_id in enumerate(seed_ids):
+            ids = connectivity[offsets[cell]:offsets[cell + 1]]
+            result[int(seed_id)] = (xyz[ids].copy(), {name: a[ids].copy() for name, a in arrays.items()})
+        return result
+
+    def update(self, seeds):
+        """
+        Get the streamlines for the seeds, tracing only those not in the cache.
+
+        :param seeds: An (N, 3) array of seed points.
+        :return: The streamlines as vtkPolyData.
+        """
+        seeds = np.asarray(seeds, dtype=np.float64).reshape(-1, 3)
+        keys = [tuple(k) for k in np.round(seeds, self.decimals)]
+        missing = [i for i, k in enumerate(keys) if k not in self.cache]
+        self.reused = len(keys) - len(missing)
+        self.traced = len(missing)
+
+        if missing:
+            chunks = [c for c in np.array_split(np.array(missing), self.jobs) if len(c)]
+            if len(chunks) > 1:
+                with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+                    results = list(executor.map(lambda t, c: self.trace(t, seeds[c]), self.tracers, chunks))
+            else:
+                results = [self.trace(self.tracers[0], seeds[chunks[0]])]
+            for chunk, result in zip(chunks, results):
+                for i, seed_index in enumerate(chunk):
+                    # A seed outside the field has no line, cache it anyway.
+                    self.cache[keys[seed_index]] = result.get(i)
+        lines = [self.cache[k] for k in keys]
+        for k in keys:
+            self.cache.move_to_end(k)
+        # Evict the least recently used lines, but never those of this frame,
+        #  the cache may be smaller than the number of seeds.
+        current = set(keys)
+        while len(self.cache) > self.cache_size:
+            oldest = next(iter(self.cache))
+            if oldest in current:
+                break
+            del self.cache[oldest]
+
+        return self.assemble([line for line in lines if line is not None])
+
+    def assemble(self, lines):
+        """
+        Build one vtkPolyData from the cached lines without per-point calls.
+        """
+        poly_data = vtkPolyData()
+        if not lines:
+            return poly_data
+        counts = np.array([len(xyz) for xyz, _ in lines])
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        cells = vtkCellArray()
+        cells.SetData(numpy_to_vtkIdTypeArray(offsets, deep=True),
+                      numpy_to_vtkIdTypeArray(np.arange(offsets[-1], dtype=np.int64), deep=True))
+
+        points = vtkPoints()
+        points.SetData(numpy_to_vtk(np.concatenate([xyz for xyz, _ in lines]), deep=True))
+        poly_data.SetPoints(points)
+        poly_data.SetLines(cells)
+        for name in self.array_names:
+            array = numpy_to_vtk(np.concatenate([a[name] for _, a in lines]), deep=True)
+            array.SetName(name)
+            poly_data.GetPointData().AddArray(array)
+        scalars = self.data_set.GetPointData().GetScalars()
+        if scalars is not None:
+            poly_data.GetPointData().SetActiveScalars(scalars.GetName())
+        if 'Normals' in self.array_names:
+            poly_data.GetPointData().SetActiveNormals('Normals')
+        return poly_data
+
+
+class UpdateStreamlinesCallback:
+    def __init__(self, engine, seeds, ribbon, ren_win):
+        self.engine = engine
+        self.seeds = seeds
+        self.ribbon = ribbon
+        self.ren_win = ren_win
+
+    def __call__(self, caller, ev):
+        caller.GetPolyData(self.seeds)
+        start = time.perf_counter()
+        lines = self.engine.update(vtk_to_numpy(self.seeds.GetPoints().GetData()))
+        print(f'Traced {self.engine.traced:4d}, reused {self.engine.reused:4d} '
+              f'in {time.perf_counter() - start:0.3f}s')
+        self.ribbon.SetInputData(lines)
+        self.ren_win.Render()
+
+
+def main():
+    colors = vtkNamedColors()
+
+    file_name1, file_name2, number_of_seeds, jobs, cache_size = get_program_parameters()
+
+    pl3d = vtkMultiBlockPLOT3DReader()
+    pl3d.SetXYZFileName(file_name1)
+    pl3d.SetQFileName(file_name2)
+    pl3d.SetScalarFunctionNumber(100)  # Density
+    pl3d.SetVectorFunctionNumber(202)  # Momentum
+    pl3d.Update()
+    pl3d_output = pl3d.GetOutput().GetBlock(0)
+
+    engine = StreamlineEngine(pl3d_output, cache_size=cache_size, jobs=jobs)
+
+    ren = vtkRenderer()
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(ren)
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    seeds = vtkPolyData()
+    line_widget = vtkLineWidget()
+    line_widget.SetResolution(number_of_seeds - 1)
+    line_widget.SetInputData(pl3d_output)
+    line_widget.SetAlignToNone()
+    line_widget.SetPoint1(0.974678, 5.073630, 31.217961)
+    line_widget.SetPoint2(0.457544, -4.995921, 31.080175)
+    line_widget.ClampToBoundsOn()
+    line_widget.PlaceWidget()
+    line_widget.SetInteractor(iren)
+
+    ribbon = vtkRibbonFilter()
+    ribbon.SetWidth(0.1)
+    ribbon.SetWidthFactor(5)
+    stream_mapper = vtkPolyDataMapper()
+    stream_mapper.SetInputConnection(ribbon.GetOutputPort())
+    stream_mapper.SetScalarRange(pl3d_output.GetScalarRange())
+    streamline = vtkActor()
+    streamline.SetMapper(stream_mapper)
+
+    callback = UpdateStreamlinesCallback(engine, seeds, ribbon, ren_win)
+    line_widget.AddObserver('InteractionEvent', callback)
+    line_widget.AddObserver('EndInteractionEvent', callback)
+
+    outline = vtkStructuredGridOutlineFilter()
+    outline.SetInputData(pl3d_output)
+    outline_mapper = vtkPolyDataMapper()
+    outline_mapper.SetInputConnection(outline.GetOutputPort())
+    outline_actor = vtkActor()
+    outline_actor.GetProperty().SetColor(colors.GetColor3d('Black'))
+    outline_actor.SetMapper(outline_mapper)
+
+    ren.AddActor(outline_actor)
+    ren.AddActor(streamline)
+    ren.SetBackground(colors.GetColor3d('Silver'))
+    ren_win.SetSize(512, 512)
+    ren_win.SetWindowName('StreamlineEngine')
+
+    cam = ren.GetActiveCamera()
+    cam.SetClippingRange(14.216207, 68.382915)
+    cam.SetFocalPoint(9.718210, 0.458166, 29.399900)
+    cam.SetPosition(-15.827551, -16.997463, 54.003120)
+    cam.SetViewUp(0.616076, 0.179428, 0.766979)
+
+    iren.Initialize()
+    line_widget.EnabledOn()
+    # Trace the initial seeds.
+    callback(line_widget, 'EndInteractionEvent')
+    iren.Start()
+
+
+if __name__ == '__main__':
+    main()
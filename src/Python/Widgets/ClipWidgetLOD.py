@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkInteractionStyle
+# noinspection PyUnresolvedReferences
+import vtkmodules.vtkRenderingOpenGL2
+from vtkmodules.vtkCommonColor import vtkNamedColors
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkCommonDataModel import (
+    vtkPlane,
+    vtkPlanes
+)
+from vtkmodules.vtkFiltersCore import (
+    vtkClipPolyData,
+    vtkQuadricClustering
+)
+from vtkmodules.vtkFiltersSources import vtkSphereSource
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader
+from vtkmodules.vtkInteractionWidgets import (
+    vtkBoxRepresentation,
+    vtkBoxWidget2,
+    vtkImplicitPlaneRepresentation,
+    vtkImplicitPlaneWidget2
+)
+from vtkmodules.vtkRenderingCore import (
+    vtkActor,
+    vtkPolyDataMapper,
+    vtkProperty,
+    vtkRenderWindow,
+    vtkRenderWindowInteractor,
+    vtkRenderer
+)
+
+
+def get_program_parameters():
+    import argparse
+    description = 'Clip a large polydata with a widget, using a decimated proxy while interacting.'
+    epilogue = '''
+While the widget is dragged the clip is applied to a decimated copy of the input.
+When the interaction ends the full resolution input is clipped once, on a worker
+ thread unless -s is given, and replaces the proxy when it is ready.
+
+If no file is given a finely tessellated sphere is used, its resolution is set with -r.
+Use -b to clip with a box widget instead of a plane.
+'''
+    parser = argparse.ArgumentParser(description=description, epilog=epilogue,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file_name', nargs='?', default=None, help='A VTK Poly Data file e.g. cow.vtp')
+    parser.add_argument('-r', '--resolution', type=int, default=1000, help='The resolution of the sphere.')
+    parser.add_argument('-d', '--divisions', type=int, default=64,
+                        help='The number of divisions of the bounds along each axis for the proxy.')
+    parser.add_argument('-b', '--box', action='store_true', help='Clip with a box widget.')
+    parser.add_argument('-s', '--synchronous', action='store_true',
+                        help='Clip the full resolution input on the main thread.')
+    args = parser.parse_args()
+    return args.file_name, args.resolution, args.divisions, args.box, args.synchronous
+
+
+def make_proxy(poly_data, divisions):
+    """
+    A decimated copy of the polydata.
+
+    vtkQuadricClustering is used as it takes a time linear in the size of the input,
+     the number of divisions bounds the size of the proxy.
+    """
+    decimate = vtkQuadricClustering()
+    decimate.SetInputData(poly_data)
+    decimate.SetNumberOfDivisions(divisions, divisions, divisions)
+    decimate.AutoAdjustNumberOfDivisionsOff()
+    decimate.Update()
+    return decimate.GetOutput()
+
+
+def plane_clipper(poly_data):
+    """
+    A clipper of the polydata with its own plane.
+    """
+    clipper = vtkClipPolyData()
+    clipper.SetInputData(poly_data)
+    clipper.SetClipFunction(vtkPlane())
+    clipper.InsideOutOn()
+    return clipper
+
+
+def apply_plane(widget, clipper):
+    widget.GetRepresentation().GetPlane(clipper.GetClipFunction())
+
+
+def box_clipper(poly_data):
+    """
+    A clipper of the polydata with its own planes, keeping the inside of the box.
+    """
+    clipper = vtkClipPolyData()
+    clipper.SetInputData(poly_data)
+    clipper.SetClipFunction(vtkPlanes())
+    clipper.InsideOutOn()
+    return clipper
+
+
+def apply_box(widget, clipper):
+    widget.GetRepresentation().GetPlanes(clipper.GetClipFunction())
+
+
+class WidgetLOD:
+    """
+    Drive a filter from a widget, with a level of detail for interaction.
+
+    While the widget is being interacted with, a filter of the proxy follows it.
+     On EndInteractionEvent a new filter of the full resolution input is made and
+     run once. Run on a worker thread, the proxy stays on screen until the result
+     is ready; a result made stale by a later interaction is dropped.
+
+    Each full resolution run has its own filter and implicit function, so nothing
+     that is rendered is touched by the worker.
+    """
+
+    def __init__(self, widget, mapper, proxy, full, make_filter, apply_widget, threaded=True):
+        """
+        :param widget: The widget.
+        :param mapper: The mapper displaying the result.
+        :param proxy: The decimated input.
+        :param full: The full resolution input.
+        :param make_filter: A function returning a filter of the input it is given.
+        :param apply_widget: A function setting up a filter from the state of the widget.
+        :param threaded: Run the full resolution filter on a worker thread.
+        """
+        self.widget = widget
+        self.mapper = mapper
+        self.full = full
+        self.make_filter = make_filter
+        self.apply_widget = apply_widget
+        self.proxy_filter = make_filter(proxy)
+        self.executor = ThreadPoolExecutor(1) if threaded else None
+        self.future = None
+        self.generation = 0
+
+        widget.AddObserver(vtkCommand.StartInteractionEvent, self.start_interaction)
+        widget.AddObserver(vtkCommand.InteractionEvent, self.interaction)
+        widget.AddObserver(vtkCommand.EndInteractionEvent, self.end_interaction)
+        if self.executor is not None:
+            interactor = widget.GetInteractor()
+            interactor.AddObserver(vtkCommand.TimerEvent, self.poll)
+            interactor.CreateRepeatingTimer(50)
+
+    def start_interaction(self, caller, ev):
+        # Any result still being computed is now out of date.
+        self.generation += 1
+        self.interaction(caller, ev)
+
+    def interaction(self, caller, ev):
+        self.apply_widget(self.widget, self.proxy_filter)
+        if self.mapper.GetInputConnection(0, 0) != self.proxy_filter.GetOutputPort():
+            self.mapper.SetInputConnection(self.proxy_filter.GetOutputPort())
+
+    def end_interaction(self, caller, ev):
+        full_filter = self.make_filter(self.full)
+        self.apply_widget(self.widget, full_filter)
+        if self.executor is None:
+            self.show(self.run(full_filter))
+        else:
+            self.future = (self.generation, self.executor.submit(self.run, full_filter))
+
+    @staticmethod
+    def run(full_filter):
+        start = time.perf_counter()
+        full_filter.Update()
+        output = full_filter.GetOutput()
+        print(f'Full resolution: {output.GetNumberOfCells()} cells in {time.perf_counter() - start:0.3f}s')
+        return output
+
+    def show(self, output):
+        self.mapper.SetInputData(output)
+        self.widget.GetInteractor().GetRenderWindow().Render()
+
+    def poll(self, caller, ev):
+        if self.future is None or not self.future[1].done():
+            return
+        generation, future = self.future
+        self.future = None
+        if generation == self.generation:
+            self.show(future.result())
+
+    def initialize(self):
+        """
+        Show the full resolution result for the initial state of the widget.
+        """
+        full_filter = self.make_filter(self.full)
+        self.apply_widget(self.widget, full_filter)
+        self.mapper.SetInputData(self.run(full_filter))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+
+def main():
+    file_name, resolution, divisions, use_box, synchronous = get_program_parameters()
+
+    colors = vtkNamedColors()
+
+    if file_name:
+        fp = Path(file_name)
+        if not (fp.is_file() and fp.suffix == '.vtp'):
+            print('Expected an existing file name with extension .vtp:')
+            print('Got', fp)
+            return
+        reader = vtkXMLPolyDataReader()
+        reader.SetFileName(fp)
+        reader.Update()
+        full = reader.GetOutput()
+    else:
+        sphere_source = vtkSphereSource()
+        sphere_source.SetRadius(10.0)
+        sphere_source.SetThetaResolution(resolution)
+        sphere_source.SetPhiResolution(resolution)
+        sphere_source.Update()
+        full = sphere_source.GetOutput()
+
+    start = time.perf_counter()
+    proxy = make_proxy(full, divisions)
+    print(f'Proxy of {proxy.GetNumberOfCells()} cells, from {full.GetNumberOfCells()},'
+          f' in {time.perf_counter() - start:0.3f}s')
+
+    mapper = vtkPolyDataMapper()
+    actor = vtkActor()
+    actor.SetMapper(mapper)
+    actor.GetProperty().SetDiffuseColor(colors.GetColor3d('Tomato'))
+    back_faces = vtkProperty()
+    back_faces.SetDiffuseColor(colors.GetColor3d('Gold'))
+    actor.SetBackfaceProperty(back_faces)
+
+    renderer = vtkRenderer()
+    ren_win = vtkRenderWindow()
+    ren_win.AddRenderer(renderer)
+    ren_win.SetSize(640, 480)
+    ren_win.SetWindowName('ClipWidgetLOD')
+    renderer.AddActor(actor)
+    renderer.SetBackground(colors.GetColor3d('SlateGray'))
+
+    iren = vtkRenderWindowInteractor()
+    iren.SetRenderWindow(ren_win)
+
+    if use_box:
+        rep = vtkBoxRepresentation()
+        rep.SetPlaceFactor(0.75)
+        rep.PlaceWidget(full.GetBounds())
+        widget = vtkBoxWidget2()
+        make_filter, apply_widget = box_clipper, apply_box
+    else:
+        rep = vtkImplicitPlaneRepresentation()
+        rep.SetPlaceFactor(1.25)
+        rep.PlaceWidget(full.GetBounds())
+        rep.SetNormal(1.0, 0.0, 0.0)
+        widget = vtkImplicitPlaneWidget2()
+        make_filter, apply_widget = plane_clipper, apply_plane
+    widget.SetInteractor(iren)
+    widget.SetRepresentation(rep)
+
+    iren.Initialize()
+    lod = WidgetLOD(widget, mapper, proxy, full, make_filter, apply_widget, not synchronous)
+    lod.initialize()
+
+    renderer.GetActiveCamera().Azimuth(-60)
+    renderer.GetActiveCamera().Elevation(30)
+    renderer.ResetCamera()
+    renderer.GetActiveCamera().Zoom(0.75)
+
+    ren_win.Render()
+    widget.On()
+    iren.Start()
+    lod.shutdown()
+
+
+if __name__ == '__main__':
+    main()